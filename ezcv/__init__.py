@@ -1 +1,29 @@
-from .pipeline import CompVizPipeline
+import importlib
+from typing import TYPE_CHECKING, Any, List
+
+if TYPE_CHECKING:
+    from .pipeline import CompVizPipeline
+
+# Loaded on first access (PEP 562), so that `import ezcv` doesn't pay for what it doesn't use
+_LAZY_ATTRIBUTES = {
+    'CompVizPipeline': 'ezcv.pipeline',
+}
+_LAZY_SUBMODULES = (
+    'batch', 'classpath', 'cli', 'config', 'distributed', 'exceptions', 'operator', 'pipeline', 'serving', 'sinks',
+    'sources', 'utils',
+)
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_ATTRIBUTES:
+        value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name]), name)
+    elif name in _LAZY_SUBMODULES:
+        value = importlib.import_module(f'{__name__}.{name}')
+    else:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(_LAZY_SUBMODULES))
@@ -0,0 +1,5 @@
+import sys
+
+from ezcv.cli import main
+
+sys.exit(main())
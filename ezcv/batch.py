@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from ezcv.pipeline import CompVizPipeline
+from ezcv.sinks import DirectorySink
+from ezcv.sources import DirectorySource, read_image
+
+# Name of the checkpoint manifest, in the output directory
+CHECKPOINT_NAME = '.ezcv-checkpoint'
+
+
+class Checkpoint(object):
+    """ Manifest of the items that were completed, so that an interrupted run can resume where it stopped
+
+    Keys are appended, one per line, as they're added. A line cut short by an interruption is ignored when the
+    manifest is loaded again.
+    """
+    def __init__(self, path: str, restart: bool = False):
+        self.path = path
+        self.completed: Set[str] = set()
+        if not restart and os.path.exists(path):
+            with open(path, 'rb') as f:
+                content = f.read()
+            # Everything after the last newline was cut short: it's dropped from the manifest
+            end = content.rfind(b'\n') + 1
+            self.completed.update(line for line in content[:end].decode().split('\n') if line != '')
+            if end < len(content):
+                with open(path, 'r+b') as f:
+                    f.truncate(end)
+        self._lock = threading.Lock()
+        self._file = open(path, 'w' if restart else 'a')
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.completed
+
+    def add(self, keys: Iterable[str]):
+        """ Records completed keys, flushing them to the manifest right away """
+        keys = list(keys)
+        with self._lock:
+            self._file.write(''.join(f'{key}\n' for key in keys))
+            self._file.flush()
+            self.completed.update(keys)
+
+    def close(self):
+        self._file.close()
+
+
+@dataclass
+class BatchProgress:
+    total: int
+    # Items completed by previous runs
+    skipped: int = 0
+    processed: int = 0
+    failed: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    failures: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def remaining(self) -> int:
+        return self.total - self.skipped - self.processed - self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        """ Items processed per second by this run """
+        return (self.processed + self.failed) / max(self.elapsed, 1e-9)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """ Estimated number of seconds until every item is processed, or None before the first one """
+        if self.remaining == 0:
+            return 0.0
+        throughput = self.throughput
+        if throughput == 0:
+            return None
+        return self.remaining / throughput
+
+    def format(self) -> str:
+        done = self.skipped + self.processed + self.failed
+        eta = self.eta
+        eta = '?' if eta is None else _format_duration(eta)
+        failed = f', {self.failed} failed' if self.failed > 0 else ''
+        return f'{done}/{self.total} images{failed}, {self.throughput:.1f} img/s, ETA {eta}'
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}:{minutes:02d}:{seconds:02d}'
+
+
+def run_directory(pipeline: CompVizPipeline, input: str, output: str, workers: int = 4, restart: bool = False,
+                  report: Optional[Callable[[BatchProgress], None]] = None, report_interval: float = 1.0) \
+        -> BatchProgress:
+    """ Runs the pipeline on every image of a directory, saving each output to ``<output>/<name>.npy``
+
+    Images are loaded and processed by ``workers`` threads, and outputs are saved by a background thread. Completed
+    images are recorded in a checkpoint manifest in the output directory, and skipped by the next runs, unless
+    ``restart`` is set. Images that fail are reported in the returned progress, and tried again by the next run.
+
+    ``report`` is called with the progress every ``report_interval`` seconds, and once more at the end.
+    """
+    if not isinstance(workers, int) or workers <= 0:
+        raise ValueError(f'Invalid number of workers: {workers}')
+    paths = DirectorySource(input).paths
+    keys = [os.path.splitext(os.path.basename(path))[0] for path in paths]
+    if len(set(keys)) < len(keys):
+        duplicated = sorted(key for key in set(keys) if keys.count(key) > 1)
+        raise ValueError(f'Images with the same name but different extensions: {duplicated}')
+
+    os.makedirs(output, exist_ok=True)
+    checkpoint = Checkpoint(os.path.join(output, CHECKPOINT_NAME), restart=restart)
+    todo = [(key, path) for key, path in zip(keys, paths) if key not in checkpoint]
+    progress = BatchProgress(total=len(paths), skipped=len(paths) - len(todo))
+    last_report = time.monotonic()
+
+    # Results are only recorded in the checkpoint once they're saved
+    sink = DirectorySink(output, queue_size=2 * workers, on_written=checkpoint.add)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ezcv-run')
+    pending = deque()
+    try:
+        items = iter(todo)
+        while True:
+            for key, path in items:
+                pending.append((key, executor.submit(_run_file, pipeline, path)))
+                if len(pending) >= 2 * workers:
+                    break
+            if len(pending) == 0:
+                break
+            key, future = pending.popleft()
+            try:
+                img, ctx = future.result()
+            except Exception as e:
+                progress.failed += 1
+                progress.failures[key] = f'{type(e).__name__}: {e}'
+            else:
+                sink.write(img, ctx, key=key)
+                progress.processed += 1
+            if report is not None and time.monotonic() - last_report >= report_interval:
+                report(progress)
+                last_report = time.monotonic()
+    finally:
+        for _, future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        try:
+            sink.close()
+        finally:
+            checkpoint.close()
+    if report is not None:
+        report(progress)
+    return progress
+
+
+def _run_file(pipeline: CompVizPipeline, path: str):
+    return pipeline.run(read_image(path))
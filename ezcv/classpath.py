@@ -1,3 +1,4 @@
+import functools
 from importlib import import_module
 
 
@@ -7,8 +8,11 @@ def fully_qualified_name(cls: type) -> str:
     return cls.__module__ + '.' + cls.__qualname__
 
 
+@functools.lru_cache(maxsize=None)
 def class_from_fully_qualified_name(fqn: str) -> type:
     """ Returns the class specified by its fully qualified name
+
+    Results are cached, so that rebuilding many operators of the same class doesn't go through the import system
     """
     parts = fqn.rsplit('.', 1)
     if len(parts) < 2:
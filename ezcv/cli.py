@@ -0,0 +1,166 @@
+import argparse
+import sys
+from typing import List, Optional
+
+from ezcv.pipeline import CompVizPipeline
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='ezcv', description='ezCV command line tools')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    serve_parser = subparsers.add_parser('serve', help='Serve a pipeline over HTTP')
+    serve_parser.add_argument('config', help='Pipeline config file')
+    serve_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: %(default)s)')
+    serve_parser.add_argument('--port', type=int, default=8000, help='Port to listen on (default: %(default)s)')
+    serve_parser.add_argument('--unix-socket', help='Listen on this Unix socket instead of a TCP port')
+    serve_parser.add_argument('--max-batch-size', type=int, default=8,
+                              help='Maximum number of requests in a micro-batch (default: %(default)s)')
+    serve_parser.add_argument('--max-wait-ms', type=float, default=5,
+                              help='Maximum time a request waits for its micro-batch to fill up (default: %(default)s)')
+    serve_parser.add_argument('-j', '--workers', type=int, default=2,
+                              help='Number of worker threads (default: %(default)s)')
+    serve_parser.add_argument('--timeout', type=float, default=None, help='Per-request timeout, in seconds')
+    serve_parser.add_argument('-v', '--verbose', action='store_true', help='Log every request')
+    serve_parser.set_defaults(func=_serve)
+
+    run_parser = subparsers.add_parser('run', help='Run a pipeline on a directory of images, resuming where it stopped')
+    run_parser.add_argument('config', help='Pipeline config file')
+    run_parser.add_argument('--input', required=True, help='Directory of images to process')
+    run_parser.add_argument('--output', required=True, help='Directory the outputs are saved to, as .npy files')
+    run_parser.add_argument('-j', '--workers', type=int, default=4,
+                            help='Number of images processed concurrently (default: %(default)s)')
+    run_parser.add_argument('--restart', action='store_true',
+                            help='Process every image again, ignoring the checkpoint of previous runs')
+    run_parser.add_argument('-q', '--quiet', action='store_true', help="Don't report progress")
+    run_parser.set_defaults(func=_run)
+
+    coordinate_parser = subparsers.add_parser('coordinate', help='Shard a directory of images among remote workers')
+    coordinate_parser.add_argument('config', help='Pipeline config file')
+    coordinate_parser.add_argument('--input', required=True, help='Directory of images to process')
+    coordinate_parser.add_argument('--output', required=True,
+                                   help='Directory the outputs are saved to, which every worker must be able to write')
+    coordinate_parser.add_argument('--host', default='127.0.0.1', help='Address to listen on (default: %(default)s)')
+    coordinate_parser.add_argument('--port', type=int, default=7000, help='Port to listen on (default: %(default)s)')
+    coordinate_parser.add_argument('--shard-size', type=int, default=64,
+                                   help='Number of images in each shard (default: %(default)s)')
+    coordinate_parser.add_argument('--heartbeat-timeout', type=float, default=10,
+                                   help='Seconds after which a silent worker is considered lost (default: %(default)s)')
+    coordinate_parser.add_argument('--max-retries', type=int, default=2,
+                                   help='Number of times a failed shard is retried (default: %(default)s)')
+    coordinate_parser.set_defaults(func=_coordinate)
+
+    worker_parser = subparsers.add_parser('worker', help='Process shards handed out by a coordinator')
+    worker_parser.add_argument('address', help='Address of the coordinator, as HOST:PORT')
+    worker_parser.add_argument('--name', help='Name of the worker (default: a random name)')
+    worker_parser.add_argument('-j', '--threads', type=int, default=4,
+                               help='Number of images processed concurrently (default: %(default)s)')
+    worker_parser.add_argument('--processes', type=int, default=0,
+                               help='Number of processes running GIL-bound operators (default: %(default)s)')
+    worker_parser.set_defaults(func=_worker)
+
+    benchmark_parser = subparsers.add_parser('benchmark', help='Time the built-in operators against OpenCV')
+    benchmark_parser.add_argument('--size', default='480x640',
+                                  help='Size of the test image, as HEIGHTxWIDTH (default: %(default)s)')
+    benchmark_parser.add_argument('--repeats', type=int, default=10,
+                                  help='Number of timed runs of each operator (default: %(default)s)')
+    benchmark_parser.set_defaults(func=_benchmark)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+def _load_pipeline(path: str) -> CompVizPipeline:
+    with open(path) as f:
+        return CompVizPipeline.load(f)
+
+
+def _serve(args: argparse.Namespace) -> int:
+    from ezcv.serving import MicroBatcher, create_server
+
+    pipeline = _load_pipeline(args.config)
+    batcher = MicroBatcher(pipeline, max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000,
+                           workers=args.workers)
+    server = create_server(batcher, host=args.host, port=args.port, unix_socket=args.unix_socket,
+                           timeout=args.timeout, verbose=args.verbose)
+    address = args.unix_socket or f'http://{args.host}:{args.port}'
+    print(f'Serving {args.config} on {address}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        pipeline.teardown()
+    return 0
+
+
+def _run(args: argparse.Namespace) -> int:
+    from ezcv.batch import BatchProgress, run_directory
+
+    def report(progress: BatchProgress):
+        print(f'\r{progress.format()}', end='', file=sys.stderr, flush=True)
+
+    pipeline = _load_pipeline(args.config)
+    try:
+        progress = run_directory(pipeline, args.input, args.output, workers=args.workers, restart=args.restart,
+                                 report=None if args.quiet else report)
+    except KeyboardInterrupt:
+        print('\nInterrupted: run the same command again to resume', file=sys.stderr)
+        return 130
+    finally:
+        pipeline.teardown()
+    if not args.quiet:
+        print(file=sys.stderr)
+    for key, error in progress.failures.items():
+        print(f'{key} failed: {error}', file=sys.stderr)
+    return 1 if progress.failed > 0 else 0
+
+
+def _coordinate(args: argparse.Namespace) -> int:
+    from ezcv.distributed import Coordinator
+    from ezcv.sources import DirectorySource
+
+    pipeline = _load_pipeline(args.config)
+    paths = DirectorySource(args.input).paths
+    coordinator = Coordinator(pipeline, paths, args.output, shard_size=args.shard_size, host=args.host,
+                              port=args.port, heartbeat_timeout=args.heartbeat_timeout, max_retries=args.max_retries)
+    host, port = coordinator.address
+    print(f'Coordinating {len(paths)} images on {host}:{port}', file=sys.stderr)
+    try:
+        coordinator.wait()
+    except KeyboardInterrupt:
+        return 1
+    finally:
+        coordinator.close()
+    for index, error in coordinator.failures.items():
+        print(f'Shard {index} failed: {error}', file=sys.stderr)
+    return 1 if len(coordinator.failures) > 0 else 0
+
+
+def _worker(args: argparse.Namespace) -> int:
+    from ezcv.distributed import Worker
+
+    host, _, port = args.address.rpartition(':')
+    if host == '' or not port.isdigit():
+        print(f'Invalid address: {args.address}', file=sys.stderr)
+        return 2
+    worker = Worker((host, int(port)), name=args.name, threads=args.threads, processes=args.processes)
+    processed = worker.run()
+    print(f'Processed {processed} shards', file=sys.stderr)
+    return 0
+
+
+def _benchmark(args: argparse.Namespace) -> int:
+    from ezcv.operator.implementations.benchmark import benchmark, format_results
+
+    height, _, width = args.size.partition('x')
+    if not height.isdigit() or not width.isdigit():
+        print(f'Invalid size: {args.size}', file=sys.stderr)
+        return 2
+    results = benchmark((int(height), int(width)), repeats=args.repeats)
+    print(format_results(results))
+    if results[0].opencv is None:
+        print('OpenCV is not installed: only the numpy implementations were timed', file=sys.stderr)
+    return 0
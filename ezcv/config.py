@@ -1,11 +1,12 @@
-from typing import Dict, Optional
-
-from cerberus import Validator
+import functools
+import math
+from typing import Any, Callable, Dict, List, Optional, Type
 
 from ezcv import CompVizPipeline
 from ezcv.classpath import class_from_fully_qualified_name, fully_qualified_name
 from ezcv.exceptions import ConfigParsingError
-from ezcv.operator import Operator
+from ezcv.operator import Operator, ParameterSpec, IntegerParameter, DoubleParameter, EnumParameter, BooleanParameter
+from ezcv.schema import Errors, Validator, compile_schema
 
 
 ConfigSchema = Dict
@@ -50,28 +51,55 @@ pipeline_schema: ConfigSchema = {
 }
 
 
-def _perform_validation(config: Config, schema: ConfigSchema):
-    validator = Validator(schema)
-    if not validator.validate(config):
-        errors = validator.errors
+# The schemas are compiled once, instead of being interpreted on every load
+_validate_pipeline = compile_schema(pipeline_schema)
+_validate_operator = compile_schema(operator_config_schema)
+
+
+def _perform_validation(config: Config, validator: Validator):
+    if not isinstance(config, dict):
+        raise ConfigParsingError(f'Invalid configuration: {config}')
+    errors = validator(config)
+    if len(errors) > 0:
         raise ConfigParsingError('Failed to parse configuration', errors)
 
 
 def create_pipeline(pipeline_config: Config, validate: Optional[bool] = True) -> CompVizPipeline:
     if validate:
-        _perform_validation(pipeline_config, pipeline_schema)
+        _perform_validation(pipeline_config, _validate_pipeline)
 
     pipeline = CompVizPipeline()
-    for op_config in pipeline_config['pipeline']:
-        operator = create_operator(op_config['config'], validate=False)
+    for index, op_config in enumerate(pipeline_config['pipeline']):
+        try:
+            operator = _create_operator(op_config['config'], check_parameters=validate)
+        except _InvalidParameters as e:
+            errors = {'pipeline': [{index: [{'config': [{'params': [e.errors]}]}]}]}
+            raise ConfigParsingError('Failed to parse configuration', errors) from None
         pipeline.add_operator(op_config['name'], operator)
     return pipeline
 
 
 def create_operator(operator_config: Config, validate: Optional[bool] = True) -> Operator:
+    """ Creates an operator from its config
+
+    When validating, the config's structure is checked, as well as the values of the parameters against the bounds
+    and possible values of their specs.
+    """
     if validate:
-        _perform_validation(operator_config, operator_config_schema)
+        _perform_validation(operator_config, _validate_operator)
+    try:
+        return _create_operator(operator_config, check_parameters=validate)
+    except _InvalidParameters as e:
+        raise ConfigParsingError('Failed to parse configuration', {'params': [e.errors]}) from None
 
+
+class _InvalidParameters(Exception):
+    def __init__(self, errors: Errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _create_operator(operator_config: Config, check_parameters: bool) -> Operator:
     fqn = operator_config['implementation']
     try:
         cls = class_from_fully_qualified_name(fqn)
@@ -82,6 +110,10 @@ def create_operator(operator_config: Config, validate: Optional[bool] = True) ->
         raise ConfigParsingError(f"{fqn} is not an Operator")
 
     parameters = cls.get_parameters_specs()
+    if check_parameters:
+        errors = _get_parameters_validator(cls)(operator_config['params'])
+        if len(errors) > 0:
+            raise _InvalidParameters(errors)
 
     op = cls()
     for name, param_config in operator_config['params'].items():
@@ -96,6 +128,65 @@ def create_operator(operator_config: Config, validate: Optional[bool] = True) ->
     return op
 
 
+@functools.lru_cache(maxsize=None)
+def _get_parameters_validator(cls: Type[Operator]) -> Validator:
+    """ Compiles the checks of an operator's parameter values, once per class
+
+    Unknown parameters and values of specs that aren't known here are left for ``from_config`` to reject.
+    """
+    checks = {name: _compile_parameter_check(spec) for name, spec in cls.get_parameters_specs().items()}
+    checks = {name: check for name, check in checks.items() if check is not None}
+
+    def validate(params: Config) -> Errors:
+        errors = dict()
+        for name, value in params.items():
+            check = checks.get(name)
+            if check is None:
+                continue
+            value_errors = check(value)
+            if len(value_errors) > 0:
+                errors[name] = value_errors
+        return errors
+
+    return validate
+
+
+def _compile_parameter_check(spec: ParameterSpec) -> Optional[Callable[[Any], List[str]]]:
+    if isinstance(spec, BooleanParameter):
+        return _type_check(bool, 'boolean')
+    if isinstance(spec, IntegerParameter):
+        return _bounds_check(_type_check(int, 'integer'), spec.lower, spec.upper)
+    if isinstance(spec, DoubleParameter):
+        return _bounds_check(_type_check((int, float), 'number'), spec.lower, spec.upper)
+    if isinstance(spec, EnumParameter):
+        possible_values = frozenset(spec.possible_values)
+        return lambda value: [] if isinstance(value, str) and value in possible_values else [f'unallowed value {value}']
+    return None
+
+
+def _type_check(types: Any, type_name: str) -> Callable[[Any], List[str]]:
+    # bool is a subclass of int, but True isn't a valid number
+    excluded = () if types is bool else bool
+    return lambda value: [] if isinstance(value, types) and not isinstance(value, excluded) else \
+        [f'must be of {type_name} type']
+
+
+def _bounds_check(check_type: Callable[[Any], List[str]], lower: float, upper: float) -> Callable[[Any], List[str]]:
+    def check(value: Any) -> List[str]:
+        errors = check_type(value)
+        if len(errors) > 0:
+            return errors
+        if not math.isfinite(value):
+            return ['must be a finite number']
+        if value < lower:
+            return [f'min value is {lower}']
+        if value > upper:
+            return [f'max value is {upper}']
+        return []
+
+    return check
+
+
 def get_pipeline_config(pipeline: CompVizPipeline) -> Config:
     config = dict()
     config['version'] = '0.0'
@@ -0,0 +1,402 @@
+import json
+import socket
+import socketserver
+import struct
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+from ezcv.config import create_pipeline, get_pipeline_config
+from ezcv.pipeline import CompVizPipeline
+
+Address = Tuple[str, int]
+Message = Dict[str, Any]
+
+_HEADER = struct.Struct('>I')
+
+
+def send_message(sock: socket.socket, message: Message):
+    """ Sends a message as JSON, prefixed by its length """
+    payload = json.dumps(message).encode()
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def receive_message(sock: socket.socket) -> Optional[Message]:
+    """ Receives a message sent by ``send_message``. Returns None when the connection is closed """
+    header = _receive_exactly(sock, _HEADER.size)
+    if header is None:
+        return None
+    payload = _receive_exactly(sock, _HEADER.unpack(header)[0])
+    if payload is None:
+        return None
+    return json.loads(payload)
+
+
+def _receive_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    chunks = list()
+    while size > 0:
+        chunk = sock.recv(min(size, 1 << 16))
+        if len(chunk) == 0:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b''.join(chunks)
+
+
+class _Shard(object):
+    def __init__(self, index: int, items: List[Tuple[int, str]]):
+        self.index = index
+        # Index in the manifest, which names the outputs, and path of each file
+        self.items = items
+        self.attempts = 0
+        self.owners: Set[str] = set()
+        self.started_at: Optional[float] = None
+        self.done = False
+        self.error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.done or self.error is not None
+
+
+class _WorkerState(object):
+    def __init__(self, name: str, connection: socket.socket):
+        self.name = name
+        self.connection = connection
+        self.last_seen = time.monotonic()
+        self.shards: Set[int] = set()
+
+
+class Coordinator(object):
+    """ Shards a manifest of image files among workers connecting over TCP, each running the pipeline on its shards
+
+    Workers (see ``Worker``) get the pipeline as its config, and then ask for shards, one at a time, until every shard
+    is finished. Each file's output is saved by the worker that processed it to ``<output>/<index>.npy``, where the
+    index is the file's position in the manifest, so ``output`` must be a directory every worker can write to.
+
+    Workers send heartbeats while they run a shard. The shards of a worker that disconnects, or that isn't heard from
+    for ``heartbeat_timeout`` seconds, go back to the queue. So do shards that fail, up to ``max_retries`` times, after
+    which they're reported in ``failures``.
+
+    Once every shard has been handed out, idle workers steal work from stragglers: they're given a copy of the shard
+    that has been running the longest, and whichever worker finishes it first completes it. Outputs are keyed by index,
+    so both copies write the same files.
+
+    Parameters:
+        - pipeline: The pipeline to run
+        - paths: Manifest of files to process
+        - output: Directory the outputs are saved to
+        - shard_size: Number of files in each shard
+        - host: Address to listen on
+        - port: Port to listen on. If 0, a free port is picked (see ``address``)
+        - heartbeat_timeout: Time, in seconds, after which a silent worker is considered lost
+        - max_retries: Number of times a shard is retried before it's given up on
+    """
+    def __init__(self, pipeline: CompVizPipeline, paths: Sequence[str], output: str, shard_size: int = 64,
+                 host: str = '127.0.0.1', port: int = 0, heartbeat_timeout: float = 10.0, max_retries: int = 2):
+        if not isinstance(shard_size, int) or shard_size <= 0:
+            raise ValueError(f'Invalid shard_size: {shard_size}')
+        if not isinstance(heartbeat_timeout, (int, float)) or heartbeat_timeout <= 0:
+            raise ValueError(f'Invalid heartbeat_timeout: {heartbeat_timeout}')
+        if not isinstance(max_retries, int) or max_retries < 0:
+            raise ValueError(f'Invalid max_retries: {max_retries}')
+        self.output = output
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_retries = max_retries
+        self._config = get_pipeline_config(pipeline)
+        items = list(enumerate(paths))
+        self._shards = [
+            _Shard(i, items[start:start + shard_size]) for i, start in enumerate(range(0, len(items), shard_size))
+        ]
+        self._pending: Deque[int] = deque(shard.index for shard in self._shards)
+        self._workers: Dict[str, _WorkerState] = dict()
+        self._condition = threading.Condition()
+        self._closed = False
+        self._server = _CoordinatorServer((host, port), _CoordinatorHandler)
+        self._server.coordinator = self
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name='ezcv-coordinator',
+                                               daemon=True)
+        self._server_thread.start()
+        self._monitor = threading.Thread(target=self._monitor_loop, name='ezcv-heartbeats', daemon=True)
+        self._monitor.start()
+
+    @property
+    def address(self) -> Address:
+        """ Address workers connect to """
+        return self._server.server_address[:2]
+
+    @property
+    def progress(self) -> Dict[str, int]:
+        with self._condition:
+            return {
+                'shards': len(self._shards),
+                'completed': sum(shard.done for shard in self._shards),
+                'failed': sum(shard.error is not None for shard in self._shards),
+                'pending': len(self._pending),
+                'running': sum(len(shard.owners) > 0 for shard in self._shards if not shard.finished),
+                'workers': len(self._workers),
+            }
+
+    @property
+    def failures(self) -> Dict[int, str]:
+        """ Error of each shard that was given up on, by shard index """
+        with self._condition:
+            return {shard.index: shard.error for shard in self._shards if shard.error is not None}
+
+    @property
+    def finished(self) -> bool:
+        with self._condition:
+            return self._finished()
+
+    def shard_paths(self, index: int) -> List[str]:
+        """ Paths of the files in a shard """
+        return [path for _, path in self._shards[index].items]
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """ Waits until every shard is completed or given up on. Returns False on timeout """
+        with self._condition:
+            return self._condition.wait_for(self._finished, timeout)
+
+    def close(self):
+        """ Stops the server and disconnects the workers """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            connections = [worker.connection for worker in self._workers.values()]
+            self._condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+        for connection in connections:
+            _shutdown(connection)
+        self._monitor.join()
+
+    def __enter__(self) -> 'Coordinator':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _finished(self) -> bool:
+        return all(shard.finished for shard in self._shards)
+
+    def _connect(self, name: str, connection: socket.socket) -> Message:
+        with self._condition:
+            if name in self._workers:
+                raise ValueError(f'Duplicated worker name: {name}')
+            self._workers[name] = _WorkerState(name, connection)
+        return {
+            'type': 'config',
+            'pipeline': self._config,
+            'output': self.output,
+            'heartbeat_interval': self.heartbeat_timeout / 4,
+        }
+
+    def _disconnect(self, name: str):
+        """ Puts the shards the worker was running back in the queue, unless someone else is running them """
+        with self._condition:
+            worker = self._workers.pop(name, None)
+            if worker is None:
+                return
+            for index in worker.shards:
+                self._release(self._shards[index], name, 'Lost the worker running the shard')
+            self._condition.notify_all()
+
+    def _handle(self, name: str, message: Message) -> Optional[Message]:
+        with self._condition:
+            worker = self._workers[name]
+            worker.last_seen = time.monotonic()
+            kind = message.get('type')
+            if kind == 'heartbeat':
+                return None
+            if kind == 'request':
+                return self._assign(worker)
+            if kind == 'result':
+                shard = self._shards[message['shard']]
+                worker.shards.discard(shard.index)
+                if message.get('error') is None:
+                    shard.done = True
+                    shard.owners.clear()
+                    for other in self._workers.values():
+                        other.shards.discard(shard.index)
+                else:
+                    self._release(shard, name, message['error'])
+                self._condition.notify_all()
+                return None
+            raise ValueError(f'Invalid message type: {kind}')
+
+    def _assign(self, worker: _WorkerState) -> Message:
+        if self._finished() or self._closed:
+            return {'type': 'done'}
+        shard = None
+        if len(self._pending) > 0:
+            shard = self._shards[self._pending.popleft()]
+            shard.started_at = time.monotonic()
+        else:
+            running = [
+                shard for shard in self._shards
+                if not shard.finished and len(shard.owners) == 1 and worker.name not in shard.owners
+            ]
+            if len(running) > 0:
+                shard = min(running, key=lambda s: s.started_at)
+        if shard is None:
+            return {'type': 'wait'}
+        shard.owners.add(worker.name)
+        worker.shards.add(shard.index)
+        return {'type': 'shard', 'shard': shard.index, 'items': shard.items}
+
+    def _release(self, shard: _Shard, name: str, error: str):
+        shard.owners.discard(name)
+        if shard.finished or len(shard.owners) > 0:
+            return
+        shard.attempts += 1
+        if shard.attempts > self.max_retries:
+            shard.error = error
+        else:
+            self._pending.appendleft(shard.index)
+
+    def _monitor_loop(self):
+        """ Disconnects workers that stopped sending heartbeats """
+        with self._condition:
+            while not self._closed:
+                self._condition.wait(self.heartbeat_timeout / 4)
+                now = time.monotonic()
+                for worker in self._workers.values():
+                    if now - worker.last_seen > self.heartbeat_timeout:
+                        _shutdown(worker.connection)
+
+
+class _CoordinatorHandler(socketserver.BaseRequestHandler):
+    """ Talks to a single worker: answers its requests and records its heartbeats and results """
+    server: '_CoordinatorServer'
+
+    def handle(self):
+        coordinator = self.server.coordinator
+        hello = receive_message(self.request)
+        if hello is None or hello.get('type') != 'hello':
+            return
+        name = hello['name']
+        try:
+            config = coordinator._connect(name, self.request)
+        except ValueError as e:
+            try:
+                send_message(self.request, {'type': 'error', 'error': str(e)})
+            except OSError:
+                pass
+            return
+        # From now on, the worker is registered: whatever happens, its shards must be given back
+        try:
+            send_message(self.request, config)
+            while True:
+                message = receive_message(self.request)
+                if message is None:
+                    return
+                reply = coordinator._handle(name, message)
+                if reply is not None:
+                    send_message(self.request, reply)
+        except OSError:
+            pass
+        finally:
+            coordinator._disconnect(name)
+
+
+class _CoordinatorServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    coordinator: Coordinator
+
+
+def _shutdown(connection: socket.socket):
+    try:
+        connection.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class Worker(object):
+    """ Connects to a ``Coordinator`` and runs its pipeline on the shards it's given, until there are none left
+
+    Shards are run with a ``StagedExecutor``, so each worker processes ``threads`` frames concurrently, and sends
+    GIL-bound operators to ``processes`` processes if it's positive. Outputs are saved with a ``DirectorySink``.
+
+    Parameters:
+        - address: Host and port of the coordinator
+        - name: Identifies the worker. Defaults to a random name
+        - threads: Number of frames processed concurrently
+        - processes: Number of processes running GIL-bound operators. If 0, everything runs on threads
+        - poll_interval: Time, in seconds, to wait before asking again when no shard is available yet
+    """
+    def __init__(self, address: Address, name: Optional[str] = None, threads: int = 4, processes: int = 0,
+                 poll_interval: float = 0.05):
+        self.address = tuple(address)
+        self.name = name or f'worker-{uuid.uuid4().hex[:8]}'
+        self.threads = threads
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self._send_lock = threading.Lock()
+
+    def run(self) -> int:
+        """ Processes shards until the coordinator has none left. Returns the number of shards processed """
+        from ezcv.pipeline.executors import StagedExecutor
+
+        with socket.create_connection(self.address) as sock:
+            self._send(sock, {'type': 'hello', 'name': self.name})
+            config = receive_message(sock)
+            if config is None:
+                raise ConnectionError('The coordinator closed the connection')
+            if config['type'] == 'error':
+                raise ValueError(config['error'])
+            pipeline = create_pipeline(config['pipeline'])
+            stop = threading.Event()
+            heartbeats = threading.Thread(target=self._heartbeat_loop, args=(sock, config['heartbeat_interval'], stop),
+                                          name='ezcv-heartbeats', daemon=True)
+            heartbeats.start()
+            try:
+                with StagedExecutor(pipeline, threads=self.threads, processes=self.processes) as executor:
+                    self._work_loop(sock, executor, config['output'])
+            finally:
+                stop.set()
+                heartbeats.join()
+                pipeline.teardown()
+        return self.processed
+
+    def _work_loop(self, sock: socket.socket, executor: Any, output: str):
+        while True:
+            self._send(sock, {'type': 'request'})
+            reply = receive_message(sock)
+            if reply is None or reply['type'] == 'done':
+                return
+            if reply['type'] == 'wait':
+                time.sleep(self.poll_interval)
+                continue
+            error = None
+            try:
+                self._run_shard(executor, reply['items'], output)
+            except Exception as e:
+                error = f'{type(e).__name__}: {e}'
+            self._send(sock, {'type': 'result', 'shard': reply['shard'], 'error': error})
+            if error is None:
+                self.processed += 1
+
+    def _run_shard(self, executor: Any, items: List[Tuple[int, str]], output: str):
+        from ezcv.sinks import DirectorySink
+        from ezcv.sources import FilesSource
+
+        source = FilesSource([path for _, path in items], workers=1)
+        with DirectorySink(output) as sink:
+            for (index, _), (img, ctx) in zip(items, executor.map(source)):
+                sink.write(img, ctx, key=f'{index:08d}')
+
+    def _send(self, sock: socket.socket, message: Message):
+        with self._send_lock:
+            send_message(sock, message)
+
+    def _heartbeat_loop(self, sock: socket.socket, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            try:
+                self._send(sock, {'type': 'heartbeat'})
+            except OSError:
+                return
@@ -8,3 +8,11 @@ class BadImageError(Exception):
 
 class ConfigParsingError(Exception):
     pass
+
+
+class DeadlineExceededError(Exception):
+    pass
+
+
+class RunCancelledError(Exception):
+    pass
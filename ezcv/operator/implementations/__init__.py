@@ -0,0 +1,5 @@
+""" Operators shipped with ezCV, written with vectorized numpy
+
+Importing this package registers all of them.
+"""
+from . import blur, color_space, histogram, local_statistics, morphology, normalize, resize, threshold
@@ -0,0 +1,123 @@
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from ezcv.operator import Operator
+from ezcv.operator.implementations.blur import BoxBlur, GaussianBlur
+from ezcv.operator.implementations.color_space import ColorSpaceChange
+from ezcv.operator.implementations.histogram import HistogramEqualization
+from ezcv.operator.implementations.local_statistics import LocalStatistics
+from ezcv.operator.implementations.morphology import Morphology
+from ezcv.operator.implementations.normalize import Normalize
+from ezcv.operator.implementations.resize import Resize
+from ezcv.operator.implementations.threshold import AdaptiveThreshold, Threshold
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    # Median duration of a run, in seconds
+    numpy: float
+    # None when OpenCV isn't installed
+    opencv: Optional[float]
+
+    @property
+    def ratio(self) -> Optional[float]:
+        """ How many times slower the numpy implementation is """
+        if self.opencv is None:
+            return None
+        return self.numpy / max(self.opencv, 1e-9)
+
+
+def benchmark(shape: Tuple[int, int] = (480, 640), repeats: int = 10) -> List[BenchmarkResult]:
+    """ Times each built-in operator on a random image, along with its OpenCV equivalent when OpenCV is installed """
+    if not isinstance(repeats, int) or repeats <= 0:
+        raise ValueError(f'Invalid number of repeats: {repeats}')
+    rng = np.random.default_rng(0)
+    bgr = rng.integers(0, 256, size=tuple(shape) + (3,), dtype=np.uint8)
+    gray = bgr[:, :, 0].copy()
+    results = list()
+    for name, operator, img, reference in _cases(bgr, gray):
+        # Each run gets its own context, since operators may add info to it
+        numpy_time = _median_time(lambda: operator.run(img, PipelineContext(img)), repeats)
+        opencv_time = _median_time(lambda: reference(img), repeats) if cv2 is not None else None
+        results.append(BenchmarkResult(name, numpy_time, opencv_time))
+    return results
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    lines = [f'{"operator":<24}{"numpy (ms)":>12}{"opencv (ms)":>14}{"ratio":>8}']
+    for result in results:
+        opencv = '-' if result.opencv is None else f'{result.opencv * 1000:.2f}'
+        ratio = '-' if result.ratio is None else f'{result.ratio:.1f}x'
+        lines.append(f'{result.name:<24}{result.numpy * 1000:>12.2f}{opencv:>14}{ratio:>8}')
+    return '\n'.join(lines)
+
+
+def _median_time(func: Callable[[], object], repeats: int) -> float:
+    func()
+    durations = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return float(np.median(durations))
+
+
+def _operator(cls, **params) -> Operator:
+    operator = cls()
+    for name, value in params.items():
+        setattr(operator, name, value)
+    return operator
+
+
+def _cases(bgr: Image, gray: Image) -> List[Tuple[str, Operator, Image, Callable[[Image], Image]]]:
+    # The OpenCV references are only called when OpenCV is installed
+    return [
+        ('bgr2gray', _operator(ColorSpaceChange, src='BGR', target='GRAY'), bgr,
+         lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)),
+        ('bgr2hsv', _operator(ColorSpaceChange, src='BGR', target='HSV'), bgr,
+         lambda img: cv2.cvtColor(img, cv2.COLOR_BGR2HSV)),
+        ('gaussian_blur_5', _operator(GaussianBlur, kernel_size=5, sigma=0), bgr,
+         lambda img: cv2.GaussianBlur(img, (5, 5), 0)),
+        ('gaussian_blur_31', _operator(GaussianBlur, kernel_size=31, sigma=0), bgr,
+         lambda img: cv2.GaussianBlur(img, (31, 31), 0)),
+        ('box_blur_5', _operator(BoxBlur, kernel_size=5), bgr,
+         lambda img: cv2.blur(img, (5, 5))),
+        ('box_blur_51', _operator(BoxBlur, kernel_size=51), bgr,
+         lambda img: cv2.blur(img, (51, 51))),
+        ('local_std_51', _operator(LocalStatistics, kernel_size=51, statistic='std'), gray,
+         lambda img: _opencv_local_std(img, 51)),
+        ('threshold_binary', _operator(Threshold, method='binary'), gray,
+         lambda img: cv2.threshold(img, 127, 255, cv2.THRESH_BINARY)[1]),
+        ('threshold_otsu', _operator(Threshold, method='otsu'), gray,
+         lambda img: cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)[1]),
+        ('adaptive_threshold_51', _operator(AdaptiveThreshold, block_size=51), gray,
+         lambda img: cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 51, 2)),
+        ('erode_3', _operator(Morphology, operation='erode', kernel_size=3), bgr,
+         lambda img: cv2.erode(img, np.ones((3, 3), np.uint8))),
+        ('resize_linear_0.5', _operator(Resize, scale=0.5, interpolation='linear'), bgr,
+         lambda img: cv2.resize(img, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_LINEAR)),
+        ('resize_area_0.5', _operator(Resize, scale=0.5, interpolation='area'), bgr,
+         lambda img: cv2.resize(img, None, fx=0.5, fy=0.5, interpolation=cv2.INTER_AREA)),
+        ('normalize', _operator(Normalize), bgr,
+         lambda img: cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)),
+        ('equalize_hist', _operator(HistogramEqualization), gray,
+         lambda img: cv2.equalizeHist(img)),
+    ]
+
+
+def _opencv_local_std(img: Image, kernel_size: int) -> Image:
+    img = img.astype(np.float32)
+    mean = cv2.blur(img, (kernel_size, kernel_size))
+    variance = cv2.blur(img * img, (kernel_size, kernel_size)) - mean * mean
+    return cv2.convertScaleAbs(cv2.sqrt(cv2.max(variance, 0)))
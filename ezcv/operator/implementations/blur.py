@@ -0,0 +1,36 @@
+from ezcv.operator import DoubleParameter, IntegerParameter, Operator, register_operator
+from ezcv.operator.implementations.kernels import box_filter, gaussian_filter, to_uint8
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+
+@register_operator
+class GaussianBlur(Operator):
+    """ Blurs an image with a Gaussian kernel
+
+    The kernel is separable, so it's applied to rows and columns in turn, in ``2 × kernel_size`` operations per pixel.
+
+    Parameters:
+        - kernel_size: Width and height of the kernel, in pixels
+        - sigma: Standard deviation of the kernel, in pixels. When 0, it's derived from the kernel size like OpenCV does
+    """
+    kernel_size = IntegerParameter(default_value=5, lower=1, upper=99, step_size=2, spatial=True)
+    sigma = DoubleParameter(default_value=0, lower=0, upper=50, spatial=True)
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return to_uint8(gaussian_filter(img, self.kernel_size, self.sigma))
+
+
+@register_operator
+class BoxBlur(Operator):
+    """ Replaces each pixel with the mean of the pixels around it
+
+    Means are computed from a summed-area table, so bigger kernels don't make it slower.
+
+    Parameters:
+        - kernel_size: Width and height of the window, in pixels
+    """
+    kernel_size = IntegerParameter(default_value=5, lower=1, upper=99, spatial=True)
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return to_uint8(box_filter(img, self.kernel_size))
@@ -0,0 +1,98 @@
+from typing import List
+
+import numpy as np
+
+from ezcv.operator import EnumParameter, Operator, register_operator
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+COLOR_SPACES = ['BGR', 'RGB', 'GRAY', 'HSV']
+
+
+@register_operator
+class ColorSpaceChange(Operator):
+    """ Converts an image from a color space to another
+
+    Conversions follow OpenCV's conventions for uint8 images: gray is ``0.299 R + 0.587 G + 0.114 B``, and HSV has its
+    hue in ``[0, 180)`` and its saturation and value in ``[0, 255]``.
+
+    Parameters:
+        - src: Color space of the input image
+        - target: Color space of the output image
+    """
+    src = EnumParameter(possible_values=COLOR_SPACES, default_value='BGR')
+    target = EnumParameter(possible_values=COLOR_SPACES, default_value='GRAY')
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        if (img.ndim == 2) != (self.src == 'GRAY'):
+            raise ValueError(f'Invalid image for color space {self.src}: shape is {img.shape}')
+        return self._convert(img)
+
+    def run_batch(self, imgs: Image, ctxs: List[PipelineContext]) -> Image:
+        if (imgs.ndim == 3) != (self.src == 'GRAY'):
+            raise ValueError(f'Invalid images for color space {self.src}: shape is {imgs.shape}')
+        return self._convert(imgs)
+
+    def _convert(self, img: Image) -> Image:
+        if self.src == self.target:
+            return img
+        bgr = _TO_BGR[self.src](img)
+        return _FROM_BGR[self.target](bgr)
+
+
+def bgr_to_gray(img: Image) -> Image:
+    # Same fixed-point weights as OpenCV, which makes the conversion bit-exact
+    weights = np.array([1868, 9617, 4899], dtype=np.uint32)
+    return ((img.astype(np.uint32) @ weights + (1 << 13)) >> 14).astype(np.uint8)
+
+
+def gray_to_bgr(img: Image) -> Image:
+    return np.repeat(img[..., np.newaxis], 3, axis=-1)
+
+
+def bgr_to_hsv(img: Image) -> Image:
+    bgr = img.astype(np.float32)
+    b, g, r = bgr[..., 0], bgr[..., 1], bgr[..., 2]
+    value = bgr.max(axis=-1)
+    diff = value - bgr.min(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        saturation = np.where(value > 0, diff * 255 / value, 0)
+        scale = np.where(diff > 0, 60 / diff, 0)
+    hue = np.where(value == r, (g - b) * scale, np.where(value == g, 120 + (b - r) * scale, 240 + (r - g) * scale))
+    hue = np.where(hue < 0, hue + 360, hue)
+    hsv = np.stack([np.rint(hue / 2) % 180, np.rint(saturation), value], axis=-1)
+    return hsv.astype(np.uint8)
+
+
+def hsv_to_bgr(img: Image) -> Image:
+    hsv = img.astype(np.float32)
+    hue = hsv[..., 0] * 2 / 60
+    saturation = hsv[..., 1] / 255
+    value = hsv[..., 2]
+    sector = np.floor(hue).astype(np.int64) % 6
+    fraction = hue - np.floor(hue)
+    p = value * (1 - saturation)
+    q = value * (1 - saturation * fraction)
+    t = value * (1 - saturation * (1 - fraction))
+    # Blue, green and red for each of the 6 sectors of the hue circle
+    choices = np.stack([
+        np.stack([p, p, t, value, value, q], axis=-1),
+        np.stack([t, value, value, q, p, p], axis=-1),
+        np.stack([value, q, p, p, t, value], axis=-1),
+    ], axis=-1)
+    bgr = np.take_along_axis(choices, sector[..., np.newaxis, np.newaxis], axis=-2)[..., 0, :]
+    return np.rint(bgr).clip(0, 255).astype(np.uint8)
+
+
+_TO_BGR = {
+    'BGR': lambda img: img,
+    'RGB': lambda img: img[..., ::-1],
+    'GRAY': gray_to_bgr,
+    'HSV': hsv_to_bgr,
+}
+_FROM_BGR = {
+    'BGR': lambda img: img,
+    'RGB': lambda img: np.ascontiguousarray(img[..., ::-1]),
+    'GRAY': bgr_to_gray,
+    'HSV': bgr_to_hsv,
+}
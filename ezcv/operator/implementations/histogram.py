@@ -0,0 +1,29 @@
+import numpy as np
+
+from ezcv.operator import Operator, register_operator, settings
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+
+@register_operator
+@settings.GRAY_ONLY(True)
+class HistogramEqualization(Operator):
+    """ Spreads the histogram of a grayscale image over the whole range of values, like ``cv2.equalizeHist`` """
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return equalization_lut(img)[img]
+
+
+def equalization_lut(img: Image) -> np.ndarray:
+    """ Returns the lookup table that equalizes the histogram of an image """
+    hist = np.bincount(img.ravel(), minlength=256)
+    nonzero = np.flatnonzero(hist)
+    if len(nonzero) <= 1:
+        # Nothing to spread
+        return np.arange(256, dtype=np.uint8)
+    first = nonzero[0]
+    # The darkest level maps to 0, and the others are spread by their cumulative count
+    scale = 255 / (img.size - hist[first])
+    lut = np.rint((np.cumsum(hist) - hist[first]) * scale).clip(0, 255).astype(np.uint8)
+    lut[:first] = 0
+    return lut
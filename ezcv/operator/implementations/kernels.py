@@ -0,0 +1,120 @@
+""" Filtering kernels shared by the built-in operators
+
+Filters work on ``H×W`` and ``H×W×C`` images, and return float arrays of the same shape, which operators round back to
+their output dtype. Pixels beyond the borders are made up according to ``border``:
+
+    - ``reflect``: mirrored around the edge pixel, like OpenCV's default ``BORDER_REFLECT_101``
+    - ``replicate``: copies of the edge pixel, like ``BORDER_REPLICATE``
+
+Windows are ``kernel_size`` wide and centered on their pixel, or on the pixel right after their center when
+``kernel_size`` is even, like OpenCV's default anchor.
+"""
+from typing import Tuple
+
+import numpy as np
+
+from ezcv.typing import Image
+
+_PAD_MODES = {'reflect': 'reflect', 'replicate': 'edge'}
+
+
+def to_uint8(img: np.ndarray) -> Image:
+    """ Rounds the output of a filter to the nearest uint8 values """
+    return np.rint(img).clip(0, 255).astype(np.uint8)
+
+
+def pad(img: Image, kernel_size: int, border: str = 'reflect') -> Image:
+    """ Pads both spatial axes of an image with the pixels a ``kernel_size`` window needs beyond the borders """
+    if not isinstance(kernel_size, int) or kernel_size <= 0:
+        raise ValueError(f'Invalid kernel_size: {kernel_size}')
+    if border not in _PAD_MODES:
+        raise ValueError(f'Invalid border: {border}')
+    before = kernel_size // 2
+    after = kernel_size - 1 - before
+    widths = [(before, after), (before, after)] + [(0, 0)] * (img.ndim - 2)
+    return np.pad(img, widths, mode=_PAD_MODES[border])
+
+
+def filter_separable(img: Image, kernel: np.ndarray, border: str = 'reflect') -> np.ndarray:
+    """ Correlates the image with the outer product of a 1-D kernel with itself
+
+    The kernel is applied to each axis in turn, which costs ``2k`` operations per pixel instead of ``k²``.
+    """
+    kernel = np.asarray(kernel, dtype=np.float32)
+    height, width = img.shape[:2]
+    padded = pad(img.astype(np.float32), len(kernel), border)
+    rows = np.zeros((padded.shape[0], width) + img.shape[2:], dtype=np.float32)
+    for i, weight in enumerate(kernel):
+        rows += weight * padded[:, i:i + width]
+    out = np.zeros(img.shape, dtype=np.float32)
+    for i, weight in enumerate(kernel):
+        out += weight * rows[i:i + height]
+    return out
+
+
+# Kernels OpenCV uses for small sizes when no sigma is given, instead of deriving one
+_SMALL_GAUSSIAN_KERNELS = {
+    1: [1.0],
+    3: [0.25, 0.5, 0.25],
+    5: [0.0625, 0.25, 0.375, 0.25, 0.0625],
+    7: [0.03125, 0.109375, 0.21875, 0.28125, 0.21875, 0.109375, 0.03125],
+}
+
+
+def gaussian_kernel(kernel_size: int, sigma: float) -> np.ndarray:
+    """ Returns a normalized 1-D Gaussian kernel, the same as ``cv2.getGaussianKernel`` """
+    if not isinstance(kernel_size, int) or kernel_size <= 0 or kernel_size % 2 == 0:
+        raise ValueError(f'Invalid kernel_size: {kernel_size}')
+    if sigma <= 0:
+        if kernel_size in _SMALL_GAUSSIAN_KERNELS:
+            return np.array(_SMALL_GAUSSIAN_KERNELS[kernel_size])
+        sigma = 0.3 * ((kernel_size - 1) * 0.5 - 1) + 0.8
+    x = np.arange(kernel_size) - (kernel_size - 1) / 2
+    kernel = np.exp(-x ** 2 / (2 * sigma ** 2))
+    return kernel / kernel.sum()
+
+
+def gaussian_filter(img: Image, kernel_size: int, sigma: float, border: str = 'reflect') -> np.ndarray:
+    """ Blurs the image with a ``kernel_size×kernel_size`` Gaussian kernel, applied as two 1-D passes """
+    return filter_separable(img, gaussian_kernel(kernel_size, sigma), border)
+
+
+def integral_image(img: Image) -> np.ndarray:
+    """ Returns the summed-area table of an image, with an extra row and column of zeros in front
+
+    ``table[y, x]`` is the sum of ``img[:y, :x]``. Sums are exact: integer images get an int64 table.
+    """
+    dtype = np.int64 if np.issubdtype(img.dtype, np.integer) else np.float64
+    table = np.zeros((img.shape[0] + 1, img.shape[1] + 1) + img.shape[2:], dtype=dtype)
+    np.cumsum(img, axis=0, dtype=dtype, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def box_sum(img: Image, kernel_size: int, border: str = 'reflect') -> np.ndarray:
+    """ Returns the sum of the ``kernel_size×kernel_size`` window around each pixel
+
+    Each sum is read from a summed-area table with 4 lookups, so it costs the same whatever the kernel size.
+    """
+    height, width = img.shape[:2]
+    table = integral_image(pad(img, kernel_size, border))
+    k = kernel_size
+    return table[k:k + height, k:k + width] - table[:height, k:k + width] - table[k:k + height, :width] \
+        + table[:height, :width]
+
+
+def box_filter(img: Image, kernel_size: int, border: str = 'reflect') -> np.ndarray:
+    """ Returns the mean of the ``kernel_size×kernel_size`` window around each pixel """
+    return box_sum(img, kernel_size, border) / kernel_size ** 2
+
+
+def local_mean_variance(img: Image, kernel_size: int, border: str = 'reflect') -> Tuple[np.ndarray, np.ndarray]:
+    """ Returns the mean and the variance of the ``kernel_size×kernel_size`` window around each pixel """
+    if np.issubdtype(img.dtype, np.integer):
+        img = img.astype(np.int64)
+    count = kernel_size ** 2
+    sums = box_sum(img, kernel_size, border)
+    squares = box_sum(img * img, kernel_size, border)
+    # With integer images, the numerator is computed exactly, so the variance can't come out negative
+    variance = np.maximum(count * squares - sums * sums, 0) / count ** 2
+    return sums / count, variance
@@ -0,0 +1,30 @@
+import numpy as np
+
+from ezcv.operator import EnumParameter, IntegerParameter, Operator, register_operator
+from ezcv.operator.implementations.kernels import local_mean_variance, to_uint8
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+
+@register_operator
+class LocalStatistics(Operator):
+    """ Replaces each pixel with a statistic of the pixels around it
+
+    ``mean`` is a box blur, ``std`` highlights textured areas and edges, and ``variance`` does the same with more
+    contrast, saturating at 255. Statistics are computed from summed-area tables, so bigger windows don't make it
+    slower.
+
+    Parameters:
+        - kernel_size: Width and height of the window, in pixels
+        - statistic: Statistic of the window given to each pixel
+    """
+    kernel_size = IntegerParameter(default_value=5, lower=1, upper=99, spatial=True)
+    statistic = EnumParameter(possible_values=['mean', 'std', 'variance'], default_value='std')
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        mean, variance = local_mean_variance(img, self.kernel_size)
+        if self.statistic == 'mean':
+            return to_uint8(mean)
+        if self.statistic == 'std':
+            return to_uint8(np.sqrt(variance))
+        return to_uint8(variance)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from ezcv.operator import EnumParameter, IntegerParameter, Operator, register_operator
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+
+@register_operator
+class Morphology(Operator):
+    """ Applies a morphological operation with a square structuring element
+
+    Erosion takes the minimum of each window and dilation its maximum. Opening is an erosion followed by a dilation,
+    and closing a dilation followed by an erosion. Pixels beyond the borders don't affect the result.
+
+    Parameters:
+        - operation: Morphological operation to apply
+        - kernel_size: Width and height of the structuring element, in pixels
+        - iterations: Number of times each step of the operation is applied
+    """
+    operation = EnumParameter(possible_values=['erode', 'dilate', 'open', 'close'], default_value='erode')
+    kernel_size = IntegerParameter(default_value=3, lower=1, upper=99, spatial=True)
+    iterations = IntegerParameter(default_value=1, lower=1, upper=20)
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        steps = {
+            'erode': [np.minimum],
+            'dilate': [np.maximum],
+            'open': [np.minimum, np.maximum],
+            'close': [np.maximum, np.minimum],
+        }[self.operation]
+        out = img
+        for reduce in steps:
+            for _ in range(self.iterations):
+                out = _rank_filter(out, self.kernel_size, reduce)
+        return out
+
+
+def _rank_filter(img: Image, kernel_size: int, reduce: np.ufunc) -> Image:
+    """ Reduces each square window of the image with ``reduce``, one axis at a time
+
+    The borders are padded by repeating the edge pixels, which never changes the minimum or maximum of a window.
+    """
+    out = img
+    before = kernel_size // 2
+    after = kernel_size - 1 - before
+    for axis in (0, 1):
+        size = out.shape[axis]
+        pad = [(0, 0)] * out.ndim
+        pad[axis] = (before, after)
+        padded = np.pad(out, pad, mode='edge')
+        out = padded[(slice(None),) * axis + (slice(0, size),)].copy()
+        for i in range(1, kernel_size):
+            reduce(out, padded[(slice(None),) * axis + (slice(i, i + size),)], out=out)
+    return out
@@ -0,0 +1,29 @@
+import numpy as np
+
+from ezcv.operator import IntegerParameter, Operator, register_operator
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+
+@register_operator
+class Normalize(Operator):
+    """ Stretches the pixel values of an image linearly, so that its minimum and maximum become ``lower`` and ``upper``
+
+    Like ``cv2.normalize`` with ``NORM_MINMAX``, all channels are stretched together, and a constant image becomes
+    ``lower``.
+
+    Parameters:
+        - lower: Value of the darkest pixel in the output
+        - upper: Value of the brightest pixel in the output
+    """
+    lower = IntegerParameter(default_value=0, lower=0, upper=255)
+    upper = IntegerParameter(default_value=255, lower=0, upper=255)
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        lower, upper = min(self.lower, self.upper), max(self.lower, self.upper)
+        if img.size == 0:
+            return img
+        src_min, src_max = int(img.min()), int(img.max())
+        scale = (upper - lower) / (src_max - src_min) if src_max > src_min else 0
+        lut = np.rint(np.arange(256) * scale + (lower - src_min * scale)).clip(0, 255).astype(np.uint8)
+        return lut[img]
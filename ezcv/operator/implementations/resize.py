@@ -0,0 +1,73 @@
+import numpy as np
+
+from ezcv.operator import DoubleParameter, EnumParameter, Operator, register_operator
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+
+@register_operator
+class Resize(Operator):
+    """ Resizes an image by a scale factor, like ``cv2.resize`` with ``fx`` and ``fy``
+
+    ``area`` averages the source pixels each output pixel covers, which avoids aliasing when shrinking. When enlarging,
+    it falls back to ``linear``.
+
+    Parameters:
+        - scale: Factor both dimensions of the image are multiplied by
+        - interpolation: How output pixels are computed from the source pixels
+    """
+    scale = DoubleParameter(default_value=0.5, lower=0.01, upper=10, step_size=0.01)
+    interpolation = EnumParameter(possible_values=['nearest', 'linear', 'area'], default_value='linear')
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        out = img.astype(np.float32)
+        for axis in (0, 1):
+            size = img.shape[axis]
+            out_size = max(int(round(size * self.scale)), 1)
+            if self.interpolation == 'nearest':
+                out = np.take(out, _nearest_indices(size, out_size, self.scale), axis=axis)
+                continue
+            if self.interpolation == 'area' and out_size <= size:
+                indices, weights = _area_taps(size, out_size, self.scale)
+            else:
+                indices, weights = _linear_taps(size, out_size, self.scale)
+            out = _interpolate(out, indices, weights, axis)
+        return np.rint(out).clip(0, 255).astype(np.uint8)
+
+
+def _interpolate(img: np.ndarray, indices: np.ndarray, weights: np.ndarray, axis: int) -> np.ndarray:
+    """ Computes each output pixel along an axis as a weighted sum of a few source pixels
+
+    ``indices`` and ``weights`` are ``out_size×taps`` arrays, holding the source pixels of each output pixel.
+    """
+    # Weights broadcast along the axes after the interpolated one
+    shape = (-1,) + (1,) * (img.ndim - axis - 1)
+    out = 0
+    for tap in range(indices.shape[1]):
+        out = out + np.take(img, indices[:, tap], axis=axis) * weights[:, tap].reshape(shape)
+    return out
+
+
+def _nearest_indices(size: int, out_size: int, scale: float) -> np.ndarray:
+    return np.minimum(np.floor(np.arange(out_size) / scale).astype(np.int64), size - 1)
+
+
+def _linear_taps(size: int, out_size: int, scale: float):
+    """ Returns the 2 source pixels of each output pixel, and their weights, with pixel centers aligned """
+    src = ((np.arange(out_size) + 0.5) / scale - 0.5).clip(0, size - 1)
+    left = np.floor(src).astype(np.int64)
+    right = np.minimum(left + 1, size - 1)
+    fraction = (src - left).astype(np.float32)
+    return np.stack([left, right], axis=1), np.stack([1 - fraction, fraction], axis=1)
+
+
+def _area_taps(size: int, out_size: int, scale: float):
+    """ Returns the source pixels each output pixel covers, and how much of each it covers """
+    # Edges of the output pixels, in source coordinates
+    edges = np.minimum(np.arange(out_size + 1) / scale, size)
+    starts, ends = edges[:-1, np.newaxis], edges[1:, np.newaxis]
+    taps = int(np.ceil(1 / scale)) + 1
+    pixels = np.floor(starts).astype(np.int64) + np.arange(taps)
+    overlap = (np.minimum(ends, pixels + 1) - np.maximum(starts, pixels)).clip(0)
+    weights = (overlap / overlap.sum(axis=1, keepdims=True)).astype(np.float32)
+    return np.minimum(pixels, size - 1), weights
@@ -0,0 +1,99 @@
+from typing import Optional
+
+import numpy as np
+
+from ezcv.operator import BooleanParameter, EnumParameter, IntegerParameter, Operator, register_operator, settings
+from ezcv.operator.implementations.kernels import box_filter, gaussian_filter, to_uint8
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+
+
+@register_operator
+@settings.GRAY_ONLY(True)
+class Threshold(Operator):
+    """ Applies a fixed-level threshold to a grayscale image, like ``cv2.threshold``
+
+    With the ``otsu`` method, the threshold is picked from the image's histogram instead, and added to the context.
+
+    Parameters:
+        - threshold: Threshold value. Pixels above it are the ones set to ``max_value`` by the binary methods
+        - max_value: Value given to the pixels selected by the binary methods
+        - method: Thresholding method to use
+    """
+    threshold = IntegerParameter(default_value=127, lower=0, upper=255)
+    max_value = IntegerParameter(default_value=255, lower=0, upper=255)
+    method = EnumParameter(possible_values=['binary', 'binary_inv', 'trunc', 'tozero', 'tozero_inv', 'otsu'],
+                           default_value='binary')
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        if self.method != 'otsu':
+            return self.get_lut()[img]
+        threshold = otsu_threshold(img)
+        ctx.add_info('threshold', threshold)
+        return np.where(img > threshold, np.uint8(self.max_value), np.uint8(0))
+
+    def get_lut(self) -> Optional[np.ndarray]:
+        if self.method == 'otsu':
+            return None
+        values = np.arange(256, dtype=np.uint8)
+        above = values > self.threshold
+        if self.method == 'binary':
+            return np.where(above, np.uint8(self.max_value), np.uint8(0))
+        if self.method == 'binary_inv':
+            return np.where(above, np.uint8(0), np.uint8(self.max_value))
+        if self.method == 'trunc':
+            return np.minimum(values, np.uint8(self.threshold))
+        if self.method == 'tozero':
+            return np.where(above, values, np.uint8(0))
+        return np.where(above, np.uint8(0), values)
+
+
+@register_operator
+@settings.GRAY_ONLY(True)
+class AdaptiveThreshold(Operator):
+    """ Thresholds each pixel of a grayscale image against the mean of its neighborhood, like ``cv2.adaptiveThreshold``
+
+    Pixels brighter than their neighborhood's mean minus ``c`` are set to ``max_value`` and the others to 0, or the
+    opposite when ``inverted``. The mean is weighted with a Gaussian with the ``gaussian`` method. Either way, it's
+    computed by the shared kernels, so large blocks cost as much as small ones with the ``mean`` method.
+
+    Parameters:
+        - block_size: Width and height of the neighborhood, in pixels
+        - c: Constant subtracted from the mean
+        - max_value: Value given to the selected pixels
+        - method: How the mean of the neighborhood is weighted
+        - inverted: Whether to select the pixels that aren't brighter than the mean instead
+    """
+    block_size = IntegerParameter(default_value=11, lower=3, upper=201, step_size=2, spatial=True)
+    c = IntegerParameter(default_value=2, lower=-255, upper=255)
+    max_value = IntegerParameter(default_value=255, lower=0, upper=255)
+    method = EnumParameter(possible_values=['mean', 'gaussian'], default_value='mean')
+    inverted = BooleanParameter(default_value=False)
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        # Like OpenCV, the borders are replicated, and the mean is rounded before being compared
+        if self.method == 'mean':
+            mean = box_filter(img, self.block_size, border='replicate')
+        else:
+            mean = gaussian_filter(img, self.block_size, 0, border='replicate')
+        selected = img.astype(np.int16) - to_uint8(mean) > -self.c
+        if self.inverted:
+            selected = ~selected
+        return np.where(selected, np.uint8(self.max_value), np.uint8(0))
+
+
+def otsu_threshold(img: Image) -> int:
+    """ Returns the threshold that maximizes the variance between the two classes of pixels it separates """
+    hist = np.bincount(img.ravel(), minlength=256) / img.size
+    levels = np.arange(256)
+    # Weight and mean of the class of pixels at or below each threshold
+    weight = np.cumsum(hist)
+    cumulative_mean = np.cumsum(levels * hist)
+    mean = cumulative_mean[-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        below = cumulative_mean / weight
+        above = (mean - cumulative_mean) / (1 - weight)
+        variance = weight * (1 - weight) * (below - above) ** 2
+    epsilon = np.finfo(np.float32).eps
+    variance[(weight < epsilon) | (1 - weight < epsilon)] = 0
+    return int(np.argmax(variance))
@@ -1,10 +1,15 @@
-from typing import Type, Dict, List
+from typing import TYPE_CHECKING, Type, Dict, List, Optional
+
+import numpy as np
 
 from .parameter import ParameterSpec
 from .settings import OperatorSettingsMixin
-from ezcv.pipeline import PipelineContext
 from ezcv.typing import Image
 
+if TYPE_CHECKING:
+    # Only needed for annotations: importing it for real would make ezcv.operator and ezcv.pipeline import each other
+    from ezcv.pipeline import PipelineContext
+
 
 _OPERATORS = list()
 
@@ -25,9 +30,38 @@ class Operator(OperatorSettingsMixin):
 
     Extend this class to implement new functionality
     """
-    def run(self, img: Image, ctx: PipelineContext) -> Image:
+    def run(self, img: Image, ctx: 'PipelineContext') -> Image:
         raise NotImplementedError()
 
+    def run_batch(self, imgs: Image, ctxs: List['PipelineContext']) -> Image:
+        """ Runs the operator on a stack of images (``N×H×W`` or ``N×H×W×3``), with one context per image
+
+        Each context is already scoped to the operator. Override it with a vectorized implementation when the
+        operation can be applied to the whole stack at once. By default, it calls ``run`` on each image.
+        """
+        return np.stack([self.run(img, ctx) for img, ctx in zip(imgs, ctxs)])
+
+    def setup(self):
+        """ Builds expensive resources, like models or lookup tables
+
+        Called by the pipeline before the operator first runs, once per process. Operators that aren't THREAD_SAFE are
+        cloned for each thread running the pipeline, and each clone is set up in the thread that uses it.
+        """
+        pass
+
+    def teardown(self):
+        """ Releases the resources built by ``setup`` """
+        pass
+
+    def get_lut(self) -> Optional[np.ndarray]:
+        """ Returns a lookup table equivalent to ``run``, if this operator is a pointwise uint8 operation
+
+        The table must be a uint8 array with 256 entries, such that ``run(img, ctx)`` is ``lut[img]``. Consecutive
+        operators that provide a table may be fused by the pipeline into a single pass, in which case ``run`` isn't
+        called at all, so it shouldn't have side effects like adding info to the context.
+        """
+        return None
+
     @classmethod
     def get_parameters_specs(cls: Type['Operator']) -> Dict[str, ParameterSpec]:
         return {name: value for name, value in cls.__dict__.items() if isinstance(value, ParameterSpec)}
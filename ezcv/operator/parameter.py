@@ -13,6 +13,10 @@ class ParameterSpec(Generic[T]):
     def to_config(self, value: T) -> Any:
         raise NotImplementedError()
 
+    def scale(self, value: T, factor: float) -> T:
+        """ Returns the value to use on an image resized by ``factor``, which only changes for spatial parameters """
+        return value
+
     def __get__(self, instance, owner) -> T:
         if instance is None:
             return self
@@ -20,7 +24,13 @@ class ParameterSpec(Generic[T]):
 
 
 class IntegerParameter(ParameterSpec[int]):
-    def __init__(self, default_value: int, lower: int, upper: int, step_size: int = 1):
+    """ An integer between ``lower`` and ``upper``
+
+    Parameters measured in pixels, like kernel sizes or radii, should be flagged as ``spatial``, so that they're scaled
+    along with the image when the pipeline runs on a downsampled preview. Scaled values stay on the grid of
+    ``step_size`` steps from ``lower``, so that an odd kernel size with a step of 2 stays odd.
+    """
+    def __init__(self, default_value: int, lower: int, upper: int, step_size: int = 1, spatial: bool = False):
         if not isinstance(default_value, int):
             raise ValueError('Invalid default_value: %s' % str(default_value))
         super().__init__(default_value)
@@ -35,6 +45,13 @@ class IntegerParameter(ParameterSpec[int]):
         self.lower = lower
         self.upper = upper
         self.step_size = step_size
+        self.spatial = spatial
+
+    def scale(self, value: int, factor: float) -> int:
+        if not self.spatial:
+            return value
+        steps = round((value * factor - self.lower) / self.step_size)
+        return min(max(self.lower + steps * self.step_size, self.lower), self.upper)
 
     def from_config(self, config: Any) -> int:
         assert isinstance(config, int)
@@ -46,7 +63,12 @@ class IntegerParameter(ParameterSpec[int]):
 
 
 class DoubleParameter(ParameterSpec[float]):
-    def __init__(self, default_value: float, lower: float, upper: float, step_size: float = 0.1):
+    """ A number between ``lower`` and ``upper``
+
+    Like integer parameters, parameters measured in pixels, like sigmas, should be flagged as ``spatial``.
+    """
+    def __init__(self, default_value: float, lower: float, upper: float, step_size: float = 0.1,
+                 spatial: bool = False):
         if not isinstance(default_value, (float, int)):
             raise ValueError('Invalid default_value: %s' % str(default_value))
         super().__init__(default_value)
@@ -61,6 +83,12 @@ class DoubleParameter(ParameterSpec[float]):
         self.lower = lower
         self.upper = upper
         self.step_size = step_size
+        self.spatial = spatial
+
+    def scale(self, value: float, factor: float) -> float:
+        if not self.spatial:
+            return value
+        return min(max(value * factor, self.lower), self.upper)
 
     def from_config(self, config: Any) -> float:
         assert isinstance(config, (float, int))
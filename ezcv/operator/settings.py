@@ -36,6 +36,13 @@ class OperatorSettingsMixin:
             cls.__init_settings()
         cls.__settings[setting] = value
 
+    @classmethod
+    def get_settings(cls) -> Dict[OperatorSetting, _T]:
+        """ Returns the settings that were explicitly set, along with their values """
+        if not cls.__is_settings_initialized():
+            return dict()
+        return dict(cls.__settings)
+
     @classmethod
     def __is_settings_initialized(cls) -> bool:
         return hasattr(cls, '_OperatorSettingsMixin__settings')
@@ -46,3 +53,9 @@ class OperatorSettingsMixin:
 
 
 GRAY_ONLY = OperatorSetting('GRAY_ONLY', False)
+# Dtypes the operator's `run` accepts, in order of preference. Images of other dtypes are converted to the first one.
+INPUT_DTYPES = OperatorSetting('INPUT_DTYPES', ('uint8',))
+# Whether a single instance of the operator can run in several threads at once. If not, each thread gets its own clone.
+THREAD_SAFE = OperatorSetting('THREAD_SAFE', True)
+# Whether the operator releases the GIL while running, so that it scales with threads. None means unknown.
+RELEASES_GIL = OperatorSetting('RELEASES_GIL', None)
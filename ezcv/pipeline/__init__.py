@@ -1,2 +1,3 @@
-from .context import PipelineContext
-from .core import CompVizPipeline
+from .context import PipelineContext, CancellationToken
+from .core import CompVizPipeline, OperatorTiming
+from .aggregation import InfoAggregator
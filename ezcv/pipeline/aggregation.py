@@ -0,0 +1,180 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from ezcv.pipeline.context import PipelineContext
+
+
+class _Column(object):
+    def __init__(self, dtype: np.dtype, shape: Tuple[int, ...], capacity: int):
+        self.dtype = dtype
+        self.shape = shape
+        self.data = _allocate(capacity, dtype, shape)
+        self.mask = np.zeros(capacity, dtype=bool)
+
+    def resize(self, capacity: int, size: int):
+        data = _allocate(capacity, self.dtype, self.shape)
+        data[:size] = self.data[:size]
+        mask = np.zeros(capacity, dtype=bool)
+        mask[:size] = self.mask[:size]
+        self.data = data
+        self.mask = mask
+
+    def convert(self, dtype: np.dtype, shape: Tuple[int, ...], size: int):
+        """ Reallocates the column with a new dtype/shape, keeping the values already stored
+        """
+        data = _allocate(len(self.data), dtype, shape)
+        if dtype == np.dtype(object) and self.dtype != np.dtype(object):
+            for i in np.flatnonzero(self.mask[:size]):
+                data[i] = self.data[i] if self.shape == () else self.data[i].copy()
+        else:
+            data[:size] = self.data[:size]
+        self.dtype = dtype
+        self.shape = shape
+        self.data = data
+
+
+class InfoAggregator(object):
+    """ Aggregates ``PipelineContext.info`` from many runs into columnar numpy arrays
+
+    Each leaf of the (nested) info dict becomes a column named after its scoped path, like ``operator/name``.
+    Scalars and fixed-shape arrays are stored in contiguous arrays of shape ``(N, *value_shape)``. Values that
+    aren't numeric, or whose shape changes from one run to the next, are stored in an object column.
+
+    Runs that don't report a given path leave a hole in that column, which can be identified using ``mask``.
+    """
+    def __init__(self, initial_capacity: int = 1024):
+        if not isinstance(initial_capacity, int) or initial_capacity <= 0:
+            raise ValueError(f'Invalid initial_capacity: {initial_capacity}')
+        self._capacity = initial_capacity
+        self._size = 0
+        self._columns: Dict[str, _Column] = dict()
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self._columns.keys())
+
+    def append(self, info: Union[PipelineContext, Dict[str, Any]]):
+        """ Appends the info of a single run
+
+        Accepts either the ``PipelineContext`` returned by ``CompVizPipeline.run`` or its ``info`` dict
+        """
+        if isinstance(info, PipelineContext):
+            info = info.info
+        if not isinstance(info, dict):
+            raise ValueError(f'Invalid info: {info}')
+        if self._size == self._capacity:
+            self._grow()
+        row = self._size
+        values = [(path, value, _to_array(value)) for path, value in _flatten(info)]
+        for path, value, array in values:
+            self._store(path, row, value, array)
+        self._size += 1
+
+    def extend(self, infos: Iterable[Union[PipelineContext, Dict[str, Any]]]):
+        for info in infos:
+            self.append(info)
+
+    def column(self, path: str) -> np.ndarray:
+        """ Returns a read-only view of the values stored for the given path
+
+        The view doesn't copy any data, so it is only guaranteed to reflect runs appended before it was taken.
+        """
+        column = self._get_column(path)
+        return _read_only(column.data[:self._size])
+
+    def mask(self, path: str) -> np.ndarray:
+        """ Returns a read-only boolean view telling which runs reported a value for the given path
+        """
+        column = self._get_column(path)
+        return _read_only(column.mask[:self._size])
+
+    def to_records(self, paths: Optional[List[str]] = None) -> np.recarray:
+        """ Builds a record array with one field per path
+
+        Only columns with a fixed dtype and shape can be used. Contrary to ``column``, this copies the data.
+        """
+        if paths is None:
+            paths = [path for path, column in self._columns.items() if column.dtype != np.dtype(object)]
+        dtype = list()
+        for path in paths:
+            column = self._get_column(path)
+            if column.dtype == np.dtype(object):
+                raise ValueError(f'Column "{path}" doesn\'t have a fixed dtype and shape')
+            dtype.append((path, column.dtype, column.shape))
+        records = np.recarray(self._size, dtype=dtype)
+        for path in paths:
+            records[path] = self._columns[path].data[:self._size]
+        return records
+
+    def _get_column(self, path: str) -> _Column:
+        try:
+            return self._columns[path]
+        except KeyError:
+            raise KeyError(f'Unknown info path: "{path}" (from columns {self.columns})') from None
+
+    def _grow(self):
+        self._capacity *= 2
+        for column in self._columns.values():
+            column.resize(self._capacity, self._size)
+
+    def _store(self, path: str, row: int, value: Any, array: Optional[np.ndarray]):
+        column = self._columns.get(path)
+        if column is None:
+            if array is None:
+                column = _Column(np.dtype(object), (), self._capacity)
+            else:
+                column = _Column(array.dtype, array.shape, self._capacity)
+            self._columns[path] = column
+        elif column.dtype != np.dtype(object):
+            if array is None or array.shape != column.shape or not _compatible_kinds(column.dtype, array.dtype):
+                column.convert(np.dtype(object), (), self._size)
+            elif array.dtype != column.dtype:
+                promoted = np.promote_types(column.dtype, array.dtype)
+                if promoted != column.dtype:
+                    column.convert(promoted, column.shape, self._size)
+
+        if column.dtype == np.dtype(object):
+            column.data[row] = value
+        else:
+            column.data[row] = array
+        column.mask[row] = True
+
+
+def _flatten(info: Dict[str, Any], prefix: str = '') -> Iterator[Tuple[str, Any]]:
+    for name, value in info.items():
+        path = prefix + name
+        if isinstance(value, dict):
+            yield from _flatten(value, path + '/')
+        else:
+            yield path, value
+
+
+def _to_array(value: Any) -> Optional[np.ndarray]:
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        # Ragged sequences can't be turned into an array, they're stored as objects
+        return None
+    if array.dtype.kind not in 'biufcUSM' or array.dtype.hasobject:
+        return None
+    return array
+
+
+def _allocate(capacity: int, dtype: np.dtype, shape: Tuple[int, ...]) -> np.ndarray:
+    if dtype == np.dtype(object):
+        return np.full(capacity, None, dtype=object)
+    return np.zeros((capacity,) + shape, dtype=dtype)
+
+
+def _compatible_kinds(a: np.dtype, b: np.dtype) -> bool:
+    numeric = 'biufc'
+    return (a.kind in numeric and b.kind in numeric) or a.kind == b.kind
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
@@ -0,0 +1,184 @@
+import math
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ezcv.typing import Image
+
+
+class _Entry(object):
+    __slots__ = ('shape', 'dtype', 'nbytes', 'array', 'offset')
+
+    def __init__(self, shape: Tuple[int, ...], dtype: np.dtype, nbytes: int,
+                 array: Optional[np.ndarray] = None, offset: Optional[int] = None):
+        self.shape = shape
+        self.dtype = dtype
+        self.nbytes = nbytes
+        self.array = array
+        self.offset = offset
+
+
+class IntermediateCapture(object):
+    """ Records the image returned by each operator, across many runs, within a fixed memory budget
+
+    Set it on ``CompVizPipeline.capture`` to enable it. Images are kept in a ring buffer: when the budget is
+    exceeded, the oldest images are discarded first. Images bigger than the whole budget are never stored.
+
+    It can be shared by runs in several threads: each run records its images under the index ``begin_run`` gave it.
+
+    Parameters:
+        - max_bytes: Maximum number of bytes used to store images
+        - thumbnail_size: If set, images are downscaled so that their largest side is at most this size
+        - spill_path: If set, images are stored in a memory-mapped scratch file at this path instead of in memory
+    """
+    def __init__(self, max_bytes: int = 256 * 2 ** 20, thumbnail_size: Optional[int] = None,
+                 spill_path: Optional[str] = None):
+        if not isinstance(max_bytes, int) or max_bytes <= 0:
+            raise ValueError(f'Invalid max_bytes: {max_bytes}')
+        if thumbnail_size is not None and (not isinstance(thumbnail_size, int) or thumbnail_size <= 0):
+            raise ValueError(f'Invalid thumbnail_size: {thumbnail_size}')
+        self.max_bytes = max_bytes
+        self.thumbnail_size = thumbnail_size
+        self.spill_path = spill_path
+        self._entries: Dict[Tuple[int, str], _Entry] = OrderedDict()
+        self._nbytes = 0
+        self._run = -1
+        self._head = 0
+        self._scratch: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        if spill_path is not None:
+            self._scratch = np.memmap(spill_path, dtype=np.uint8, mode='w+', shape=(max_bytes,))
+
+    @property
+    def nbytes(self) -> int:
+        """ Number of bytes currently used by stored images """
+        return self._nbytes
+
+    @property
+    def runs(self) -> List[int]:
+        """ Indexes of the runs that still have at least one image stored, oldest first """
+        with self._lock:
+            return list(OrderedDict.fromkeys(run for run, _ in self._entries))
+
+    def begin_run(self) -> int:
+        """ Starts recording a new run, returning its index """
+        with self._lock:
+            self._run += 1
+            return self._run
+
+    def record(self, name: str, img: Image, run: Optional[int] = None):
+        """ Records an operator's output for a run, which defaults to the latest one
+
+        Concurrent runs must pass the index ``begin_run`` returned, since the latest run may be another thread's.
+        """
+        if self.thumbnail_size is not None:
+            img = _thumbnail(img, self.thumbnail_size)
+        nbytes = img.nbytes
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if self._run < 0:
+                self._run = 0
+            if run is None:
+                run = self._run
+            self._store((run, name), img, nbytes)
+
+    def get(self, name: str, run: int = -1) -> Image:
+        """ Returns the image recorded for an operator
+
+        ``run`` is either a run index (as in ``runs``) or a negative index, counting from the latest run
+        """
+        with self._lock:
+            if run < 0:
+                runs = [r for r, n in self._entries if n == name]
+                if len(runs) < -run:
+                    raise KeyError(f'No image recorded for "{name}" at run {run}')
+                run = runs[run]
+            try:
+                entry = self._entries[(run, name)]
+            except KeyError:
+                raise KeyError(f'No image recorded for "{name}" at run {run}') from None
+            return self._load(entry)
+
+    def get_run(self, run: int = -1) -> Dict[str, Image]:
+        """ Returns all images recorded in a run, by operator name, in execution order
+        """
+        with self._lock:
+            runs = list(OrderedDict.fromkeys(r for r, _ in self._entries))
+            if run < 0:
+                if len(runs) < -run:
+                    return dict()
+                run = runs[run]
+            return {name: self._load(entry) for (r, name), entry in self._entries.items() if r == run}
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def close(self):
+        with self._lock:
+            self._clear()
+            if self._scratch is not None:
+                del self._scratch
+                self._scratch = None
+
+    def _clear(self):
+        self._entries.clear()
+        self._nbytes = 0
+        self._head = 0
+
+    def _store(self, key: Tuple[int, str], img: Image, nbytes: int):
+        if key in self._entries:
+            self._discard(key)
+
+        if self._scratch is None:
+            while self._nbytes + nbytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+            array = np.array(img, copy=True)
+            array.flags.writeable = False
+            entry = _Entry(img.shape, img.dtype, nbytes, array=array)
+        else:
+            offset = self._reserve(nbytes)
+            self._scratch[offset:offset + nbytes] = np.ascontiguousarray(img).view(np.uint8).reshape(-1)
+            entry = _Entry(img.shape, img.dtype, nbytes, offset=offset)
+        self._entries[key] = entry
+        self._nbytes += nbytes
+
+    def _load(self, entry: _Entry) -> Image:
+        if entry.array is not None:
+            return entry.array
+        data = self._scratch[entry.offset:entry.offset + entry.nbytes]
+        return np.array(data).view(entry.dtype).reshape(entry.shape)
+
+    def _discard(self, key: Tuple[int, str]):
+        entry = self._entries.pop(key)
+        self._nbytes -= entry.nbytes
+
+    def _reserve(self, nbytes: int) -> int:
+        """ Finds room for ``nbytes`` in the scratch file, discarding the images stored there
+
+        Images are written one after the other, wrapping around at the end of the file, so the images overwritten
+        are always the oldest ones.
+        """
+        if self._head + nbytes > self.max_bytes:
+            for key in [key for key, entry in self._entries.items() if entry.offset >= self._head]:
+                self._discard(key)
+            self._head = 0
+        start, end = self._head, self._head + nbytes
+        overlapping = [
+            key for key, entry in self._entries.items()
+            if entry.offset < end and entry.offset + entry.nbytes > start
+        ]
+        for key in overlapping:
+            self._discard(key)
+        self._head = end
+        return start
+
+
+def _thumbnail(img: Image, size: int) -> Image:
+    factor = math.ceil(max(img.shape[:2]) / size)
+    if factor <= 1:
+        return img
+    return img[::factor, ::factor]
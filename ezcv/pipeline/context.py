@@ -1,46 +1,95 @@
-from contextlib import contextmanager
-from typing import ContextManager, Any
+import threading
+from typing import ContextManager, Any, Dict, List, Optional
 
+from ezcv.exceptions import RunCancelledError
 from ezcv.typing import Image
-from ezcv.utils import is_image
+from ezcv.utils import is_image, IMAGE_DTYPES
+
+
+class CancellationToken(object):
+    """ Lets another thread cancel a run
+
+    The pipeline checks the token between operators, and raises ``RunCancelledError`` once it's cancelled. Operators
+    with long loops can check it too, through ``PipelineContext.raise_if_cancelled``.
+    """
+    def __init__(self):
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RunCancelledError('The run was cancelled')
 
 
 class PipelineContext(object):
-    def __init__(self, original_img: Image):
-        if not is_image(original_img):
+    __slots__ = ('original_img', 'info', 'cancel_token', '_scopes', '_current_info')
+
+    def __init__(self, original_img: Image, cancel_token: Optional[CancellationToken] = None):
+        if not is_image(original_img, IMAGE_DTYPES):
             raise ValueError('Invalid original image')
         self.original_img = original_img.copy()
         self.original_img.flags.writeable = False
-        self._scopes = list()
-        self.info = dict()
+        self.info: Dict[str, Any] = dict()
+        self.cancel_token = cancel_token
+        self._scopes: List[str] = list()
+        self._current_info: Dict[str, Any] = self.info
 
-    @contextmanager
-    def scope(self, name: str) -> ContextManager:
-        self._scopes.append(name)
-        self._create_info_path()
-        yield
-        assert self._scopes[-1] == name
-        self._scopes.pop()
+    def __getstate__(self):
+        # The cancellation token can only be shared by threads, so it's left behind
+        return self.original_img, self.info, self._scopes
+
+    def __setstate__(self, state):
+        self.original_img, self.info, scopes = state
+        self.original_img.flags.writeable = False
+        self.cancel_token = None
+        self._scopes = list(scopes)
+        self._current_info = self.info
+        for name in self._scopes:
+            self._current_info = self._current_info[name]
+
+    def raise_if_cancelled(self):
+        """ Raises ``RunCancelledError`` if the run was cancelled. Meant to be called by operators with long loops """
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
 
-    def _create_info_path(self):
-        last = self.info
-        for scope_name in self._scopes:
-            last = last.setdefault(scope_name, dict())
+    def scope(self, name: str) -> ContextManager:
+        return _Scope(self, name)
 
     def add_info(self, name: str, info_value: Any):
-        scoped_info = self._get_info_in_scope()
-        if name in scoped_info:
-            raise ValueError('Trying to add a duplicated info name: "%s"' % name)
         if not isinstance(name, str) or len(name) == 0 or '/' in name:
             raise ValueError('Invalid name %s' % str(name))
-        self._insert_info(name, info_value)
+        scoped_info = self._current_info
+        if name in scoped_info:
+            raise ValueError('Trying to add a duplicated info name: "%s"' % name)
+        scoped_info[name] = info_value
 
-    def _get_info_in_scope(self) -> dict:
-        last = self.info
-        for scope_name in self._scopes:
-            last = last[scope_name]
-        return last
 
-    def _insert_info(self, name: str, info_value: Any):
-        scoped_info = self._get_info_in_scope()
-        scoped_info[name] = info_value
+class _Scope(object):
+    """ Context manager returned by ``PipelineContext.scope``
+
+    Keeps a reference to the enclosing info dict, so entering and leaving a scope never walks the info tree
+    """
+    __slots__ = ('_ctx', '_name', '_parent_info')
+
+    def __init__(self, ctx: PipelineContext, name: str):
+        self._ctx = ctx
+        self._name = name
+        self._parent_info = None
+
+    def __enter__(self):
+        ctx = self._ctx
+        self._parent_info = ctx._current_info
+        ctx._scopes.append(self._name)
+        ctx._current_info = self._parent_info.setdefault(self._name, dict())
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        ctx = self._ctx
+        assert ctx._scopes[-1] == self._name
+        ctx._scopes.pop()
+        ctx._current_info = self._parent_info
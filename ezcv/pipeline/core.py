@@ -1,15 +1,28 @@
-from typing import TextIO, Tuple, Dict, List, Optional, Union
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import dataclass
+from typing import TextIO, Tuple, Dict, List, Optional, Union, Sequence, Iterable, Iterator
 
-import yaml
+import numpy as np
 
 import ezcv.operator as op_lib
 from ezcv import utils
-from ezcv.exceptions import OperatorFailedError, BadImageError
-from ezcv.pipeline.context import PipelineContext
+from ezcv.exceptions import OperatorFailedError, BadImageError, RunCancelledError
+from ezcv.pipeline.capture import IntermediateCapture
+from ezcv.pipeline.context import PipelineContext, CancellationToken
 from ezcv.pipeline.hooks import PipelineHook, GrayOnlyHook
+from ezcv.pipeline.pool import OperatorPool
 from ezcv.typing import Image
 
 
+@dataclass(frozen=True)
+class OperatorTiming:
+    cold: float
+    warm: Optional[float]
+
+
 class CompVizPipeline(object):
     def __init__(self):
         self._operators: Dict[str, op_lib.Operator] = dict()
@@ -17,29 +30,160 @@ class CompVizPipeline(object):
         self._default_hooks: List[PipelineHook] = [
             GrayOnlyHook()
         ]
+        self._pool = OperatorPool()
+        self.capture: Optional[IntermediateCapture] = None
+        self.fuse_luts = True
+        # Dtype of the pipeline's input and output images. If None, any of `utils.IMAGE_DTYPES` goes.
+        self.boundary_dtype: Optional[str] = 'uint8'
 
     @property
     def operators(self) -> Dict[str, op_lib.Operator]:
         return {op_name: self._operators[op_name] for op_name in self._operators_order}
 
-    def run(self, img: Image, hooks: Optional[List[PipelineHook]] = None) -> Tuple[Image, PipelineContext]:
+    def run(self, img: Image, hooks: Optional[List[PipelineHook]] = None,
+            cancel_token: Optional[CancellationToken] = None) -> Tuple[Image, PipelineContext]:
+        """ Runs the pipeline on an image, returning the output image and the context holding the info operators added
+
+        If ``cancel_token`` is cancelled, from another thread, the run stops before the next operator, raising
+        ``RunCancelledError``. Operators can check it inside long loops with ``ctx.raise_if_cancelled()``.
+        """
         hooks = self._default_hooks + (hooks or [])
-        _raise_if_invalid_img(img)
-        last = img
-        ctx = PipelineContext(img)
+        boundary_dtype = self.boundary_dtype
+        _raise_if_invalid_img(img, dtypes=utils.IMAGE_DTYPES if boundary_dtype is None else (boundary_dtype,))
+        ctx = PipelineContext(img, cancel_token=cancel_token)
+        run = self.capture.begin_run() if self.capture is not None else None
         _run_hooks('before_pipeline', hooks, ctx=ctx)
-        for name, operator in self.operators.items():
-            _run_hooks('before_operator', hooks, operator=operator, img=last, ctx=ctx)
-            with ctx.scope(name):
-                try:
-                    last = operator.run(last, ctx)
-                except Exception as e:
-                    raise OperatorFailedError(f'Operator {name} failed to run with message "{e}"') from e
-            _raise_if_invalid_img(last, returned_from=name)
-            _run_hooks('after_operator', hooks, operator=operator, img=last, ctx=ctx)
+        last = self._run_operators(list(self.operators.items()), img, ctx, hooks, run=run)
+        if boundary_dtype is not None:
+            last = utils.convert_image(last, boundary_dtype)
         _run_hooks('after_pipeline', hooks, img=last, ctx=ctx)
         return last, ctx
 
+    def _run_operators(self, operators: List[Tuple[str, op_lib.Operator]], img: Image, ctx: PipelineContext,
+                       hooks: List[PipelineHook], run: Optional[int] = None) -> Image:
+        """ Runs a sequence of this pipeline's operators on an image, using an existing context
+
+        ``run`` is the index of the run in the intermediate capture, if any. It defaults to the latest run.
+        """
+        capture = self.capture
+        fuse = self.fuse_luts and capture is None and not any(hook.needs_intermediates for hook in hooks)
+        for stage, lut in _split_lut_stages(operators, fuse, self._pool):
+            ctx.raise_if_cancelled()
+            if lut is None:
+                name, operator = stage[0]
+                img = _run_operator(name, operator, self._pool.get(operator, name), img, ctx, hooks, capture, run)
+            else:
+                img = _run_fused_stage(stage, lut, img, ctx, hooks)
+        return img
+
+    def run_batch(self, imgs: Union[Image, Sequence[Image]], hooks: Optional[List[PipelineHook]] = None,
+                  cancel_token: Optional[CancellationToken] = None) -> Tuple[Image, List[PipelineContext]]:
+        """ Runs the pipeline on a batch of images at once
+
+        ``imgs`` is either a stack of images (``N×H×W`` or ``N×H×W×3``) or a sequence of images with the same shape
+        and dtype. Since an ``H×W×3`` color image would pass for a stack of gray images, 3-D arrays whose last axis
+        is 3 are rejected: gray images that are 3 pixels wide must be passed as a sequence.
+
+        The whole stack goes through each operator's ``run_batch``. Returns the stack of output images and the
+        context of each image. Hooks are still called once per image. ``cancel_token`` cancels the whole batch.
+        """
+        hooks = self._default_hooks + (hooks or [])
+        boundary_dtype = self.boundary_dtype
+        dtypes = utils.IMAGE_DTYPES if boundary_dtype is None else (boundary_dtype,)
+        if not isinstance(imgs, np.ndarray):
+            imgs = _stack(imgs, dtypes)
+        elif imgs.ndim == 3 and imgs.shape[-1] == 3:
+            raise BadImageError(f'Invalid batch of images: array of shape {imgs.shape} looks like a single color '
+                                f'image. Pass a sequence of images instead, or a N×H×W×3 stack for color images')
+        _raise_if_invalid_batch(imgs, dtypes=dtypes)
+        last = imgs
+        ctxs = [PipelineContext(img, cancel_token=cancel_token) for img in imgs]
+        capture = self.capture
+        runs = [capture.begin_run() for _ in ctxs] if capture is not None else None
+        fuse = self.fuse_luts and capture is None and not any(hook.needs_intermediates for hook in hooks)
+        for ctx in ctxs:
+            _run_hooks('before_pipeline', hooks, ctx=ctx)
+        for stage, lut in _split_lut_stages(list(self.operators.items()), fuse, self._pool):
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+            if lut is None:
+                name, operator = stage[0]
+                instance = self._pool.get(operator, name)
+                last = _run_operator_batch(name, operator, instance, last, ctxs, hooks, capture, runs)
+            else:
+                last = _run_fused_stage_batch(stage, lut, last, ctxs, hooks)
+        if boundary_dtype is not None:
+            last = utils.convert_image(last, boundary_dtype)
+        for img, ctx in zip(last, ctxs):
+            _run_hooks('after_pipeline', hooks, img=img, ctx=ctx)
+        return last, ctxs
+
+    def run_stream(self, imgs: Iterable[Image], hooks: Optional[List[PipelineHook]] = None, workers: int = 0) \
+            -> Iterator[Tuple[Image, PipelineContext]]:
+        """ Runs the pipeline on each image, as they become available, yielding results in order
+
+        ``imgs`` can be any iterable of images, like the frame sources from ``ezcv.sources``, which load the next
+        frames in the background while the current one is processed. If ``workers`` is positive, that many images are
+        processed concurrently by a pool of threads.
+        """
+        if not isinstance(workers, int) or workers < 0:
+            raise ValueError(f'Invalid number of workers: {workers}')
+        if workers == 0:
+            for img in imgs:
+                yield self.run(img, hooks=hooks)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        pending = deque()
+        try:
+            for img in imgs:
+                pending.append(executor.submit(self.run, img, hooks))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def teardown(self):
+        """ Calls ``teardown`` on every operator instance that was set up while running the pipeline """
+        self._pool.teardown()
+
+    def warmup(self, shape: Tuple[int, ...], iterations: int = 3, batch_size: Optional[int] = None) \
+            -> Dict[str, OperatorTiming]:
+        """ Runs synthetic frames through the pipeline, so that the first real frames run at full speed
+
+        The first run pays for things like lazy imports, library initialization and first-touch allocations. Returns
+        how long each operator took in the first (cold) run and the median of the remaining (warm) runs, in seconds.
+
+        Parameters:
+            - shape: Shape of the synthetic frames, like (H, W) or (H, W, 3)
+            - iterations: Number of runs, including the cold one
+            - batch_size: If set, warms up ``run_batch`` instead, with batches of this size
+        """
+        if not isinstance(iterations, int) or iterations <= 0:
+            raise ValueError(f'Invalid number of iterations: {iterations}')
+        if batch_size is not None and (not isinstance(batch_size, int) or batch_size <= 0):
+            raise ValueError(f'Invalid batch size: {batch_size}')
+        dtype = self.boundary_dtype or np.uint8
+        if batch_size is not None:
+            shape = (batch_size,) + tuple(shape)
+        img = utils.convert_image(np.random.randint(0, 256, size=shape, dtype=np.uint8), dtype)
+        run = self.run if batch_size is None else self.run_batch
+        timer = _WarmupTimer(self.operators)
+        for _ in range(iterations):
+            run(img, hooks=[timer])
+        return {
+            name: OperatorTiming(
+                cold=durations[0],
+                warm=float(np.median(durations[1:])) if len(durations) > 1 else None
+            )
+            for name, durations in timer.durations.items()
+            if len(durations) > 0
+        }
+
     def add_operator(self, name: str, operator: op_lib.Operator):
         self._raise_if_name_is_unavailable(name)
         self._operators[name] = operator
@@ -48,7 +192,7 @@ class CompVizPipeline(object):
     def remove_operator(self, name_or_index: Union[int, str]):
         index, name = self._identify_operator(name_or_index)
         del self._operators_order[index]
-        del self._operators[name]
+        self._pool.discard(self._operators.pop(name))
 
     def rename_operator(self, name_or_index: Union[int, str], new_name: str):
         index, name = self._identify_operator(name_or_index)
@@ -70,15 +214,31 @@ class CompVizPipeline(object):
 
     @staticmethod
     def load(stream: TextIO) -> "CompVizPipeline":
+        import yaml
         from ezcv.config import create_pipeline
         pipeline_config = yaml.safe_load(stream)
         return create_pipeline(pipeline_config)
 
     def save(self, stream: TextIO):
+        import yaml
         from ezcv.config import get_pipeline_config
         config = get_pipeline_config(self)
         yaml.safe_dump(config, stream, sort_keys=False)
 
+    def __reduce__(self):
+        """ Pickles the pipeline as its config, instead of whatever state its operators hold
+
+        Class-level operator settings are carried along. Capture isn't: it's left disabled on the other side.
+        """
+        from ezcv.config import get_pipeline_config
+        from ezcv.classpath import fully_qualified_name
+        settings = dict()
+        for operator in self._operators.values():
+            cls = type(operator)
+            settings.setdefault(fully_qualified_name(cls), cls.get_settings())
+        options = {'fuse_luts': self.fuse_luts, 'boundary_dtype': self.boundary_dtype}
+        return _rebuild_pipeline, (get_pipeline_config(self), settings, options)
+
     def _identify_operator(self, name_or_index: Union[int, str]) -> Tuple[int, str]:
         """ Returns both the index and name of an operator, given either its index or its name """
         if isinstance(name_or_index, int):  # it's an index
@@ -109,8 +269,38 @@ class CompVizPipeline(object):
             raise ValueError(f'Trying to select an invalid operator index: {index} (from {nb_operators} operators)')
 
 
-def _raise_if_invalid_img(img: Image, returned_from: Optional[str] = None):
-    if not utils.is_image(img):
+class _WarmupTimer(PipelineHook):
+    needs_intermediates = False
+
+    def __init__(self, operators: Dict[str, op_lib.Operator]):
+        # Operators run in order, so the n-th timed operator of a run is the n-th name, even if an operator instance
+        # was added under several names
+        self._names = list(operators)
+        self.durations: Dict[str, List[float]] = {name: list() for name in operators}
+        self._position = 0
+        self._current: Optional[op_lib.Operator] = None
+        self._start = 0.0
+
+    def before_pipeline(self, ctx: PipelineContext):
+        self._position = 0
+        self._current = None
+
+    # With batches, hooks are called once per image: only the first calls count
+    def before_operator(self, operator: op_lib.Operator, img: Image, ctx: PipelineContext):
+        if self._current is not operator:
+            self._current = operator
+            self._start = time.perf_counter()
+
+    def after_operator(self, operator: op_lib.Operator, img: Image, ctx: PipelineContext):
+        if self._current is operator:
+            self.durations[self._names[self._position]].append(time.perf_counter() - self._start)
+            self._position += 1
+            self._current = None
+
+
+def _raise_if_invalid_img(img: Image, returned_from: Optional[str] = None,
+                          dtypes: Sequence[utils.DTypeLike] = (np.uint8,)):
+    if not utils.is_image(img, dtypes):
         message = 'Invalid image'
         if returned_from is not None:
             message += f' returned from "{returned_from}"'
@@ -118,6 +308,183 @@ def _raise_if_invalid_img(img: Image, returned_from: Optional[str] = None):
         raise BadImageError(message)
 
 
+def _raise_if_invalid_batch(imgs: Image, returned_from: Optional[str] = None,
+                            dtypes: Sequence[utils.DTypeLike] = (np.uint8,), size: Optional[int] = None):
+    valid = (
+        isinstance(imgs, np.ndarray) and
+        imgs.ndim in (3, 4) and
+        len(imgs) > 0 and
+        (size is None or len(imgs) == size) and
+        utils.is_image(imgs[0], dtypes)
+    )
+    if not valid:
+        message = 'Invalid batch of images'
+        if returned_from is not None:
+            message += f' returned from "{returned_from}"'
+        if isinstance(imgs, np.ndarray):
+            message += f': array of shape {imgs.shape} and dtype {imgs.dtype}'
+        else:
+            message += f': {imgs}'
+        raise BadImageError(message)
+
+
+def _stack(imgs: Sequence[Image], dtypes: Sequence[utils.DTypeLike]) -> Image:
+    imgs = list(imgs)
+    if len(imgs) == 0:
+        raise BadImageError('Invalid batch of images: the batch is empty')
+    for i, img in enumerate(imgs):
+        if not utils.is_image(img, dtypes):
+            raise BadImageError(f'Invalid batch of images: image {i} is invalid: {img}')
+        if img.shape != imgs[0].shape or img.dtype != imgs[0].dtype:
+            raise BadImageError('Invalid batch of images: images must all have the same shape and dtype')
+    return np.stack(imgs)
+
+
+def _rebuild_pipeline(config: dict, settings: Dict[str, dict], options: dict) -> CompVizPipeline:
+    from ezcv.config import create_pipeline
+    from ezcv.classpath import class_from_fully_qualified_name
+    for fqn, cls_settings in settings.items():
+        cls = class_from_fully_qualified_name(fqn)
+        for setting, value in cls_settings.items():
+            cls.set(setting, value)
+    pipeline = create_pipeline(config, validate=False)
+    for name, value in options.items():
+        setattr(pipeline, name, value)
+    return pipeline
+
+
+def _run_operator(name: str, operator: op_lib.Operator, instance: op_lib.Operator, img: Image, ctx: PipelineContext,
+                  hooks: List[PipelineHook], capture: Optional[IntermediateCapture],
+                  run: Optional[int] = None) -> Image:
+    """ Runs a single operator
+
+    ``instance`` is what actually runs: either the operator itself or its clone for the current thread. Hooks always
+    get the operator that was added to the pipeline.
+    """
+    img = _negotiate_dtype(operator, img)
+    _run_hooks('before_operator', hooks, operator=operator, img=img, ctx=ctx)
+    with ctx.scope(name):
+        try:
+            img = instance.run(img, ctx)
+        except RunCancelledError:
+            raise
+        except Exception as e:
+            raise OperatorFailedError(f'Operator {name} failed to run with message "{e}"') from e
+    _raise_if_invalid_img(img, returned_from=name, dtypes=utils.IMAGE_DTYPES)
+    if capture is not None:
+        capture.record(name, img, run=run)
+    _run_hooks('after_operator', hooks, operator=operator, img=img, ctx=ctx)
+    return img
+
+
+def _run_operator_batch(name: str, operator: op_lib.Operator, instance: op_lib.Operator, imgs: Image,
+                        ctxs: List[PipelineContext], hooks: List[PipelineHook],
+                        capture: Optional[IntermediateCapture], runs: Optional[List[int]]) -> Image:
+    imgs = _negotiate_dtype(operator, imgs)
+    for img, ctx in zip(imgs, ctxs):
+        _run_hooks('before_operator', hooks, operator=operator, img=img, ctx=ctx)
+    with ExitStack() as scopes:
+        for ctx in ctxs:
+            scopes.enter_context(ctx.scope(name))
+        try:
+            imgs = instance.run_batch(imgs, ctxs)
+        except RunCancelledError:
+            raise
+        except Exception as e:
+            raise OperatorFailedError(f'Operator {name} failed to run with message "{e}"') from e
+    _raise_if_invalid_batch(imgs, returned_from=name, dtypes=utils.IMAGE_DTYPES, size=len(ctxs))
+    for i, (img, ctx) in enumerate(zip(imgs, ctxs)):
+        if capture is not None:
+            capture.record(name, img, run=runs[i])
+        _run_hooks('after_operator', hooks, operator=operator, img=img, ctx=ctx)
+    return imgs
+
+
+def _run_fused_stage_batch(stage: List[Tuple[str, op_lib.Operator]], lut: np.ndarray, imgs: Image,
+                           ctxs: List[PipelineContext], hooks: List[PipelineHook]) -> Image:
+    imgs = utils.convert_image(imgs, np.uint8)
+    outputs = None
+    for name, operator in stage:
+        for img, ctx in zip(imgs, ctxs):
+            _run_hooks('before_operator', hooks, operator=operator, img=img, ctx=ctx)
+        for ctx in ctxs:
+            with ctx.scope(name):
+                pass
+        if outputs is None:
+            outputs = np.take(lut, imgs)
+        for output, ctx in zip(outputs, ctxs):
+            _run_hooks('after_operator', hooks, operator=operator, img=output, ctx=ctx)
+    return outputs
+
+
+def _run_fused_stage(stage: List[Tuple[str, op_lib.Operator]], lut: np.ndarray, img: Image,
+                     ctx: PipelineContext, hooks: List[PipelineHook]) -> Image:
+    """ Runs consecutive pointwise operators as a single lookup
+
+    Hooks are still called for every operator, but they all see the stage's input and output images. The lookup
+    itself happens while running the first operator of the stage.
+    """
+    img = utils.convert_image(img, np.uint8)
+    output = None
+    for name, operator in stage:
+        _run_hooks('before_operator', hooks, operator=operator, img=img, ctx=ctx)
+        with ctx.scope(name):
+            if output is None:
+                output = np.take(lut, img)
+        _run_hooks('after_operator', hooks, operator=operator, img=output, ctx=ctx)
+    return output
+
+
+def _split_lut_stages(operators: List[Tuple[str, op_lib.Operator]], fuse: bool, pool: OperatorPool) \
+        -> List[Tuple[List[Tuple[str, op_lib.Operator]], Optional[np.ndarray]]]:
+    """ Splits the operators into stages that run as a unit
+
+    Each stage is either a single operator, with no LUT, or a run of consecutive pointwise operators, along with the
+    LUT resulting from their composition
+    """
+    stages = list()
+    current: List[Tuple[str, op_lib.Operator]] = list()
+    current_lut = None
+    for name, operator in operators:
+        lut = _get_lut(name, pool.get(operator, name)) if fuse else None
+        if lut is None:
+            stages.extend(_close_lut_stage(current, current_lut))
+            current, current_lut = list(), None
+            stages.append(([(name, operator)], None))
+        else:
+            current.append((name, operator))
+            current_lut = lut if current_lut is None else lut[current_lut]
+    stages.extend(_close_lut_stage(current, current_lut))
+    return stages
+
+
+def _close_lut_stage(stage: List[Tuple[str, op_lib.Operator]], lut: Optional[np.ndarray]) \
+        -> List[Tuple[List[Tuple[str, op_lib.Operator]], Optional[np.ndarray]]]:
+    if len(stage) == 0:
+        return []
+    if len(stage) == 1:
+        # Not worth it: just let the operator run by itself
+        return [(stage, None)]
+    return [(stage, lut)]
+
+
+def _negotiate_dtype(operator: op_lib.Operator, img: Image) -> Image:
+    """ Converts the image to a dtype the operator accepts, but only if it doesn't accept the current one """
+    accepted_dtypes = operator.get(op_lib.settings.INPUT_DTYPES)
+    if img.dtype in accepted_dtypes:
+        return img
+    return utils.convert_image(img, accepted_dtypes[0])
+
+
+def _get_lut(name: str, operator: op_lib.Operator) -> Optional[np.ndarray]:
+    lut = operator.get_lut()
+    if lut is None:
+        return None
+    if not isinstance(lut, np.ndarray) or lut.shape != (256,) or lut.dtype != np.uint8:
+        raise OperatorFailedError(f'Operator {name} returned an invalid LUT: {lut}')
+    return lut
+
+
 def _run_hooks(method: str, hooks: List[PipelineHook], **kwargs):
     for hook in hooks:
         getattr(hook, method)(**kwargs)
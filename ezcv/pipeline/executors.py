@@ -0,0 +1,271 @@
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from ezcv import utils
+from ezcv.operator import Operator, settings
+from ezcv.pipeline.context import PipelineContext
+from ezcv.pipeline.core import CompVizPipeline, _negotiate_dtype, _raise_if_invalid_img, _run_hooks
+from ezcv.pipeline.pool import OperatorPool
+from ezcv.typing import Image
+
+
+THREADS = 'threads'
+PROCESSES = 'processes'
+
+# Operators whose thread speedup is below this are considered to hold the GIL
+DEFAULT_SPEEDUP_THRESHOLD = 1.5
+
+_calibration_lock = threading.Lock()
+_calibrated: Dict[Type[Operator], bool] = dict()
+
+
+def measure_thread_scaling(operator: Operator, img: Image, threads: int = 4, repeats: int = 2, rounds: int = 5) \
+        -> float:
+    """ Measures how much faster an operator runs on ``threads`` threads than on a single one
+
+    The operator runs ``threads * repeats`` times on ``img``, first serially, then split across the threads. Returns
+    the ratio between both durations: close to ``threads`` for operators that release the GIL, and close to 1 (or
+    below) for those that hold it. This is measured ``rounds`` times, and the median ratio is returned, to filter out
+    noise.
+    """
+    if not isinstance(threads, int) or threads <= 1:
+        raise ValueError(f'Invalid number of threads: {threads}')
+    if not isinstance(repeats, int) or repeats <= 0:
+        raise ValueError(f'Invalid number of repeats: {repeats}')
+    if not isinstance(rounds, int) or rounds <= 0:
+        raise ValueError(f'Invalid number of rounds: {rounds}')
+    img = _negotiate_dtype(operator, img)
+    pool = OperatorPool()
+    try:
+        instance = pool.get(operator)
+        instance.run(img, PipelineContext(img))
+        ratios = list()
+        for _ in range(rounds):
+            serial = _time_serial(instance, img, threads * repeats)
+            parallel = _time_parallel(pool, operator, img, threads, repeats)
+            ratios.append(serial / max(parallel, 1e-9))
+    finally:
+        pool.teardown()
+    return statistics.median(ratios)
+
+
+def _time_serial(instance: Operator, img: Image, count: int) -> float:
+    ctxs = [PipelineContext(img) for _ in range(count)]
+    start = time.perf_counter()
+    for ctx in ctxs:
+        instance.run(img, ctx)
+    return time.perf_counter() - start
+
+
+def _time_parallel(pool: OperatorPool, operator: Operator, img: Image, threads: int, repeats: int) -> float:
+    ctxs = [PipelineContext(img) for _ in range(threads * repeats)]
+    start = [0.0]
+
+    def start_clock():
+        # Called by the barrier before releasing anyone: once released, workers can hold the GIL for a while before
+        # the main thread gets to read the clock
+        start[0] = time.perf_counter()
+
+    barrier = threading.Barrier(threads + 1, action=start_clock)
+    errors: List[Exception] = list()
+
+    def work(chunk: List[PipelineContext]):
+        try:
+            instance = pool.get(operator)
+            instance.run(img, PipelineContext(img))
+        except Exception as e:
+            errors.append(e)
+        barrier.wait()
+        if len(errors) > 0:
+            return
+        try:
+            for ctx in chunk:
+                instance.run(img, ctx)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=work, args=(ctxs[i::threads],)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    for worker in workers:
+        worker.join()
+    duration = time.perf_counter() - start[0]
+    if len(errors) > 0:
+        raise errors[0]
+    return duration
+
+
+def releases_gil(operator: Operator, img: Image, threads: int = 4,
+                 threshold: float = DEFAULT_SPEEDUP_THRESHOLD) -> bool:
+    """ Tells whether an operator releases the GIL, so that it scales with threads
+
+    Operators declaring the RELEASES_GIL setting are taken at their word. Other operators are calibrated on ``img``
+    with ``measure_thread_scaling``, and the result is cached for their class.
+    """
+    declared = operator.get(settings.RELEASES_GIL)
+    if declared is not None:
+        return declared
+    cls = type(operator)
+    with _calibration_lock:
+        if cls in _calibrated:
+            return _calibrated[cls]
+    result = measure_thread_scaling(operator, img, threads=threads) >= threshold
+    with _calibration_lock:
+        return _calibrated.setdefault(cls, result)
+
+
+def clear_calibration():
+    """ Forgets the result of every calibration made by ``releases_gil`` """
+    with _calibration_lock:
+        _calibrated.clear()
+
+
+class StagedExecutor(object):
+    """ Runs a pipeline over many frames, using threads for operators that release the GIL and processes for the rest
+
+    Consecutive operators of the same kind are grouped into stages. Thread stages run in the thread handling the
+    frame, while process stages are sent, along with the frame's context, to a pool of processes that hold a copy of
+    their operators. The pipeline is shipped to the processes as its config, and the plan is fixed when the executor
+    is created: later changes to the pipeline's operators aren't seen by process stages.
+
+    Operators that don't declare RELEASES_GIL are calibrated on ``sample``, which is run through the pipeline to get
+    each operator's input. Without a sample, they're run on threads. Intermediate captures only see thread stages.
+
+    Parameters:
+        - pipeline: The pipeline to run
+        - threads: Number of frames processed concurrently
+        - processes: Number of processes running GIL-bound stages. If 0, everything runs on threads
+        - sample: Image used to calibrate operators that don't declare RELEASES_GIL
+        - calibration_threads: Number of threads used to calibrate operators
+    """
+    def __init__(self, pipeline: CompVizPipeline, threads: int = 4, processes: int = 2, sample: Optional[Image] = None,
+                 calibration_threads: int = 4):
+        if not isinstance(threads, int) or threads <= 0:
+            raise ValueError(f'Invalid number of threads: {threads}')
+        if not isinstance(processes, int) or processes < 0:
+            raise ValueError(f'Invalid number of processes: {processes}')
+        self.pipeline = pipeline
+        self.threads = threads
+        operators = list(pipeline.operators.items())
+        if processes == 0:
+            kinds = [THREADS] * len(operators)
+        else:
+            kinds = _calibrate_pipeline(pipeline, sample, calibration_threads)
+        self._stages = _group_stages(operators, kinds)
+        self._thread_executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='ezcv-stage')
+        self._process_executor: Optional[ProcessPoolExecutor] = None
+        stage_pipelines = [_sub_pipeline(pipeline, stage) for kind, stage in self._stages if kind == PROCESSES]
+        if len(stage_pipelines) > 0:
+            self._process_executor = ProcessPoolExecutor(
+                max_workers=processes,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process_stages,
+                initargs=(stage_pipelines,)
+            )
+
+    @property
+    def plan(self) -> List[Tuple[str, List[str]]]:
+        """ The stages the pipeline is split into, as their kind (THREADS or PROCESSES) and operator names """
+        return [(kind, [name for name, _ in stage]) for kind, stage in self._stages]
+
+    def run(self, img: Image) -> Tuple[Image, PipelineContext]:
+        """ Runs the pipeline on a single image, from the calling thread """
+        pipeline = self.pipeline
+        hooks = pipeline._default_hooks
+        boundary_dtype = pipeline.boundary_dtype
+        _raise_if_invalid_img(img, dtypes=utils.IMAGE_DTYPES if boundary_dtype is None else (boundary_dtype,))
+        ctx = PipelineContext(img)
+        run = pipeline.capture.begin_run() if pipeline.capture is not None else None
+        _run_hooks('before_pipeline', hooks, ctx=ctx)
+        last = img
+        process_stage = 0
+        for kind, stage in self._stages:
+            if kind == THREADS:
+                last = pipeline._run_operators(stage, last, ctx, hooks, run=run)
+            else:
+                last, ctx = self._process_executor.submit(_run_process_stage, process_stage, last, ctx).result()
+                process_stage += 1
+        if boundary_dtype is not None:
+            last = utils.convert_image(last, boundary_dtype)
+        _run_hooks('after_pipeline', hooks, img=last, ctx=ctx)
+        return last, ctx
+
+    def map(self, imgs: Iterable[Image]) -> Iterator[Tuple[Image, PipelineContext]]:
+        """ Runs the pipeline on each image, ``threads`` at a time, yielding results in order """
+        pending = deque()
+        try:
+            for img in imgs:
+                pending.append(self._thread_executor.submit(self.run, img))
+                if len(pending) >= 2 * self.threads:
+                    yield pending.popleft().result()
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self):
+        self._thread_executor.shutdown(wait=True)
+        if self._process_executor is not None:
+            self._process_executor.shutdown(wait=True)
+
+    def __enter__(self) -> 'StagedExecutor':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _calibrate_pipeline(pipeline: CompVizPipeline, sample: Optional[Image], threads: int) -> List[str]:
+    """ Decides where each operator runs, running the sample through the pipeline to get each operator's input """
+    kinds = list()
+    img = sample
+    ctx = PipelineContext(sample) if sample is not None else None
+    for name, operator in pipeline.operators.items():
+        declared = operator.get(settings.RELEASES_GIL)
+        if declared is None and img is None:
+            kinds.append(THREADS)
+            continue
+        kinds.append(THREADS if releases_gil(operator, img, threads=threads) else PROCESSES)
+        if img is not None:
+            img = pipeline._run_operators([(name, operator)], img, ctx, pipeline._default_hooks)
+    return kinds
+
+
+def _group_stages(operators: List[Tuple[str, Operator]], kinds: List[str]) \
+        -> List[Tuple[str, List[Tuple[str, Operator]]]]:
+    stages = list()
+    for (name, operator), kind in zip(operators, kinds):
+        if len(stages) > 0 and stages[-1][0] == kind:
+            stages[-1][1].append((name, operator))
+        else:
+            stages.append((kind, [(name, operator)]))
+    return stages
+
+
+def _sub_pipeline(pipeline: CompVizPipeline, operators: List[Tuple[str, Operator]]) -> CompVizPipeline:
+    sub_pipeline = CompVizPipeline()
+    for name, operator in operators:
+        sub_pipeline.add_operator(name, operator)
+    sub_pipeline.fuse_luts = pipeline.fuse_luts
+    sub_pipeline.boundary_dtype = None
+    return sub_pipeline
+
+
+_process_stages: List[CompVizPipeline] = list()
+
+
+def _init_process_stages(pipelines: List[CompVizPipeline]):
+    _process_stages[:] = pipelines
+
+
+def _run_process_stage(index: int, img: Image, ctx: PipelineContext) -> Tuple[Image, PipelineContext]:
+    pipeline = _process_stages[index]
+    img = pipeline._run_operators(list(pipeline.operators.items()), img, ctx, pipeline._default_hooks)
+    return img, ctx
@@ -5,6 +5,10 @@ from ezcv.typing import Image
 
 
 class PipelineHook:
+    # Whether the hook needs to see the actual image returned by every operator. Hooks that only look at the
+    # image's shape and dtype can set it to False, so that the pipeline can still fuse pointwise operators.
+    needs_intermediates = True
+
     def before_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
         pass
 
@@ -21,6 +25,8 @@ class PipelineHook:
 class GrayOnlyHook(PipelineHook):
     """ Makes sure the GRAY_ONLY setting is being followed
     """
+    needs_intermediates = False
+
     def before_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
         if operator.get(settings.GRAY_ONLY) is True and img.ndim > 2:
             raise OperatorFailedError(f'Operator {operator.__class__.__name__} expects a gray image')
@@ -0,0 +1,105 @@
+import copy
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ezcv.exceptions import OperatorFailedError
+from ezcv.operator import Operator, ParameterSpec, settings
+
+
+class OperatorPool(object):
+    """ Hands out the operator instances each thread should run, making sure they've been set up
+
+    Thread-safe operators are shared by all threads and set up once. Other operators are cloned for each thread, and
+    each clone is set up separately. Clones are kept in sync with the parameters of the original operator. Clones of
+    threads that have exited are torn down the next time a clone is set up, or when the pool is torn down.
+
+    Errors raised by ``setup`` are raised as ``OperatorFailedError``.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shared: Dict[int, Operator] = dict()
+        # Every clone handed out, by id, along with the thread it belongs to and the operator it was copied from
+        self._clones: Dict[int, Tuple[threading.Thread, Operator, Operator]] = dict()
+        # The current thread's clones, by id of the original operator
+        self._local = threading.local()
+
+    def get(self, operator: Operator, name: Optional[str] = None) -> Operator:
+        """ Returns the instance of the operator the current thread should run
+
+        ``name`` is the operator's name in the pipeline, used in error messages.
+        """
+        if operator.get(settings.THREAD_SAFE):
+            if id(operator) not in self._shared:
+                self._setup_shared(operator, name)
+            return operator
+
+        clones: Dict[int, Operator] = self._local.__dict__.setdefault('clones', dict())
+        clone = clones.get(id(operator))
+        entry = self._clones.get(id(clone)) if clone is not None else None
+        # The clone may have been torn down by `discard` or `teardown`, or belong to a dead operator with the same id
+        if entry is None or entry[1] is not operator or entry[2] is not clone:
+            self._reap()
+            clone = copy.copy(operator)
+            _setup(clone, operator, name)
+            with self._lock:
+                self._clones[id(clone)] = (threading.current_thread(), operator, clone)
+            clones[id(operator)] = clone
+        else:
+            _sync_parameters(operator, clone)
+        return clone
+
+    def discard(self, operator: Operator):
+        """ Tears down every instance of an operator """
+        with self._lock:
+            instances = list()
+            if self._shared.get(id(operator)) is operator:
+                instances.append(self._shared.pop(id(operator)))
+            for key in [key for key, (_, original, _) in self._clones.items() if original is operator]:
+                instances.append(self._clones.pop(key)[2])
+        _teardown(instances)
+
+    def teardown(self):
+        """ Tears down every instance handed out so far """
+        with self._lock:
+            instances = list(self._shared.values()) + [clone for _, _, clone in self._clones.values()]
+            self._shared.clear()
+            self._clones.clear()
+        _teardown(instances)
+
+    def _reap(self):
+        """ Tears down the clones of threads that have exited """
+        with self._lock:
+            dead = [key for key, (thread, _, _) in self._clones.items() if not thread.is_alive()]
+            instances = [self._clones.pop(key)[2] for key in dead]
+        _teardown(instances)
+
+    def _setup_shared(self, operator: Operator, name: Optional[str]):
+        with self._lock:
+            if id(operator) in self._shared:
+                return
+            _setup(operator, operator, name)
+            self._shared[id(operator)] = operator
+
+
+def _setup(instance: Operator, operator: Operator, name: Optional[str]):
+    try:
+        instance.setup()
+    except Exception as e:
+        name = name if name is not None else type(operator).__name__
+        raise OperatorFailedError(f'Operator {name} failed to set up with message "{e}"') from e
+
+
+def _sync_parameters(operator: Operator, clone: Operator):
+    cls = type(operator)
+    for name in operator.__dict__.keys() | clone.__dict__.keys():
+        if not isinstance(getattr(cls, name, None), ParameterSpec):
+            continue
+        if name in operator.__dict__:
+            clone.__dict__[name] = operator.__dict__[name]
+        else:
+            clone.__dict__.pop(name, None)
+
+
+def _teardown(instances: List[Operator]):
+    for instance in instances:
+        instance.teardown()
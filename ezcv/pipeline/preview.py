@@ -0,0 +1,210 @@
+import copy
+import threading
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+
+from ezcv.exceptions import RunCancelledError
+from ezcv.operator import Operator
+from ezcv.pipeline.context import CancellationToken, PipelineContext
+from ezcv.pipeline.core import CompVizPipeline
+from ezcv.pipeline.hooks import PipelineHook
+from ezcv.typing import Image
+
+ResultCallback = Callable[[Image, PipelineContext], None]
+
+
+def downsample(img: Image, factor: int) -> Image:
+    """ Shrinks an image by an integer factor, averaging each ``factor×factor`` block of pixels
+
+    Rows and columns that don't fill a whole block are dropped. The image keeps its dtype.
+    """
+    if not isinstance(factor, int) or factor <= 0:
+        raise ValueError(f'Invalid factor: {factor}')
+    if factor == 1:
+        return img
+    height, width = img.shape[:2]
+    block_height, block_width = min(factor, height), min(factor, width)
+    out_height, out_width = height // block_height, width // block_width
+    blocks = img[:out_height * block_height, :out_width * block_width]
+    blocks = blocks.reshape((out_height, block_height, out_width, block_width) + img.shape[2:])
+    mean = blocks.mean(axis=(1, 3))
+    if np.issubdtype(img.dtype, np.integer):
+        mean = np.rint(mean)
+    return mean.astype(img.dtype)
+
+
+def scale_operator(operator: Operator, factor: float) -> Operator:
+    """ Returns a copy of an operator whose spatial parameters are scaled by ``factor`` """
+    scaled = copy.copy(operator)
+    _sync_scaled_parameters(operator, scaled, factor)
+    return scaled
+
+
+def scale_pipeline(pipeline: CompVizPipeline, factor: float) -> CompVizPipeline:
+    """ Returns a copy of a pipeline whose operators' spatial parameters are scaled by ``factor`` """
+    scaled = CompVizPipeline()
+    for name, operator in pipeline.operators.items():
+        scaled.add_operator(name, scale_operator(operator, factor))
+    scaled.fuse_luts = pipeline.fuse_luts
+    scaled.boundary_dtype = pipeline.boundary_dtype
+    return scaled
+
+
+def run_preview(pipeline: CompVizPipeline, img: Image, factor: int = 4, hooks: Optional[List[PipelineHook]] = None) \
+        -> Tuple[Image, PipelineContext]:
+    """ Runs the pipeline on the image downsampled by ``factor``, with its spatial parameters scaled to match
+
+    The output is ``factor`` times smaller than the full-resolution output, but otherwise looks like it.
+    """
+    preview_pipeline = scale_pipeline(pipeline, 1 / factor)
+    try:
+        return preview_pipeline.run(downsample(img, factor), hooks=hooks)
+    finally:
+        preview_pipeline.teardown()
+
+
+def _sync_scaled_parameters(operator: Operator, scaled: Operator, factor: float):
+    for name, spec in operator.get_parameters_specs().items():
+        scaled.__dict__[name] = spec.scale(getattr(operator, name), factor)
+
+
+class PreviewRunner(object):
+    """ Runs a pipeline on a downsampled preview first, and then at full resolution in the background
+
+    Meant for interactive tuning: ``run`` returns the preview right away, while the full-resolution run is handed to a
+    background thread. When it finishes, ``on_full`` is called with its output, which should replace the preview.
+    Only the latest image gets a full-resolution run: calling ``run`` again replaces the image waiting for one, and
+    cancels the full-resolution run in progress, if any.
+
+    Parameters are read from the pipeline on each run, so it can be tweaked between runs. The preview runs on scaled
+    copies of the pipeline's operators, which are kept, and set up, across runs.
+
+    Parameters:
+        - pipeline: The pipeline to run
+        - factor: Factor the preview is downsampled by
+        - on_full: Called, from the background thread, with the full-resolution output and context of the latest run
+        - hooks: Extra hooks passed to every run
+    """
+    def __init__(self, pipeline: CompVizPipeline, factor: int = 4, on_full: Optional[ResultCallback] = None,
+                 hooks: Optional[List[PipelineHook]] = None):
+        if not isinstance(factor, int) or factor <= 0:
+            raise ValueError(f'Invalid factor: {factor}')
+        self.pipeline = pipeline
+        self.factor = factor
+        self.on_full = on_full
+        self.hooks = hooks or []
+        self.last_error: Optional[Exception] = None
+        # Scaled copies of the pipeline's operators, and the operators they were copied from
+        self._preview_pipeline: Optional[CompVizPipeline] = None
+        self._originals: List[Tuple[str, Operator]] = list()
+        self._preview_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._generation = 0
+        self._pending: Optional[Tuple[int, Image]] = None
+        self._token: Optional[CancellationToken] = None
+        self._full: Optional[Tuple[int, Optional[Tuple[Image, PipelineContext]], Optional[Exception]]] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._loop, name='ezcv-preview', daemon=True)
+        self._thread.start()
+
+    def run(self, img: Image) -> Tuple[Image, PipelineContext]:
+        """ Returns the preview of an image, and schedules its full-resolution run """
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('PreviewRunner is closed')
+            self._generation += 1
+            self._pending = (self._generation, img)
+            if self._token is not None:
+                self._token.cancel()
+            self._condition.notify_all()
+        with self._preview_lock:
+            return self._sync_preview_pipeline().run(downsample(img, self.factor), hooks=self.hooks)
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Tuple[Image, PipelineContext]]:
+        """ Waits for the full-resolution output of the latest run, and returns it along with its context
+
+        Returns None on timeout, or if nothing was run yet. Raises the error of the full-resolution run if it failed.
+        """
+        with self._condition:
+            if self._generation == 0:
+                return None
+            if not self._condition.wait_for(lambda: self._full is not None and self._full[0] == self._generation,
+                                            timeout):
+                return None
+            _, result, error = self._full
+        if error is not None:
+            raise error
+        return result
+
+    def close(self):
+        """ Stops the background thread, dropping the image waiting for its full-resolution run, if any """
+        with self._condition:
+            self._closed = True
+            self._pending = None
+            if self._token is not None:
+                self._token.cancel()
+            self._condition.notify_all()
+        self._thread.join()
+        with self._preview_lock:
+            if self._preview_pipeline is not None:
+                self._preview_pipeline.teardown()
+
+    def __enter__(self) -> 'PreviewRunner':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _sync_preview_pipeline(self) -> CompVizPipeline:
+        """ Mirrors the pipeline's operators with scaled parameters, rebuilding the preview pipeline if they changed """
+        operators = list(self.pipeline.operators.items())
+        if self._preview_pipeline is None or not _same_operators(operators, self._originals):
+            if self._preview_pipeline is not None:
+                self._preview_pipeline.teardown()
+            self._originals = operators
+            self._preview_pipeline = CompVizPipeline()
+            for name, operator in operators:
+                self._preview_pipeline.add_operator(name, copy.copy(operator))
+        preview = self._preview_pipeline
+        for (_, original), scaled in zip(operators, preview.operators.values()):
+            _sync_scaled_parameters(original, scaled, 1 / self.factor)
+        preview.fuse_luts = self.pipeline.fuse_luts
+        preview.boundary_dtype = self.pipeline.boundary_dtype
+        return preview
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or self._closed)
+                if self._closed:
+                    return
+                generation, img = self._pending
+                self._pending = None
+                token = self._token = CancellationToken()
+            result, error = None, None
+            try:
+                result = self.pipeline.run(img, hooks=self.hooks, cancel_token=token)
+            except RunCancelledError:
+                continue
+            except Exception as e:
+                error = e
+            with self._condition:
+                self._token = None
+                latest = generation == self._generation
+                if latest:
+                    self._full = (generation, result, error)
+                    self._condition.notify_all()
+            if error is not None:
+                self.last_error = error
+            elif latest and self.on_full is not None:
+                try:
+                    self.on_full(*result)
+                except Exception as e:
+                    self.last_error = e
+
+
+def _same_operators(operators: List[Tuple[str, Operator]], others: List[Tuple[str, Operator]]) -> bool:
+    return len(operators) == len(others) and all(
+        name == other_name and operator is other for (name, operator), (other_name, other) in zip(operators, others)
+    )
@@ -0,0 +1,219 @@
+import cProfile
+import pstats
+import threading
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple, Type, Union
+
+from ezcv.operator import Operator
+from ezcv.pipeline.context import PipelineContext
+from ezcv.pipeline.hooks import PipelineHook
+from ezcv.typing import Image
+
+_Function = Tuple[str, int, str]
+# Stacks are written in whole microseconds, anything shorter is rounded away
+_MIN_SECONDS = 0.5e-6
+
+
+class ProfileHook(PipelineHook):
+    """ Profiles selected operators with ``cProfile``, aggregating the stats of every run
+
+    The profiler is only enabled while the selected operators run, so the rest of the pipeline doesn't show up in the
+    profile. Each thread running the pipeline gets its own profiler, and all of them are merged in ``stats``. Add the
+    hook last, so that the other hooks don't run while the profiler is enabled.
+
+    Parameters:
+        - select: Operators to profile, either by name or by class (including subclasses)
+        - operator_names: Names of the pipeline's operators, like ``pipeline.operators``. Required to select by name
+    """
+    needs_intermediates = False
+
+    def __init__(self, select: Iterable[Union[str, Type[Operator]]],
+                 operator_names: Optional[Dict[str, Operator]] = None):
+        operator_names = operator_names or dict()
+        self._selected_ids = set()
+        self._names = {id(operator): name for name, operator in operator_names.items()}
+        classes = list()
+        for item in select:
+            if isinstance(item, str):
+                if item not in operator_names:
+                    raise ValueError(f'Unknown operator name: "{item}" (from operators {list(operator_names)})')
+                self._selected_ids.add(id(operator_names[item]))
+            elif isinstance(item, type) and issubclass(item, Operator):
+                classes.append(item)
+            else:
+                raise ValueError(f'Invalid operator selection: {item}')
+        self._selected_classes = tuple(classes)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profiles: List[cProfile.Profile] = list()
+        self._calls: Counter = Counter()
+
+    @property
+    def calls(self) -> Dict[str, int]:
+        """ Number of times each operator was profiled, by name (or class name, for unnamed operators) """
+        return dict(self._calls)
+
+    def before_pipeline(self, ctx: PipelineContext):
+        self._deactivate()
+
+    def before_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+        # With batches, hooks are called once per image: the profiler stays enabled from the first call
+        active = getattr(self._local, 'active', None)
+        if active is operator:
+            return
+        if active is not None:
+            # The previously profiled operator raised, so its after_operator was never called
+            self._deactivate()
+        if not self._is_selected(operator):
+            return
+        profile = getattr(self._local, 'profile', None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._profiles.append(profile)
+        self._local.active = operator
+        profile.enable()
+
+    def after_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+        if getattr(self._local, 'active', None) is not operator:
+            return
+        self._local.profile.disable()
+        self._local.active = None
+        with self._lock:
+            self._calls[self._names.get(id(operator), type(operator).__name__)] += 1
+
+    def stats(self) -> pstats.Stats:
+        """ Merges the stats of every thread. Shouldn't be called while the pipeline is running """
+        stats = pstats.Stats()
+        with self._lock:
+            profiles = list(self._profiles)
+        for profile in profiles:
+            profile.create_stats()
+            if len(profile.stats) > 0:
+                stats.add(profile)
+        return stats
+
+    def dump_stats(self, path: str):
+        """ Writes the stats in the pstats format, readable by ``pstats`` or tools like snakeviz """
+        self.stats().dump_stats(path)
+
+    def collapsed_stacks(self) -> List[str]:
+        """ Returns the profile in the collapsed stack format used by flamegraph tools, like ``flamegraph.pl``
+
+        Each line is a ``;``-separated call stack followed by the time spent in its last function, in microseconds.
+        cProfile only records callers, not whole stacks, so the time of functions called from several places is split
+        between their callers in proportion to the time spent in each.
+        """
+        return _collapse(self.stats().stats)
+
+    def write_collapsed(self, path: str):
+        with open(path, 'w') as f:
+            f.writelines(line + '\n' for line in self.collapsed_stacks())
+
+    def reset(self):
+        """ Forgets everything recorded so far """
+        with self._lock:
+            self._profiles.clear()
+            self._calls.clear()
+        self._local = threading.local()
+
+    def _deactivate(self):
+        if getattr(self._local, 'active', None) is not None:
+            self._local.profile.disable()
+            self._local.active = None
+
+    def _is_selected(self, operator: Operator) -> bool:
+        return id(operator) in self._selected_ids or isinstance(operator, self._selected_classes)
+
+
+def _collapse(stats: Dict[_Function, tuple]) -> List[str]:
+    callees: Dict[_Function, List[_Function]] = {func: list() for func in stats}
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller in callers:
+            if caller in callees:
+                callees[caller].append(func)
+    roots = [func for func, (_, _, _, _, callers) in stats.items() if not any(c in stats for c in callers)]
+
+    components = _strongly_connected_components(callees)
+    # Own time of the stacks below each function, relative to the stack of the function itself. Recursive calls are
+    # cut, so a subtree only depends on the functions of its path that are part of the same recursion. Shares are at
+    # most 1, so stacks that wouldn't show up in the output even at full share are dropped right away
+    subtrees: Dict[Tuple[_Function, FrozenSet[_Function]], Dict[Tuple[str, ...], float]] = dict()
+
+    def walk(func: _Function, on_path: FrozenSet[_Function]) -> Dict[Tuple[str, ...], float]:
+        key = (func, on_path & components[func])
+        if key in subtrees:
+            return subtrees[key]
+        label = (_label(func),)
+        subtree: Dict[Tuple[str, ...], float] = {label: stats[func][2]}
+        for callee in callees[func]:
+            if callee in on_path:
+                continue
+            callee_total = stats[callee][3]
+            time_from_func = stats[callee][4][func][3]
+            if callee_total <= 0 or time_from_func < _MIN_SECONDS:
+                continue
+            share = time_from_func / callee_total
+            for stack, seconds in walk(callee, on_path | {callee}).items():
+                if seconds * share >= _MIN_SECONDS:
+                    subtree[label + stack] = subtree.get(label + stack, 0.0) + seconds * share
+        subtrees[key] = subtree
+        return subtree
+
+    samples: Counter = Counter()
+    for root in roots:
+        for stack, seconds in walk(root, frozenset((root,))).items():
+            samples[';'.join(stack)] += seconds
+    return [f'{stack} {round(seconds * 1e6)}' for stack, seconds in samples.items() if round(seconds * 1e6) > 0]
+
+
+def _strongly_connected_components(graph: Dict[_Function, List[_Function]]) -> Dict[_Function, FrozenSet[_Function]]:
+    """ Maps each node to the set of nodes it is mutually reachable with (Tarjan's algorithm, without recursion)
+    """
+    index: Dict[_Function, int] = dict()
+    low: Dict[_Function, int] = dict()
+    stack: List[_Function] = list()
+    on_stack = set()
+    components: Dict[_Function, FrozenSet[_Function]] = dict()
+    for start in graph:
+        if start in index:
+            continue
+        work = [(start, iter(graph[start]))]
+        index[start] = low[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, successors = work[-1]
+            for successor in successors:
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(graph[successor])))
+                    break
+                if successor in on_stack:
+                    low[node] = min(low[node], index[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    component = frozenset(component)
+                    for member in component:
+                        components[member] = component
+    return components
+
+
+def _label(func: _Function) -> str:
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f'{name} ({filename}:{line})'
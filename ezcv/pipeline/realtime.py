@@ -0,0 +1,302 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, List
+
+from ezcv.exceptions import DeadlineExceededError, RunCancelledError
+from ezcv.operator import Operator
+from ezcv.pipeline.context import CancellationToken, PipelineContext
+from ezcv.pipeline.core import CompVizPipeline
+from ezcv.pipeline.hooks import PipelineHook
+from ezcv.typing import Image
+
+
+class DeadlineHook(PipelineHook):
+    """ Aborts a run between operators once its deadline has passed
+
+    ``deadline`` is a ``time.monotonic()`` timestamp
+    """
+    needs_intermediates = False
+
+    def __init__(self, deadline: float):
+        self.deadline = deadline
+
+    def before_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+        if time.monotonic() > self.deadline:
+            raise DeadlineExceededError(f'Deadline exceeded before running {operator.__class__.__name__}')
+
+
+@dataclass
+class RealTimeStats:
+    processed: int = 0
+    dropped: int = 0
+    deadline_misses: int = 0
+    aborted: int = 0
+    failed: int = 0
+
+
+class RealTimeRunner(object):
+    """ Runs a pipeline over a live feed, dropping frames rather than building up latency
+
+    Frames are handed over with ``submit``, usually from the thread reading the camera. Only the latest frame is kept
+    waiting: submitting a frame while another one is waiting drops the waiting one. Each frame has to be processed
+    within ``deadline`` seconds of being submitted. Frames that are already late when the pipeline gets to them are
+    dropped, and frames that finish late are counted as deadline misses. If ``abort_late`` is set, frames are also
+    aborted between operators as soon as they're late.
+
+    ``on_result`` is called from the processing thread with the output of each frame that wasn't dropped or aborted.
+    Frames whose run fails are counted in ``stats.failed``, and the last error is kept in ``last_error``. Errors
+    raised by ``on_result`` are kept in ``last_error`` too.
+
+    Parameters:
+        - pipeline: The pipeline to run
+        - deadline: Maximum time, in seconds, between submitting a frame and getting its result
+        - on_result: Callback receiving the output image and context of each processed frame
+        - abort_late: Whether to abort frames between operators once their deadline has passed
+        - hooks: Extra hooks passed to every run
+    """
+    def __init__(self, pipeline: CompVizPipeline, deadline: float,
+                 on_result: Optional[Callable[[Image, PipelineContext], None]] = None, abort_late: bool = False,
+                 hooks: Optional[List[PipelineHook]] = None):
+        if not isinstance(deadline, (int, float)) or deadline <= 0:
+            raise ValueError(f'Invalid deadline: {deadline}')
+        self.pipeline = pipeline
+        self.deadline = deadline
+        self.on_result = on_result
+        self.abort_late = abort_late
+        self.hooks = hooks or []
+        self.stats = RealTimeStats()
+        self.last_error: Optional[Exception] = None
+        self._condition = threading.Condition()
+        self._pending: Optional[Image] = None
+        self._pending_deadline = 0.0
+        self._busy = False
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                raise RuntimeError('RealTimeRunner is already running')
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name='ezcv-realtime', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        """ Stops processing frames. Frames waiting to be processed are dropped
+
+        If ``wait`` is set, blocks until the frame being processed, if any, is done
+        """
+        with self._condition:
+            self._running = False
+            if self._pending is not None:
+                self._pending = None
+                self.stats.dropped += 1
+            self._condition.notify_all()
+        if wait and self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'RealTimeRunner':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def submit(self, img: Image):
+        """ Hands a frame over for processing, replacing the one waiting, if any """
+        deadline = time.monotonic() + self.deadline
+        with self._condition:
+            if not self._running:
+                raise RuntimeError('RealTimeRunner is not running')
+            if self._pending is not None:
+                self.stats.dropped += 1
+            self._pending = img
+            self._pending_deadline = deadline
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """ Blocks until there are no frames waiting or being processed. Returns False on timeout """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+                img, deadline = self._pending, self._pending_deadline
+                self._pending = None
+                self._busy = True
+            try:
+                self._process(img, deadline)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _process(self, img: Image, deadline: float):
+        if time.monotonic() > deadline:
+            with self._condition:
+                self.stats.dropped += 1
+            return
+        hooks = self.hooks
+        if self.abort_late:
+            hooks = hooks + [DeadlineHook(deadline)]
+        try:
+            output, ctx = self.pipeline.run(img, hooks=hooks)
+        except DeadlineExceededError:
+            with self._condition:
+                self.stats.aborted += 1
+                self.stats.deadline_misses += 1
+            return
+        except Exception as e:
+            # A bad frame shouldn't bring the whole feed down
+            with self._condition:
+                self.stats.failed += 1
+                self.last_error = e
+            return
+        with self._condition:
+            self.stats.processed += 1
+            if time.monotonic() > deadline:
+                self.stats.deadline_misses += 1
+        if self.on_result is not None:
+            try:
+                self.on_result(output, ctx)
+            except Exception as e:
+                # Neither should a failing callback: the next frames still get processed
+                with self._condition:
+                    self.last_error = e
+
+
+@dataclass
+class LatestWinsStats:
+    processed: int = 0
+    # Requests replaced by a newer one before they started
+    dropped: int = 0
+    # Runs cancelled by a newer request while they were running
+    cancelled: int = 0
+    failed: int = 0
+
+
+class LatestWinsRunner(object):
+    """ Runs a pipeline on the latest request only, cancelling the run in progress when a newer request arrives
+
+    Meant for interactive tools, like a parameter slider, where each change makes the previous request pointless.
+    Submitting a request replaces the one waiting, if any, and cancels the one running, which stops before its next
+    operator, or sooner if its operators check ``ctx.raise_if_cancelled()``. So only the latest request keeps using
+    CPU. Parameters are read from the pipeline when a request starts running.
+
+    ``on_result`` is called from the processing thread with the output of each request that wasn't dropped or
+    cancelled. Requests whose run fails are counted in ``stats.failed``, and the last error is kept in ``last_error``.
+    Errors raised by ``on_result`` are kept in ``last_error`` too, and don't stop the runner.
+
+    Parameters:
+        - pipeline: The pipeline to run
+        - on_result: Callback receiving the output image and context of each completed request
+        - hooks: Extra hooks passed to every run
+    """
+    def __init__(self, pipeline: CompVizPipeline, on_result: Optional[Callable[[Image, PipelineContext], None]] = None,
+                 hooks: Optional[List[PipelineHook]] = None):
+        self.pipeline = pipeline
+        self.on_result = on_result
+        self.hooks = hooks or []
+        self.stats = LatestWinsStats()
+        self.last_error: Optional[Exception] = None
+        self._condition = threading.Condition()
+        self._pending: Optional[Image] = None
+        self._token: Optional[CancellationToken] = None
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                raise RuntimeError('LatestWinsRunner is already running')
+            self._running = True
+        self._thread = threading.Thread(target=self._loop, name='ezcv-latest-wins', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait: bool = True):
+        """ Stops processing requests, dropping the waiting one and cancelling the running one, if any
+
+        If ``wait`` is set, blocks until the running request, if any, has stopped
+        """
+        with self._condition:
+            self._running = False
+            if self._pending is not None:
+                self._pending = None
+                self.stats.dropped += 1
+            if self._token is not None:
+                self._token.cancel()
+            self._condition.notify_all()
+        if wait and self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> 'LatestWinsRunner':
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def submit(self, img: Image):
+        """ Requests a run on an image, superseding every earlier request """
+        with self._condition:
+            if not self._running:
+                raise RuntimeError('LatestWinsRunner is not running')
+            if self._pending is not None:
+                self.stats.dropped += 1
+            if self._token is not None:
+                self._token.cancel()
+            self._pending = img
+            self._condition.notify_all()
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """ Blocks until there are no requests waiting or running. Returns False on timeout """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and self._token is None, timeout)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+                img = self._pending
+                self._pending = None
+                token = self._token = CancellationToken()
+            try:
+                self._process(img, token)
+            finally:
+                with self._condition:
+                    self._token = None
+                    self._condition.notify_all()
+
+    def _process(self, img: Image, token: CancellationToken):
+        try:
+            output, ctx = self.pipeline.run(img, hooks=self.hooks, cancel_token=token)
+        except RunCancelledError:
+            with self._condition:
+                self.stats.cancelled += 1
+            return
+        except Exception as e:
+            with self._condition:
+                self.stats.failed += 1
+                self.last_error = e
+            return
+        with self._condition:
+            # Cancelled after its last operator: a newer request is already waiting
+            if token.cancelled:
+                self.stats.cancelled += 1
+                return
+            self.stats.processed += 1
+        if self.on_result is not None:
+            try:
+                self.on_result(output, ctx)
+            except Exception as e:
+                with self._condition:
+                    self.last_error = e
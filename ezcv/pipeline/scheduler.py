@@ -0,0 +1,298 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ezcv.pipeline.context import PipelineContext
+from ezcv.pipeline.core import CompVizPipeline
+from ezcv.pipeline.hooks import PipelineHook
+from ezcv.typing import Image
+
+ResultCallback = Callable[[Image, PipelineContext], None]
+
+
+@dataclass
+class StreamStats:
+    submitted: int = 0
+    processed: int = 0
+    failed: int = 0
+    cancelled: int = 0
+    queue_depth: int = 0
+    in_flight: int = 0
+    # Processed frames per second, since the stream's first frame was submitted
+    throughput: float = 0.0
+    # Time between submitting a frame and getting its result, in seconds, over the latest frames
+    latency_mean: Optional[float] = None
+    latency_p95: Optional[float] = None
+
+
+class _Frame(object):
+    __slots__ = ('index', 'img', 'future', 'submitted_at')
+
+    def __init__(self, index: int, img: Image, future: Future, submitted_at: float):
+        self.index = index
+        self.img = img
+        self.future = future
+        self.submitted_at = submitted_at
+
+
+class _Stream(object):
+    # Number of latest latencies the stats are computed from
+    latency_window = 1024
+
+    def __init__(self, name: str, pipeline: CompVizPipeline, weight: float, priority: int, max_queue: int,
+                 max_in_flight: int, on_result: Optional[ResultCallback], hooks: List[PipelineHook], order: int):
+        self.name = name
+        self.pipeline = pipeline
+        self.weight = weight
+        self.priority = priority
+        self.max_queue = max_queue
+        self.max_in_flight = max_in_flight
+        self.on_result = on_result
+        self.hooks = hooks
+        self.order = order
+        self.queue: Deque[_Frame] = deque()
+        self.in_flight = 0
+        # Compute time used so far, divided by the stream's weight: the stream with the least goes next
+        self.virtual_time = 0.0
+        self.next_index = 0
+        self.stats = StreamStats()
+        self.first_submitted_at: Optional[float] = None
+        self.latencies: Deque[float] = deque(maxlen=self.latency_window)
+        # Results waiting for the results of earlier frames to be delivered first
+        self.delivery_lock = threading.Lock()
+        self.next_delivery = 0
+        self.undelivered: Dict[int, Optional[Tuple[Image, PipelineContext]]] = dict()
+
+    @property
+    def active(self) -> bool:
+        return len(self.queue) > 0 or self.in_flight > 0
+
+    @property
+    def runnable(self) -> bool:
+        return len(self.queue) > 0 and self.in_flight < self.max_in_flight
+
+
+class StreamScheduler(object):
+    """ Runs frames from many streams, each with its own pipeline, on a shared pool of worker threads
+
+    Whenever a worker is free, it picks a frame from the stream with the highest priority. Among streams with the same
+    priority, compute time is shared in proportion to their weights: the stream that used the least compute time,
+    relative to its weight, goes next. Streams that were idle don't get to catch up on the time they didn't use.
+
+    Frames of a stream are started in the order they're submitted, and at most ``max_in_flight`` of them run at once.
+    ``on_result`` is always called in submission order, skipping frames that failed or were cancelled. Errors raised
+    by ``on_result`` are kept in ``last_error``.
+
+    Parameters:
+        - workers: Number of threads running frames
+    """
+    def __init__(self, workers: int = 4):
+        if not isinstance(workers, int) or workers <= 0:
+            raise ValueError(f'Invalid number of workers: {workers}')
+        self._condition = threading.Condition()
+        self._streams: Dict[str, _Stream] = dict()
+        self._added = 0
+        self._closed = False
+        # Virtual time of the latest stream that was picked: streams that become active start from there
+        self._virtual_time = 0.0
+        self.last_error: Optional[Exception] = None
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f'ezcv-scheduler-{i}', daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    @property
+    def streams(self) -> List[str]:
+        with self._condition:
+            return list(self._streams)
+
+    def add_stream(self, name: str, pipeline: CompVizPipeline, weight: float = 1.0, priority: int = 0,
+                   max_queue: int = 16, max_in_flight: int = 1, on_result: Optional[ResultCallback] = None,
+                   hooks: Optional[List[PipelineHook]] = None):
+        """ Adds a stream
+
+        Parameters:
+            - name: Name used to submit frames to the stream
+            - pipeline: Pipeline the stream's frames go through
+            - weight: Share of compute time, relative to other streams with the same priority
+            - priority: Streams with a higher priority always go first
+            - max_queue: Maximum number of frames waiting to run
+            - max_in_flight: Maximum number of frames running at once
+            - on_result: Called, from a worker thread, with the output and context of each frame, in order
+            - hooks: Extra hooks passed to every run
+        """
+        if not isinstance(weight, (int, float)) or weight <= 0:
+            raise ValueError(f'Invalid weight: {weight}')
+        if not isinstance(priority, int):
+            raise ValueError(f'Invalid priority: {priority}')
+        if not isinstance(max_queue, int) or max_queue <= 0:
+            raise ValueError(f'Invalid max_queue: {max_queue}')
+        if not isinstance(max_in_flight, int) or max_in_flight <= 0:
+            raise ValueError(f'Invalid max_in_flight: {max_in_flight}')
+        with self._condition:
+            if name in self._streams:
+                raise ValueError(f'Trying to add a duplicated stream name: {name}')
+            self._streams[name] = _Stream(name, pipeline, weight, priority, max_queue, max_in_flight, on_result,
+                                          hooks or [], self._added)
+            self._added += 1
+
+    def remove_stream(self, name: str):
+        """ Removes a stream, cancelling its waiting frames. Frames already running still complete """
+        with self._condition:
+            stream = self._get_stream(name)
+            del self._streams[name]
+            frames = list(stream.queue)
+            stream.queue.clear()
+            stream.stats.cancelled += len(frames)
+            self._condition.notify_all()
+        for frame in frames:
+            frame.future.cancel()
+
+    def submit(self, name: str, img: Image, block: bool = True, timeout: Optional[float] = None) \
+            -> 'Future[Tuple[Image, PipelineContext]]':
+        """ Queues a frame on a stream
+
+        When the stream's queue is full, waits for room if ``block`` is set, at most ``timeout`` seconds, and raises
+        ``queue.Full`` otherwise. Cancelling the returned future before the frame starts skips it.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('StreamScheduler is closed')
+            stream = self._get_stream(name)
+            while len(stream.queue) >= stream.max_queue:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    raise queue.Full(f'Queue of stream "{name}" is full')
+                self._condition.wait(remaining)
+                stream = self._get_stream(name)
+            now = time.monotonic()
+            if not stream.active:
+                stream.virtual_time = max(stream.virtual_time, self._virtual_time)
+            if stream.first_submitted_at is None:
+                stream.first_submitted_at = now
+            future = Future()
+            stream.queue.append(_Frame(stream.next_index, img, future, now))
+            stream.next_index += 1
+            stream.stats.submitted += 1
+            self._condition.notify_all()
+        return future
+
+    def stats(self, name: str) -> StreamStats:
+        with self._condition:
+            stream = self._get_stream(name)
+            stats = StreamStats(**vars(stream.stats))
+            stats.queue_depth = len(stream.queue)
+            stats.in_flight = stream.in_flight
+            if stream.first_submitted_at is not None:
+                stats.throughput = stats.processed / max(time.monotonic() - stream.first_submitted_at, 1e-9)
+            latencies = list(stream.latencies)
+        if len(latencies) > 0:
+            stats.latency_mean = float(np.mean(latencies))
+            stats.latency_p95 = float(np.percentile(latencies, 95))
+        return stats
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """ Waits until every submitted frame has run. Returns False on timeout """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not any(stream.active for stream in self._streams.values()), timeout
+            )
+
+    def close(self):
+        """ Stops accepting frames, runs the frames already submitted, and stops the workers """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self) -> 'StreamScheduler':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _get_stream(self, name: str) -> _Stream:
+        try:
+            return self._streams[name]
+        except KeyError:
+            raise ValueError(f'Unknown stream: "{name}" (from streams {list(self._streams)})') from None
+
+    def _pick(self) -> Optional[_Stream]:
+        runnable = [stream for stream in self._streams.values() if stream.runnable]
+        if len(runnable) == 0:
+            return None
+        return min(runnable, key=lambda stream: (-stream.priority, stream.virtual_time, stream.order))
+
+    def _worker_loop(self):
+        while True:
+            with self._condition:
+                stream = self._pick()
+                while stream is None:
+                    if self._closed and not any(s.active for s in self._streams.values()):
+                        return
+                    self._condition.wait()
+                    stream = self._pick()
+                frame = stream.queue.popleft()
+                stream.in_flight += 1
+                self._virtual_time = max(self._virtual_time, stream.virtual_time)
+                # Makes room in the queue for blocked submitters
+                self._condition.notify_all()
+            self._run_frame(stream, frame)
+
+    def _run_frame(self, stream: _Stream, frame: _Frame):
+        if not frame.future.set_running_or_notify_cancel():
+            with self._condition:
+                stream.in_flight -= 1
+                stream.stats.cancelled += 1
+                self._condition.notify_all()
+            self._deliver(stream, frame.index, None)
+            return
+
+        start = time.monotonic()
+        result, error = None, None
+        try:
+            result = stream.pipeline.run(frame.img, hooks=stream.hooks)
+        except Exception as e:
+            error = e
+        end = time.monotonic()
+        with self._condition:
+            stream.in_flight -= 1
+            stream.virtual_time += (end - start) / stream.weight
+            if error is None:
+                stream.stats.processed += 1
+                stream.latencies.append(end - frame.submitted_at)
+            else:
+                stream.stats.failed += 1
+            self._condition.notify_all()
+
+        if error is None:
+            frame.future.set_result(result)
+        else:
+            frame.future.set_exception(error)
+        self._deliver(stream, frame.index, result)
+
+    def _deliver(self, stream: _Stream, index: int, result: Optional[Tuple[Image, PipelineContext]]):
+        """ Calls the stream's callback with every result that's next in line """
+        if stream.on_result is None:
+            return
+        with stream.delivery_lock:
+            stream.undelivered[index] = result
+            while stream.next_delivery in stream.undelivered:
+                ready = stream.undelivered.pop(stream.next_delivery)
+                stream.next_delivery += 1
+                if ready is None:
+                    continue
+                try:
+                    stream.on_result(*ready)
+                except Exception as e:
+                    self.last_error = e
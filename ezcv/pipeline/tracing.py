@@ -0,0 +1,137 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, TextIO
+
+from ezcv.operator import Operator
+from ezcv.pipeline.context import PipelineContext
+from ezcv.pipeline.hooks import PipelineHook
+from ezcv.typing import Image
+
+
+class _TracedRun(object):
+    __slots__ = ('frame', 'start', 'shape', 'operator_starts')
+
+    def __init__(self, frame: int, start: float, shape: tuple):
+        self.frame = frame
+        self.start = start
+        self.shape = shape
+        self.operator_starts: Dict[int, float] = dict()
+
+
+class TraceHook(PipelineHook):
+    """ Records a timeline of pipeline and operator runs, in the Chrome Trace Event format
+
+    The trace can be opened in Perfetto (https://ui.perfetto.dev) or ``chrome://tracing``. Each event is tagged with
+    the process and thread it ran in, the index of the frame, and the shape of the image. The same hook can be shared
+    by every thread running the pipeline.
+
+    Parameters:
+        - max_events: Maximum number of events kept. Once it's reached, the oldest events are discarded
+        - sample_every: Only record 1 in every ``sample_every`` runs
+        - operator_names: Names displayed for each operator, like ``pipeline.operators``. Defaults to class names
+    """
+    needs_intermediates = False
+    # Runs that failed never reach `after_pipeline`: only keep track of this many runs at once
+    max_active_runs = 1024
+
+    def __init__(self, max_events: int = 100000, sample_every: int = 1,
+                 operator_names: Optional[Dict[str, Operator]] = None):
+        if not isinstance(max_events, int) or max_events <= 0:
+            raise ValueError(f'Invalid max_events: {max_events}')
+        if not isinstance(sample_every, int) or sample_every <= 0:
+            raise ValueError(f'Invalid sample_every: {sample_every}')
+        self.sample_every = sample_every
+        self._names = {id(operator): name for name, operator in (operator_names or dict()).items()}
+        self._events: deque = deque(maxlen=max_events)
+        self._recorded = 0
+        self._frames = itertools.count()
+        self._runs: Dict[int, _TracedRun] = dict()
+        self._threads: Dict[int, str] = dict()
+        self._lock = threading.Lock()
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        """ The events currently kept, oldest first """
+        return list(self._events)
+
+    @property
+    def dropped(self) -> int:
+        """ Number of events discarded because ``max_events`` was reached """
+        return self._recorded - len(self._events)
+
+    def before_pipeline(self, ctx: PipelineContext):
+        frame = next(self._frames)
+        if frame % self.sample_every != 0:
+            return
+        with self._lock:
+            if len(self._runs) >= self.max_active_runs:
+                self._runs.pop(next(iter(self._runs)))
+            self._runs[id(ctx)] = _TracedRun(frame, _now(), ctx.original_img.shape)
+
+    def before_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+        run = self._runs.get(id(ctx))
+        if run is not None:
+            run.operator_starts[id(operator)] = _now()
+
+    def after_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+        run = self._runs.get(id(ctx))
+        if run is None or id(operator) not in run.operator_starts:
+            return
+        name = self._names.get(id(operator), type(operator).__name__)
+        self._record(name, 'operator', run.operator_starts.pop(id(operator)), run.frame, img.shape)
+
+    def after_pipeline(self, img: Image, ctx: PipelineContext):
+        with self._lock:
+            run = self._runs.pop(id(ctx), None)
+        if run is not None:
+            self._record('pipeline', 'pipeline', run.start, run.frame, run.shape)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """ Builds the trace, including metadata naming the process and threads """
+        pid = os.getpid()
+        metadata = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': f'ezcv ({pid})'}}]
+        metadata.extend(
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in list(self._threads.items())
+        )
+        return {'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}
+
+    def dump(self, stream: TextIO):
+        json.dump(self.to_dict(), stream)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            self.dump(f)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._recorded = 0
+
+    def _record(self, name: str, category: str, start: float, frame: int, shape: tuple):
+        end = _now()
+        tid = threading.get_ident()
+        if tid not in self._threads:
+            self._threads[tid] = threading.current_thread().name
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': start,
+            'dur': end - start,
+            'pid': os.getpid(),
+            'tid': tid,
+            'args': {'frame': frame, 'shape': list(shape)},
+        }
+        with self._lock:
+            self._events.append(event)
+            self._recorded += 1
+
+
+def _now() -> float:
+    """ Current time in microseconds, as expected by the trace format """
+    return time.perf_counter_ns() / 1000
@@ -0,0 +1,100 @@
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, List
+
+Schema = Dict[str, Dict[str, Any]]
+Errors = Dict[Any, List[Any]]
+Validator = Callable[[Any], Errors]
+
+_TYPES: Dict[str, Callable[[Any], bool]] = {
+    'string': lambda value: isinstance(value, str),
+    'dict': lambda value: isinstance(value, Mapping),
+    'list': lambda value: isinstance(value, Sequence) and not isinstance(value, str),
+    'boolean': lambda value: isinstance(value, bool),
+    'integer': lambda value: isinstance(value, int) and not isinstance(value, bool),
+    'float': lambda value: isinstance(value, float),
+    'number': lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+}
+_RULES = ('type', 'required', 'nullable', 'schema', 'allow_unknown')
+
+
+def compile_schema(schema: Schema, allow_unknown: bool = False) -> Validator:
+    """ Compiles a Cerberus-like schema into a function validating documents against it
+
+    The function returns the errors found in a document, structured like Cerberus' ``Validator.errors``: a dict
+    mapping each invalid field to a list of messages, where nested documents contribute a dict of their own errors,
+    and lists a dict of errors by index. Valid documents have no errors. Documents must be mappings.
+
+    Only the rules used by ezcv are supported: ``type``, ``required``, ``nullable``, ``schema`` and ``allow_unknown``.
+    """
+    fields = {name: _compile_field(name, rules) for name, rules in schema.items()}
+    required = [name for name, rules in schema.items() if rules.get('required', False)]
+
+    def validate(document: Mapping) -> Errors:
+        errors = dict()
+        for name in required:
+            if name not in document:
+                errors[name] = ['required field']
+        for name, value in document.items():
+            check = fields.get(name)
+            if check is None:
+                if not allow_unknown:
+                    errors[name] = ['unknown field']
+                continue
+            field_errors = check(value)
+            if len(field_errors) > 0:
+                errors[name] = field_errors
+        return errors
+
+    return validate
+
+
+def _compile_field(name: str, rules: Dict[str, Any]) -> Callable[[Any], List[Any]]:
+    unknown_rules = set(rules) - set(_RULES)
+    if len(unknown_rules) > 0:
+        raise ValueError(f'Unsupported rules for field "{name}": {sorted(unknown_rules)}')
+    type_name = rules.get('type')
+    if type_name is not None and type_name not in _TYPES:
+        raise ValueError(f'Unsupported type for field "{name}": {type_name}')
+    check_type = _TYPES[type_name] if type_name is not None else None
+    nullable = rules.get('nullable', False)
+    check_nested = None
+    if 'schema' in rules:
+        if type_name == 'dict':
+            check_nested = _nest(compile_schema(rules['schema'], allow_unknown=rules.get('allow_unknown', False)))
+        elif type_name == 'list':
+            check_nested = _compile_items(name, rules['schema'])
+        else:
+            raise ValueError(f'Field "{name}" has a schema but is neither a dict nor a list')
+
+    def check(value: Any) -> List[Any]:
+        if value is None:
+            return [] if nullable else ['null value not allowed']
+        if check_type is not None and not check_type(value):
+            return [f'must be of {type_name} type']
+        if check_nested is not None:
+            return check_nested(value)
+        return []
+
+    return check
+
+
+def _nest(validate: Validator) -> Callable[[Any], List[Any]]:
+    def check(value: Any) -> List[Any]:
+        errors = validate(value)
+        return [errors] if len(errors) > 0 else []
+
+    return check
+
+
+def _compile_items(name: str, rules: Dict[str, Any]) -> Callable[[Any], List[Any]]:
+    check_item = _compile_field(name, rules)
+
+    def check(value: Any) -> List[Any]:
+        errors = dict()
+        for index, item in enumerate(value):
+            item_errors = check_item(item)
+            if len(item_errors) > 0:
+                errors[index] = item_errors
+        return [errors] if len(errors) > 0 else []
+
+    return check
@@ -0,0 +1,280 @@
+import io
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from ezcv.exceptions import BadImageError
+from ezcv.pipeline import CompVizPipeline, PipelineContext
+from ezcv.typing import Image
+from ezcv.utils import load_npy, to_json
+
+
+class MicroBatcher(object):
+    """ Coalesces concurrent requests into micro-batches and runs them on a pool of worker threads
+
+    Batches whose images all have the same shape and dtype go through the pipeline's ``run_batch`` as a single stack.
+    If the stack fails, its images are run one by one, so that each request only fails because of its own image.
+
+    Batches are only formed when a worker is free to run them, so requests keep queueing, and can still be cancelled,
+    while all workers are busy. A batch is dispatched as soon as it has ``max_batch_size`` requests, or ``max_wait``
+    seconds after its first request was taken from the queue, whichever comes first.
+
+    Parameters:
+        - pipeline: The pipeline to run
+        - max_batch_size: Maximum number of requests in a batch
+        - max_wait: Maximum time, in seconds, a request waits for the batch it's in to fill up
+        - workers: Number of threads running batches
+    """
+    def __init__(self, pipeline: CompVizPipeline, max_batch_size: int = 8, max_wait: float = 0.005, workers: int = 2):
+        if not isinstance(max_batch_size, int) or max_batch_size <= 0:
+            raise ValueError(f'Invalid max_batch_size: {max_batch_size}')
+        if not isinstance(max_wait, (int, float)) or max_wait < 0:
+            raise ValueError(f'Invalid max_wait: {max_wait}')
+        if not isinstance(workers, int) or workers <= 0:
+            raise ValueError(f'Invalid number of workers: {workers}')
+        self.pipeline = pipeline
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue: 'queue.Queue[Optional[Tuple[Image, Future]]]' = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ezcv-worker')
+        self._free_workers = threading.Semaphore(workers)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._stats = {'requests': 0, 'dispatched': 0, 'batches': 0, 'cancelled': 0, 'failed': 0}
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name='ezcv-dispatcher', daemon=True)
+        self._dispatcher.start()
+
+    @property
+    def queue_depth(self) -> int:
+        """ Number of requests waiting to be dispatched """
+        return self._queue.qsize()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['in_flight'] = self._in_flight
+        stats['queue_depth'] = self.queue_depth
+        stats['mean_batch_size'] = stats['dispatched'] / max(stats['batches'], 1)
+        return stats
+
+    def submit(self, img: Image) -> 'Future[Tuple[Image, PipelineContext]]':
+        """ Queues an image to be run through the pipeline
+
+        Cancelling the returned future before its batch is dispatched skips the image.
+        """
+        future = Future()
+        with self._lock:
+            self._stats['requests'] += 1
+        self._queue.put((img, future))
+        return future
+
+    def run(self, img: Image, timeout: Optional[float] = None) -> Tuple[Image, PipelineContext]:
+        """ Runs an image through the pipeline as part of a micro-batch, waiting at most ``timeout`` seconds
+
+        Raises ``concurrent.futures.TimeoutError`` on timeout
+        """
+        future = self.submit(img)
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def close(self):
+        self._queue.put(None)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    def _dispatch_loop(self):
+        while True:
+            self._free_workers.acquire()
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._submit_batch(batch)
+                    return
+                batch.append(item)
+            self._submit_batch(batch)
+
+    def _submit_batch(self, batch: List[Tuple[Image, Future]]):
+        runnable = [(img, future) for img, future in batch if future.set_running_or_notify_cancel()]
+        with self._lock:
+            self._stats['cancelled'] += len(batch) - len(runnable)
+            self._stats['dispatched'] += len(runnable)
+            self._stats['batches'] += 1 if len(runnable) > 0 else 0
+            self._in_flight += len(runnable)
+        if len(runnable) > 0:
+            self._executor.submit(self._run_batch, runnable)
+        else:
+            self._free_workers.release()
+
+    def _run_batch(self, batch: List[Tuple[Image, Future]]):
+        try:
+            if _stackable([img for img, _ in batch]):
+                self._run_stacked(batch)
+            else:
+                for img, future in batch:
+                    self._run_single(img, future)
+        finally:
+            with self._lock:
+                self._in_flight -= len(batch)
+            self._free_workers.release()
+
+    def _run_stacked(self, batch: List[Tuple[Image, Future]]):
+        try:
+            outputs, ctxs = self.pipeline.run_batch([img for img, _ in batch])
+        except Exception:
+            # Finds out which requests actually fail, instead of failing the requests batched with them
+            for img, future in batch:
+                self._run_single(img, future)
+            return
+        for (_, future), output, ctx in zip(batch, outputs, ctxs):
+            future.set_result((output, ctx))
+
+    def _run_single(self, img: Image, future: Future):
+        try:
+            future.set_result(self.pipeline.run(img))
+        except Exception as e:
+            with self._lock:
+                self._stats['failed'] += 1
+            future.set_exception(e)
+
+
+def _stackable(imgs: List[Image]) -> bool:
+    """ Whether the images can go through the pipeline as a single stack """
+    first = imgs[0]
+    return len(imgs) > 1 and all(
+        isinstance(img, np.ndarray) and img.shape == first.shape and img.dtype == first.dtype for img in imgs
+    )
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    """ Serves a MicroBatcher over HTTP
+
+    ``POST /run`` takes an image serialized with ``numpy.save`` and answers with a ``multipart/mixed`` body: the output
+    image, serialized the same way (``application/x-npy``), followed by the info added to the context, as JSON
+    (``application/json``). The info isn't sent in a header since it can grow beyond the header size limits of clients
+    and proxies. ``GET /stats`` answers with the batcher's stats, including its queue depth, as JSON.
+    """
+    server: '_Server'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if self.path != '/stats':
+            self._send_error(404, f'Unknown path: {self.path}')
+            return
+        self._send(200, 'application/json', json.dumps(self.server.batcher.stats).encode())
+
+    def do_POST(self):
+        if self.path != '/run':
+            self._send_error(404, f'Unknown path: {self.path}')
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            img = load_npy(io.BytesIO(self.rfile.read(length)))
+        except Exception as e:
+            self._send_error(400, f'Invalid payload: {e}')
+            return
+        try:
+            output, ctx = self.server.batcher.run(img, timeout=self.server.request_timeout)
+        except TimeoutError:
+            self._send_error(504, 'Timed out')
+            return
+        except BadImageError as e:
+            self._send_error(400, str(e))
+            return
+        except Exception as e:
+            self._send_error(500, str(e))
+            return
+        buffer = io.BytesIO()
+        np.save(buffer, output, allow_pickle=False)
+        content_type, body = _multipart([
+            ('application/x-npy', buffer.getvalue()),
+            ('application/json', json.dumps(ctx.info, default=to_json).encode()),
+        ])
+        self._send(200, content_type, body)
+
+    def address_string(self) -> str:
+        # Unix sockets have no client address
+        return str(self.client_address or 'unix')
+
+    def log_message(self, format: str, *args: Any):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_error(self, status: int, message: str):
+        self._send(status, 'application/json', json.dumps({'error': message}).encode())
+
+    def _send(self, status: int, content_type: str, body: bytes):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _multipart(parts: List[Tuple[str, bytes]]) -> Tuple[str, bytes]:
+    """ Builds a ``multipart/mixed`` body from (content type, content) pairs, returning its content type and itself
+    """
+    boundary = uuid.uuid4().hex
+    while any(boundary.encode() in content for _, content in parts):
+        boundary = uuid.uuid4().hex
+    body = bytearray()
+    for content_type, content in parts:
+        body += f'--{boundary}\r\nContent-Type: {content_type}\r\n\r\n'.encode()
+        body += content
+        body += b'\r\n'
+    body += f'--{boundary}--\r\n'.encode()
+    return f'multipart/mixed; boundary="{boundary}"', bytes(body)
+
+
+class _Server(object):
+    batcher: MicroBatcher
+    request_timeout: Optional[float]
+    verbose: bool
+
+
+class _TCPServer(_Server, ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(_Server, socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def create_server(batcher: MicroBatcher, host: str = '127.0.0.1', port: int = 8000, unix_socket: Optional[str] = None,
+                  timeout: Optional[float] = None, verbose: bool = False) -> socketserver.BaseServer:
+    """ Creates an HTTP server running requests through a MicroBatcher
+
+    Listens on ``unix_socket`` if it's given, or on ``host``:``port`` otherwise. Requests taking longer than
+    ``timeout`` seconds are answered with a 504. Call ``serve_forever`` on the returned server to start serving.
+    """
+    if unix_socket is not None:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = _UnixServer(unix_socket, _RequestHandler)
+    else:
+        server = _TCPServer((host, port), _RequestHandler)
+    server.batcher = batcher
+    server.request_timeout = timeout
+    server.verbose = verbose
+    return server
@@ -0,0 +1,249 @@
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ezcv.pipeline import PipelineContext
+from ezcv.typing import Image
+from ezcv.utils import to_json
+
+_Item = Tuple[str, Image, PipelineContext]
+
+
+class Sink(object):
+    """ Writes pipeline results on a background thread, so that disk I/O overlaps with processing
+
+    Results are queued by ``write``, and the writer thread takes them from the queue in batches of up to
+    ``batch_size``. When ``queue_size`` results are waiting to be written, ``write`` blocks until there's room again.
+
+    Errors raised while writing are raised again by the next call to ``write``, ``flush`` or ``close``. Results queued
+    after an error are discarded.
+
+    Parameters:
+        - queue_size: Maximum number of results waiting to be written
+        - batch_size: Maximum number of results written at once
+        - on_written: Called from the writer thread with the keys of each batch, once it's written. Errors it raises
+          are handled like write errors
+    """
+    def __init__(self, queue_size: int = 64, batch_size: int = 16,
+                 on_written: Optional[Callable[[List[str]], None]] = None):
+        if not isinstance(queue_size, int) or queue_size <= 0:
+            raise ValueError(f'Invalid queue_size: {queue_size}')
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            raise ValueError(f'Invalid batch_size: {batch_size}')
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.on_written = on_written
+        self._condition = threading.Condition()
+        self._queue: Deque[_Item] = deque()
+        # Results queued but not written yet, including the ones being written
+        self._pending = 0
+        self._written = 0
+        self._index = 0
+        self._error: Optional[Exception] = None
+        self._closing = False
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name=f'ezcv-{type(self).__name__}', daemon=True)
+        self._writer.start()
+
+    @property
+    def written(self) -> int:
+        """ Number of results written so far """
+        return self._written
+
+    def write(self, img: Image, ctx: PipelineContext, key: Optional[str] = None):
+        """ Queues a result, blocking while the queue is full
+
+        ``key`` identifies the result, like the name of the file it's written to. It defaults to its index.
+        """
+        with self._condition:
+            if self._closing:
+                raise RuntimeError(f'{type(self).__name__} is closed')
+            self._condition.wait_for(
+                lambda: len(self._queue) < self.queue_size or self._error is not None or self._closing
+            )
+            if self._closing:
+                raise RuntimeError(f'{type(self).__name__} is closed')
+            self._raise_if_failed()
+            if key is None:
+                key = f'{self._index:08d}'
+            self._index += 1
+            self._queue.append((key, img, ctx))
+            self._pending += 1
+            self._condition.notify_all()
+
+    def write_batch(self, imgs: Image, ctxs: Sequence[PipelineContext], keys: Optional[Sequence[str]] = None):
+        """ Queues the results of ``CompVizPipeline.run_batch`` """
+        keys = keys if keys is not None else [None] * len(ctxs)
+        for img, ctx, key in zip(imgs, ctxs, keys):
+            self.write(img, ctx, key)
+
+    def write_all(self, results: Iterable[Tuple[Image, PipelineContext]]):
+        """ Queues every result of an iterable, like the one returned by ``CompVizPipeline.run_stream`` """
+        for img, ctx in results:
+            self.write(img, ctx)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """ Waits until every result queued so far is written. Returns False on timeout """
+        with self._condition:
+            flushed = self._condition.wait_for(lambda: self._pending == 0, timeout)
+            self._raise_if_failed()
+        if flushed:
+            self._flush()
+        return flushed
+
+    def close(self):
+        """ Writes every queued result, stops the writer thread and releases the sink's files
+
+        Calling it again does nothing.
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closing = True
+            self._condition.notify_all()
+        self._writer.join()
+        with self._condition:
+            self._closed = True
+        try:
+            self._close()
+        finally:
+            with self._condition:
+                self._raise_if_failed()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write_batch(self, items: List[_Item]):
+        raise NotImplementedError()
+
+    def _flush(self):
+        """ Makes sure what was written so far reaches the disk """
+        pass
+
+    def _close(self):
+        pass
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise RuntimeError(f'{type(self).__name__} failed to write results') from self._error
+
+    def _write_loop(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._queue) > 0 or self._closing)
+                if len(self._queue) == 0:
+                    return
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+                failed = self._error is not None
+                # Makes room for blocked writers
+                self._condition.notify_all()
+            if not failed:
+                try:
+                    self._write_batch(batch)
+                    if self.on_written is not None:
+                        self.on_written([key for key, _, _ in batch])
+                except Exception as e:
+                    with self._condition:
+                        self._error = e
+            with self._condition:
+                self._pending -= len(batch)
+                if self._error is None:
+                    self._written += len(batch)
+                self._condition.notify_all()
+
+
+class DirectorySink(Sink):
+    """ Writes output images to a directory
+
+    With the ``npy`` format, each image is saved to its own ``<key>.npy`` file. With the ``npz`` format, each batch
+    is saved to a single ``batch_<index>.npz`` archive, with one array per key, which makes for fewer, bigger files.
+    """
+    def __init__(self, path: str, format: str = 'npy', compress: bool = False, queue_size: int = 64,
+                 batch_size: int = 16, on_written: Optional[Callable[[List[str]], None]] = None):
+        if format not in ('npy', 'npz'):
+            raise ValueError(f'Invalid format: {format}')
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.format = format
+        self.compress = compress
+        self._batches = 0
+        super().__init__(queue_size=queue_size, batch_size=batch_size, on_written=on_written)
+
+    def _write_batch(self, items: List[_Item]):
+        if self.format == 'npy':
+            for key, img, _ in items:
+                np.save(os.path.join(self.path, f'{key}.npy'), img, allow_pickle=False)
+            return
+        save = np.savez_compressed if self.compress else np.savez
+        save(os.path.join(self.path, f'batch_{self._batches:06d}.npz'), **{key: img for key, img, _ in items})
+        self._batches += 1
+
+
+class MemmapSink(Sink):
+    """ Writes output images into a single ``.npy`` file holding a stack of ``count`` images
+
+    The file is memory-mapped, and each image is written at its key, which must be an index in the stack. It defaults
+    to the order in which images are written. The shape and dtype of the images are taken from the first one unless
+    given. The file can be read back with ``numpy.load`` or ``ezcv.sources.NpySource``.
+    """
+    def __init__(self, path: str, count: int, shape: Optional[Tuple[int, ...]] = None, dtype: Any = None,
+                 queue_size: int = 64, batch_size: int = 16, on_written: Optional[Callable[[List[str]], None]] = None):
+        if not isinstance(count, int) or count <= 0:
+            raise ValueError(f'Invalid count: {count}')
+        self.path = path
+        self.count = count
+        self._stack: Optional[np.memmap] = None
+        if shape is not None:
+            self._open(tuple(shape), np.dtype(dtype or np.uint8))
+        super().__init__(queue_size=queue_size, batch_size=batch_size, on_written=on_written)
+
+    def _open(self, shape: Tuple[int, ...], dtype: np.dtype):
+        self._stack = np.lib.format.open_memmap(self.path, mode='w+', dtype=dtype, shape=(self.count,) + shape)
+
+    def _write_batch(self, items: List[_Item]):
+        if self._stack is None:
+            _, first, _ = items[0]
+            self._open(first.shape, first.dtype)
+        for key, img, _ in items:
+            index = int(key)
+            if index < 0 or index >= self.count:
+                raise ValueError(f'Invalid index in the stack: {key} (for {self.count} images)')
+            self._stack[index] = img
+
+    def _flush(self):
+        if self._stack is not None:
+            self._stack.flush()
+
+    def _close(self):
+        if self._stack is not None:
+            self._stack.flush()
+            self._stack = None
+
+
+class JsonlSink(Sink):
+    """ Writes the info of each context to a JSON Lines file, as ``{"key": ..., "info": ...}`` objects
+
+    Numpy arrays and scalars in the info are converted to lists and numbers, and other values to strings.
+    """
+    def __init__(self, path: str, queue_size: int = 64, batch_size: int = 16,
+                 on_written: Optional[Callable[[List[str]], None]] = None):
+        self.path = path
+        self._file = open(path, 'w')
+        super().__init__(queue_size=queue_size, batch_size=batch_size, on_written=on_written)
+
+    def _write_batch(self, items: List[_Item]):
+        lines = [json.dumps({'key': key, 'info': ctx.info}, default=to_json) + '\n' for key, _, ctx in items]
+        self._file.writelines(lines)
+
+    def _flush(self):
+        self._file.flush()
+
+    def _close(self):
+        self._file.close()
@@ -0,0 +1,171 @@
+import glob
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from ezcv.typing import Image
+from ezcv.utils import load_npy
+
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.npy')
+
+
+class FrameSource(object):
+    """ A sequence of frames that can be fed to ``CompVizPipeline.run_stream``
+
+    Iterating over a source loads its frames on background threads, keeping at most ``prefetch`` frames loaded ahead
+    of the consumer, so that disk I/O and decoding overlap with processing.
+
+    Parameters:
+        - workers: Number of threads loading frames. If 0, frames are loaded synchronously
+        - prefetch: Maximum number of frames loaded ahead of the consumer
+    """
+    def __init__(self, workers: int = 2, prefetch: int = 8):
+        if not isinstance(workers, int) or workers < 0:
+            raise ValueError(f'Invalid number of workers: {workers}')
+        if not isinstance(prefetch, int) or prefetch <= 0:
+            raise ValueError(f'Invalid prefetch size: {prefetch}')
+        self.workers = workers
+        self.prefetch = prefetch
+
+    def __len__(self) -> int:
+        return len(self.keys())
+
+    def keys(self) -> List[str]:
+        """ Identifies each frame, like the path of the file it's loaded from """
+        raise NotImplementedError()
+
+    def load(self, index: int) -> Image:
+        raise NotImplementedError()
+
+    def __iter__(self) -> Iterator[Image]:
+        return (img for _, img in self.items())
+
+    def items(self) -> Iterator[Tuple[str, Image]]:
+        """ Iterates over the frames along with their keys """
+        keys = self.keys()
+        frames = prefetch_frames(self.load, len(keys), workers=self.workers, queue_size=self.prefetch)
+        return zip(keys, frames)
+
+
+class FilesSource(FrameSource):
+    """ Loads frames from a list of image files
+
+    Images are decoded with OpenCV, except for ``.npy`` files, which are loaded with numpy
+    """
+    def __init__(self, paths: Sequence[str], workers: int = 2, prefetch: int = 8):
+        super().__init__(workers=workers, prefetch=prefetch)
+        self.paths = list(paths)
+
+    def keys(self) -> List[str]:
+        return self.paths
+
+    def load(self, index: int) -> Image:
+        return read_image(self.paths[index])
+
+
+class DirectorySource(FilesSource):
+    """ Loads all images in a directory, sorted by file name
+    """
+    def __init__(self, path: str, extensions: Sequence[str] = IMAGE_EXTENSIONS, workers: int = 2, prefetch: int = 8):
+        if not os.path.isdir(path):
+            raise ValueError(f'Invalid directory: "{path}"')
+        extensions = tuple(ext.lower() for ext in extensions)
+        paths = [
+            os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.lower().endswith(extensions)
+        ]
+        super().__init__(paths, workers=workers, prefetch=prefetch)
+
+
+class GlobSource(FilesSource):
+    """ Loads all images matching a glob pattern, sorted by path
+    """
+    def __init__(self, pattern: str, workers: int = 2, prefetch: int = 8):
+        super().__init__(sorted(glob.glob(pattern, recursive=True)), workers=workers, prefetch=prefetch)
+
+
+class NpzSource(FrameSource):
+    """ Loads frames from the arrays of an ``.npz`` archive, in the order they were saved
+    """
+    def __init__(self, path: str, workers: int = 2, prefetch: int = 8):
+        super().__init__(workers=workers, prefetch=prefetch)
+        self.path = path
+        with np.load(path) as archive:
+            self._keys = list(archive.files)
+        self._local = threading.local()
+
+    def keys(self) -> List[str]:
+        return self._keys
+
+    def load(self, index: int) -> Image:
+        # Each thread reads its own handle, kept open across frames: zip members can't be read concurrently from a
+        # single one. Handles are closed along with their thread
+        archive = getattr(self._local, 'archive', None)
+        if archive is None:
+            archive = self._local.archive = np.load(self.path)
+        with archive.zip.open(self._keys[index] + '.npy') as member:
+            return load_npy(member)
+
+
+class NpySource(FrameSource):
+    """ Loads frames from a single ``.npy`` file holding a stack of images (``N×H×W`` or ``N×H×W×3``)
+
+    The file is memory-mapped, so only the frames being processed are ever read from disk
+    """
+    def __init__(self, path: str, workers: int = 2, prefetch: int = 8):
+        super().__init__(workers=workers, prefetch=prefetch)
+        self.path = path
+        self._stack = np.load(path, mmap_mode='r')
+        if self._stack.ndim not in (3, 4):
+            raise ValueError(f'Invalid stack of images in "{path}" with shape {self._stack.shape}')
+
+    def __len__(self) -> int:
+        return len(self._stack)
+
+    def keys(self) -> List[str]:
+        return [str(i) for i in range(len(self._stack))]
+
+    def load(self, index: int) -> Image:
+        return np.array(self._stack[index])
+
+
+def prefetch_frames(loader: Callable[[int], Image], count: int, workers: int = 2, queue_size: int = 8) \
+        -> Iterator[Image]:
+    """ Yields ``loader(0)`` through ``loader(count - 1)``, in order, loading up to ``queue_size`` of them ahead
+    """
+    if workers == 0:
+        for index in range(count):
+            yield loader(index)
+        return
+
+    executor = ThreadPoolExecutor(max_workers=workers)
+    pending = deque()
+    try:
+        next_index = 0
+        while next_index < count or len(pending) > 0:
+            while next_index < count and len(pending) < queue_size:
+                pending.append(executor.submit(loader, next_index))
+                next_index += 1
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def read_image(path: str, color: bool = True) -> Image:
+    if path.lower().endswith('.npy'):
+        return load_npy(path)
+    try:
+        import cv2
+    except ImportError as e:
+        raise ImportError(f'OpenCV is required to read "{path}"') from e
+    img = cv2.imread(path, cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f'Failed to read image "{path}"')
+    return img
@@ -1,14 +1,90 @@
 import functools
-from typing import Any
+import threading
+from typing import Any, BinaryIO, Sequence, Tuple, Union
 
 import numpy as np
 
+from ezcv.typing import Image
 
-def is_image(data: Any) -> bool:
+DTypeLike = Union[str, type, np.dtype]
+
+# Dtypes images are allowed to have between operators. Pipeline inputs and outputs are uint8 by default.
+IMAGE_DTYPES = (np.dtype('uint8'), np.dtype('uint16'), np.dtype('float32'))
+
+# numpy parses .npy headers with `ast.literal_eval`, which isn't thread-safe on some Python versions
+_npy_lock = threading.Lock()
+_NPY_HEADER_READERS = {
+    (1, 0): np.lib.format.read_array_header_1_0,
+    (2, 0): np.lib.format.read_array_header_2_0,
+}
+
+
+def is_image(data: Any, dtypes: Sequence[DTypeLike] = (np.uint8,)) -> bool:
     return (
         isinstance(data, np.ndarray) and
         (data.ndim == 2 or data.ndim == 3) and
         (data.ndim == 2 or data.shape[2] == 3) and
         functools.reduce(lambda a, b: a * b, data.shape) > 0 and
-        data.dtype == np.uint8
+        data.dtype in dtypes
     )
+
+
+def convert_image(img: Image, dtype: DTypeLike) -> Image:
+    """ Converts an image to another dtype, keeping pixel values
+
+    Values that don't fit in the target dtype are clipped, and floats are rounded when converted to integers.
+    Returns the image itself if it already has the given dtype.
+    """
+    dtype = np.dtype(dtype)
+    if img.dtype == dtype:
+        return img
+    if dtype.kind in 'ui':
+        info = np.iinfo(dtype)
+        if img.dtype.kind == 'f':
+            img = np.rint(img)
+        if img.dtype.kind == 'f' or np.iinfo(img.dtype).max > info.max or np.iinfo(img.dtype).min < info.min:
+            img = np.clip(img, info.min, info.max)
+    return img.astype(dtype)
+
+
+def load_npy(file: Union[str, BinaryIO]) -> np.ndarray:
+    """ Loads an array saved with ``numpy.save``, from any thread
+
+    Only the header is read while holding the lock: the data is read after it's released.
+    """
+    if not isinstance(file, str):
+        with _npy_lock:
+            version = np.lib.format.read_magic(file)
+            read_header = _NPY_HEADER_READERS.get(version)
+            if read_header is None:
+                # Newer format versions are rare enough to be read entirely under the lock
+                file.seek(-np.lib.format.MAGIC_LEN, 1)
+                return np.load(file, allow_pickle=False)
+            shape, fortran_order, dtype = read_header(file)
+        return _read_npy_data(file, shape, fortran_order, dtype)
+    with _npy_lock:
+        data = np.load(file, mmap_mode='r', allow_pickle=False)
+    return np.array(data)
+
+
+def _read_npy_data(file: BinaryIO, shape: Tuple[int, ...], fortran_order: bool, dtype: np.dtype) -> np.ndarray:
+    if dtype.hasobject:
+        raise ValueError('Invalid .npy data: object arrays can\'t be loaded without pickle')
+    array = np.empty(shape[::-1] if fortran_order else shape, dtype=dtype)
+    buffer = memoryview(array.reshape(-1).view(np.uint8))
+    read = 0
+    while read < len(buffer):
+        count = file.readinto(buffer[read:])
+        if not count:
+            raise ValueError(f'Invalid .npy data: expected {len(buffer)} bytes, got {read}')
+        read += count
+    return array.transpose() if fortran_order else array
+
+
+def to_json(value: Any) -> Any:
+    """ Converts values ``json`` can't serialize, like numpy arrays. Meant to be used as ``json.dumps``' default """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
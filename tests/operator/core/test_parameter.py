@@ -477,3 +477,32 @@ def test_boolean_invalid_values(value):
 
     with pytest.raises(AssertionError) as e:
         param.to_config(value)
+
+
+@pytest.mark.parametrize('value, factor, expected', [
+    (9, 0.5, 5),
+    (9, 0.25, 3),
+    (15, 0.01, 1),
+    (15, 4, 31),
+    (15, 1, 15),
+])
+def test_integer_parameter_scale_spatial(value, factor, expected):
+    param = IntegerParameter(default_value=3, lower=1, upper=31, step_size=2, spatial=True)
+    assert param.scale(value, factor) == expected
+
+
+@pytest.mark.parametrize('value, factor, expected', [
+    (4.0, 0.5, 2.0),
+    (4.0, 0.01, 1.0),
+    (4.0, 10, 10.0),
+])
+def test_double_parameter_scale_spatial(value, factor, expected):
+    param = DoubleParameter(default_value=2.5, lower=1, upper=10, spatial=True)
+    assert param.scale(value, factor) == pytest.approx(expected)
+
+
+def test_non_spatial_parameters_are_not_scaled(integer_param, double_param):
+    assert not integer_param.spatial
+    assert integer_param.scale(10, 0.5) == 10
+    assert double_param.scale(2.5, 0.5) == 2.5
+    assert EnumParameter(['a', 'b'], 'a').scale('b', 0.5) == 'b'
@@ -36,3 +36,8 @@ class TestOperatorSettingsMixin:
             @TEST_SETTING(30)
             class Foo(object):
                 pass
+
+    def test_get_settings(self, test_class):
+        assert test_class.get_settings() == {}
+        test_class.set(TEST_SETTING, 10)
+        assert test_class.get_settings() == {TEST_SETTING: 10}
@@ -0,0 +1,13 @@
+from ezcv.operator.implementations.benchmark import BenchmarkResult, benchmark, format_results
+
+
+def test_benchmark():
+    results = benchmark((16, 16), repeats=1)
+    assert len(results) > 0
+    assert all(result.numpy > 0 for result in results)
+    assert len(format_results(results).splitlines()) == len(results) + 1
+
+
+def test_ratio():
+    assert BenchmarkResult('op', numpy=2.0, opencv=None).ratio is None
+    assert BenchmarkResult('op', numpy=2.0, opencv=0.5).ratio == 4
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.blur import BoxBlur, GaussianBlur
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img, parametrize_img
+
+
+def _gaussian(img, kernel_size, sigma=0):
+    operator = GaussianBlur()
+    operator.kernel_size = kernel_size
+    operator.sigma = sigma
+    return operator.run(img, PipelineContext(img))
+
+
+def _box(img, kernel_size):
+    operator = BoxBlur()
+    operator.kernel_size = kernel_size
+    return operator.run(img, PipelineContext(img))
+
+
+@parametrize_img
+def test_gaussian_blur_shape(img):
+    out = _gaussian(img, 5)
+    assert out.shape == img.shape
+    assert out.dtype == np.uint8
+
+
+def test_gaussian_blur_constant():
+    img = np.full((8, 8, 3), 77, dtype=np.uint8)
+    assert np.array_equal(_gaussian(img, 7, 2), img)
+
+
+def test_gaussian_blur_impulse():
+    img = np.zeros((9, 9), dtype=np.uint8)
+    img[4, 4] = 255
+    out = _gaussian(img, 3)
+    expected = np.rint(np.outer([0.25, 0.5, 0.25], [0.25, 0.5, 0.25]) * 255)
+    assert np.array_equal(out[3:6, 3:6], expected)
+    assert out.sum() == out[3:6, 3:6].sum()
+
+
+def test_box_blur():
+    img = np.array([[0, 0, 90, 0, 0]], dtype=np.uint8)
+    assert _box(img, 3).tolist() == [[0, 30, 30, 30, 0]]
+
+
+def test_box_blur_reflects_borders():
+    img = np.array([[90, 0, 0]], dtype=np.uint8)
+    # The row is mirrored around its first pixel: 0 90 0 0
+    assert _box(img, 3).tolist() == [[30, 30, 0]]
+
+
+@parametrize_img
+def test_box_blur_size_1(img):
+    assert np.array_equal(_box(img, 1), img)
+
+
+def test_box_blur_larger_than_image():
+    img = build_img((5, 7), rgb=True)
+    out = _box(img, 51)
+    assert out.shape == img.shape
+    assert out.min() >= img.min() and out.max() <= img.max()
+
+
+@pytest.mark.parametrize('kernel_size,sigma', [(3, 0), (5, 1.5), (9, 0), (15, 4), (41, 0)])
+def test_gaussian_opencv_parity(kernel_size, sigma):
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((40, 30), rgb=True)
+    expected = cv2.GaussianBlur(img, (kernel_size, kernel_size), sigma)
+    assert np.abs(_gaussian(img, kernel_size, sigma).astype(int) - expected).max() <= 1
+
+
+@pytest.mark.parametrize('kernel_size', [2, 3, 8, 35])
+def test_box_opencv_parity(kernel_size):
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((40, 30), rgb=True)
+    expected = cv2.blur(img, (kernel_size, kernel_size))
+    assert np.abs(_box(img, kernel_size).astype(int) - expected).max() <= 1
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.color_space import ColorSpaceChange
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img
+
+
+def _run(img, src, target):
+    operator = ColorSpaceChange()
+    operator.src = src
+    operator.target = target
+    return operator.run(img, PipelineContext(img))
+
+
+def test_bgr_to_gray():
+    img = np.array([[[255, 0, 0], [0, 255, 0], [0, 0, 255], [255, 255, 255]]], dtype=np.uint8)
+    assert _run(img, 'BGR', 'GRAY').tolist() == [[29, 150, 76, 255]]
+
+
+def test_rgb_to_gray():
+    img = np.array([[[0, 0, 255]]], dtype=np.uint8)
+    assert _run(img, 'RGB', 'GRAY').tolist() == [[29]]
+
+
+def test_bgr_to_rgb():
+    img = build_img((4, 5), rgb=True)
+    assert np.array_equal(_run(img, 'BGR', 'RGB'), img[:, :, ::-1])
+
+
+def test_gray_to_bgr():
+    img = build_img((4, 5))
+    out = _run(img, 'GRAY', 'BGR')
+    assert out.shape == (4, 5, 3)
+    assert all(np.array_equal(out[:, :, i], img) for i in range(3))
+
+
+def test_bgr_to_hsv():
+    img = np.array([[[0, 0, 255], [0, 255, 0], [255, 0, 0], [128, 128, 128], [0, 0, 0]]], dtype=np.uint8)
+    expected = [[[0, 255, 255], [60, 255, 255], [120, 255, 255], [0, 0, 128], [0, 0, 0]]]
+    assert _run(img, 'BGR', 'HSV').tolist() == expected
+
+
+def test_hsv_round_trip():
+    img = build_img((16, 16), rgb=True)
+    out = _run(_run(img, 'BGR', 'HSV'), 'HSV', 'BGR')
+    # Hue only has 180 levels, which loses a bit of precision on saturated colors
+    assert np.abs(out.astype(int) - img).max() <= 4
+
+
+def test_same_color_space():
+    img = build_img((4, 5), rgb=True)
+    assert _run(img, 'BGR', 'BGR') is img
+
+
+@pytest.mark.parametrize('src,shape', [('GRAY', (4, 5, 3)), ('BGR', (4, 5))])
+def test_invalid_image(src, shape):
+    with pytest.raises(ValueError):
+        _run(np.zeros(shape, dtype=np.uint8), src, 'RGB')
+
+
+def test_run_batch():
+    imgs = np.stack([build_img((4, 5), rgb=True) for _ in range(3)])
+    operator = ColorSpaceChange()
+    operator.target = 'HSV'
+    out = operator.run_batch(imgs, [PipelineContext(img) for img in imgs])
+    assert np.array_equal(out, np.stack([operator.run(img, PipelineContext(img)) for img in imgs]))
+
+
+@pytest.mark.parametrize('target,code', [
+    ('GRAY', 'COLOR_BGR2GRAY'), ('HSV', 'COLOR_BGR2HSV'), ('RGB', 'COLOR_BGR2RGB'),
+])
+def test_opencv_parity(target, code):
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((32, 32), rgb=True)
+    expected = cv2.cvtColor(img, getattr(cv2, code))
+    diff = np.abs(_run(img, 'BGR', target).astype(int) - expected)
+    if target == 'HSV':
+        diff[..., 0] = np.minimum(diff[..., 0], 180 - diff[..., 0])
+    assert diff.max() <= 1
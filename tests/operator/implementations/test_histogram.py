@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.histogram import HistogramEqualization
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img
+
+
+def _run(img):
+    return HistogramEqualization().run(img, PipelineContext(img))
+
+
+def test_spreads_levels():
+    img = np.array([[100, 101, 102, 103]], dtype=np.uint8)
+    assert _run(img).tolist() == [[0, 85, 170, 255]]
+
+
+def test_constant_image():
+    img = np.full((4, 4), 60, dtype=np.uint8)
+    assert np.array_equal(_run(img), img)
+
+
+def test_opencv_parity():
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((32, 32)) // 3 + 40
+    assert np.array_equal(_run(img), cv2.equalizeHist(img))
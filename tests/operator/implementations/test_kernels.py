@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.kernels import box_filter, box_sum, filter_separable, gaussian_filter, \
+    gaussian_kernel, integral_image, local_mean_variance, pad, to_uint8
+from ezcv.test_utils import build_img
+
+
+def _naive_windows(img, kernel_size, border='reflect'):
+    """ Returns every window of the padded image, as an ``H×W×k×k(×C)`` array """
+    padded = pad(img, kernel_size, border)
+    height, width = img.shape[:2]
+    return np.stack([
+        np.stack([padded[y:y + kernel_size, x:x + kernel_size] for x in range(width)]) for y in range(height)
+    ])
+
+
+def test_pad():
+    img = np.array([[1, 2, 3]])
+    assert pad(img, 3).tolist() == [[2, 1, 2, 3, 2]] * 3
+    assert pad(img, 3, border='replicate').tolist() == [[1, 1, 2, 3, 3]] * 3
+    # The window of an even kernel has one more pixel before its center than after
+    assert pad(img, 2).tolist() == [[2, 1, 2, 3]] * 2
+
+
+def test_pad_channels():
+    assert pad(build_img((4, 5), rgb=True), 5).shape == (8, 9, 3)
+
+
+@pytest.mark.parametrize('kwargs', [{'kernel_size': 0}, {'kernel_size': 3, 'border': 'wrap'}])
+def test_pad_invalid(kwargs):
+    with pytest.raises(ValueError):
+        pad(np.zeros((3, 3)), **kwargs)
+
+
+def test_to_uint8():
+    assert to_uint8(np.array([-3.0, 1.4, 1.6, 300])).tolist() == [0, 1, 2, 255]
+
+
+def test_gaussian_kernel():
+    kernel = gaussian_kernel(5, 0)
+    # The same as cv2.getGaussianKernel(5, 0)
+    assert np.allclose(kernel, [0.0625, 0.25, 0.375, 0.25, 0.0625])
+    assert np.isclose(gaussian_kernel(7, 2).sum(), 1)
+    assert np.isclose(gaussian_kernel(9, 0).sum(), 1)
+    assert np.argmax(gaussian_kernel(9, 0)) == 4
+
+
+@pytest.mark.parametrize('kernel_size', [0, 4, -1])
+def test_gaussian_kernel_invalid_size(kernel_size):
+    with pytest.raises(ValueError):
+        gaussian_kernel(kernel_size, 1)
+
+
+@pytest.mark.parametrize('border', ['reflect', 'replicate'])
+@pytest.mark.parametrize('rgb', [False, True])
+def test_filter_separable(border, rgb):
+    img = build_img((9, 11), rgb=rgb)
+    kernel = np.array([0.1, 0.2, 0.3, 0.4])
+    windows = _naive_windows(img.astype(np.float64), len(kernel), border)
+    expected = np.einsum('yxij...,i,j->yx...', windows, kernel, kernel)
+    assert np.allclose(filter_separable(img, kernel, border), expected, atol=1e-3)
+
+
+def test_gaussian_filter():
+    img = build_img((9, 11))
+    expected = filter_separable(img, gaussian_kernel(5, 1.2))
+    assert np.array_equal(gaussian_filter(img, 5, 1.2), expected)
+
+
+def test_integral_image():
+    img = np.array([[1, 2], [3, 4]], dtype=np.uint8)
+    assert integral_image(img).tolist() == [[0, 0, 0], [0, 1, 3], [0, 4, 10]]
+    assert integral_image(img).dtype == np.int64
+    assert integral_image(img.astype(np.float32)).dtype == np.float64
+
+
+def test_integral_image_does_not_overflow():
+    img = np.full((300, 300), 255, dtype=np.uint8)
+    assert integral_image(img)[-1, -1] == 255 * 300 * 300
+
+
+@pytest.mark.parametrize('kernel_size', [1, 2, 3, 6, 15])
+@pytest.mark.parametrize('border', ['reflect', 'replicate'])
+@pytest.mark.parametrize('rgb', [False, True])
+def test_box_sum(kernel_size, border, rgb):
+    img = build_img((9, 11), rgb=rgb)
+    expected = _naive_windows(img.astype(np.int64), kernel_size, border).sum(axis=(2, 3))
+    assert np.array_equal(box_sum(img, kernel_size, border), expected)
+
+
+def test_box_filter():
+    img = np.array([[0, 0, 90, 0, 0]], dtype=np.uint8)
+    assert np.allclose(box_filter(img, 3)[0], [0, 30, 30, 30, 0])
+
+
+@pytest.mark.parametrize('kernel_size', [1, 4, 7])
+def test_local_mean_variance(kernel_size):
+    img = build_img((10, 8), rgb=True)
+    windows = _naive_windows(img.astype(np.float64), kernel_size)
+    mean, variance = local_mean_variance(img, kernel_size)
+    assert np.allclose(mean, windows.mean(axis=(2, 3)))
+    assert np.allclose(variance, windows.var(axis=(2, 3)))
+
+
+def test_local_variance_of_constant_image():
+    _, variance = local_mean_variance(np.full((6, 6), 200, dtype=np.uint8), 5)
+    assert np.array_equal(variance, np.zeros((6, 6)))
+
+
+def test_local_mean_variance_float():
+    img = np.random.rand(6, 7).astype(np.float32)
+    windows = _naive_windows(img.astype(np.float64), 3)
+    _, variance = local_mean_variance(img, 3)
+    assert np.allclose(variance, windows.var(axis=(2, 3)))
+    assert variance.min() >= 0
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.local_statistics import LocalStatistics
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img, parametrize_img
+
+
+def _run(img, statistic, kernel_size=3):
+    operator = LocalStatistics()
+    operator.statistic = statistic
+    operator.kernel_size = kernel_size
+    return operator.run(img, PipelineContext(img))
+
+
+def test_mean():
+    img = np.array([[0, 0, 90, 0, 0]], dtype=np.uint8)
+    assert _run(img, 'mean').tolist() == [[0, 30, 30, 30, 0]]
+
+
+def test_std():
+    # Each window of the row is mirrored vertically, and holds 0 0 90 three times
+    img = np.array([[0, 0, 90, 0, 0]], dtype=np.uint8)
+    assert _run(img, 'std').tolist() == [[0, 42, 42, 42, 0]]
+
+
+def test_variance_saturates():
+    img = np.array([[0, 255] * 4] * 4, dtype=np.uint8)
+    assert np.array_equal(_run(img, 'variance'), np.full(img.shape, 255))
+
+
+def test_constant_image():
+    img = np.full((8, 8), 100, dtype=np.uint8)
+    assert np.array_equal(_run(img, 'std', 7), np.zeros((8, 8)))
+
+
+@parametrize_img
+@pytest.mark.parametrize('statistic', ['mean', 'std', 'variance'])
+def test_shape(img, statistic):
+    out = _run(img, statistic, 5)
+    assert out.shape == img.shape
+    assert out.dtype == np.uint8
+
+
+def test_std_opencv_parity():
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((30, 30))
+    windows = img.astype(np.float32)
+    mean = cv2.blur(windows, (9, 9))
+    expected = np.sqrt(np.maximum(cv2.blur(windows * windows, (9, 9)) - mean * mean, 0))
+    assert np.abs(_run(img, 'std', 9).astype(int) - np.rint(expected)).max() <= 1
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.morphology import Morphology
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img, parametrize_img
+
+
+def _run(img, operation, kernel_size=3, iterations=1):
+    operator = Morphology()
+    operator.operation = operation
+    operator.kernel_size = kernel_size
+    operator.iterations = iterations
+    return operator.run(img, PipelineContext(img))
+
+
+def _square(size=9, inner=(3, 6)):
+    img = np.zeros((size, size), dtype=np.uint8)
+    img[inner[0]:inner[1], inner[0]:inner[1]] = 255
+    return img
+
+
+def test_erode():
+    out = _run(_square(), 'erode')
+    assert np.argwhere(out).tolist() == [[4, 4]]
+
+
+def test_dilate():
+    out = _run(_square(), 'dilate')
+    assert np.array_equal(out, _square(inner=(2, 7)))
+
+
+def test_iterations():
+    assert np.array_equal(_run(_square(), 'dilate', iterations=2), _square(inner=(1, 8)))
+
+
+def test_open_removes_specks():
+    img = _square()
+    img[0, 8] = 255
+    assert np.array_equal(_run(img, 'open'), _square())
+
+
+def test_close_fills_holes():
+    img = _square()
+    img[4, 4] = 0
+    assert np.array_equal(_run(img, 'close'), _square())
+
+
+def test_borders_are_ignored():
+    img = np.full((5, 5), 255, dtype=np.uint8)
+    assert np.array_equal(_run(img, 'erode', kernel_size=5), img)
+
+
+@parametrize_img
+def test_shape(img):
+    assert _run(img, 'close', kernel_size=4).shape == img.shape
+
+
+@pytest.mark.parametrize('operation,code', [('erode', 'MORPH_ERODE'), ('dilate', 'MORPH_DILATE'),
+                                            ('open', 'MORPH_OPEN'), ('close', 'MORPH_CLOSE')])
+@pytest.mark.parametrize('kernel_size', [3, 4])
+def test_opencv_parity(operation, code, kernel_size):
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((20, 24), rgb=True)
+    kernel = np.ones((kernel_size, kernel_size), dtype=np.uint8)
+    expected = cv2.morphologyEx(img, getattr(cv2, code), kernel)
+    assert np.array_equal(_run(img, operation, kernel_size), expected)
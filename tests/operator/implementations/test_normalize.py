@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.normalize import Normalize
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img
+
+
+def _run(img, lower=0, upper=255):
+    operator = Normalize()
+    operator.lower = lower
+    operator.upper = upper
+    return operator.run(img, PipelineContext(img))
+
+
+def test_stretches():
+    img = np.array([[50, 100, 250]], dtype=np.uint8)
+    assert _run(img).tolist() == [[0, 64, 255]]
+    assert _run(img, 10, 90).tolist() == [[10, 30, 90]]
+
+
+def test_swapped_limits():
+    img = np.array([[50, 100, 150]], dtype=np.uint8)
+    assert _run(img, 20, 10).tolist() == [[10, 15, 20]]
+
+
+def test_constant_image():
+    img = np.full((3, 3), 42, dtype=np.uint8)
+    assert np.array_equal(_run(img, 7, 200), np.full((3, 3), 7))
+
+
+def test_opencv_parity():
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((20, 20), rgb=True) // 2 + 30
+    expected = cv2.normalize(img, None, 0, 255, cv2.NORM_MINMAX)
+    assert np.abs(_run(img).astype(int) - expected).max() <= 1
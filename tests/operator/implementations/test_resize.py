@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.resize import Resize
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img, parametrize_img
+
+
+def _run(img, scale, interpolation):
+    operator = Resize()
+    operator.scale = scale
+    operator.interpolation = interpolation
+    return operator.run(img, PipelineContext(img))
+
+
+@pytest.mark.parametrize('interpolation', ['nearest', 'linear', 'area'])
+@pytest.mark.parametrize('scale,expected', [(0.5, (8, 10)), (2, (32, 40)), (0.3, (5, 6))])
+def test_shape(interpolation, scale, expected):
+    img = build_img((16, 20), rgb=True)
+    assert _run(img, scale, interpolation).shape == expected + (3,)
+
+
+@parametrize_img
+def test_never_empty(img):
+    assert _run(img, 0.01, 'area').shape[:2] == (1, 1)
+
+
+def test_nearest():
+    img = np.arange(16, dtype=np.uint8).reshape(4, 4)
+    assert _run(img, 0.5, 'nearest').tolist() == [[0, 2], [8, 10]]
+    assert _run(img[:1, :2], 2, 'nearest').tolist() == [[0, 0, 1, 1], [0, 0, 1, 1]]
+
+
+def test_linear():
+    img = np.array([[0, 100]], dtype=np.uint8)
+    assert _run(img, 2, 'linear').tolist() == [[0, 25, 75, 100]] * 2
+
+
+def test_area():
+    img = np.arange(36, dtype=np.uint8).reshape(6, 6)
+    assert _run(img, 1 / 3, 'area').tolist() == [[7, 10], [25, 28]]
+
+
+def test_area_fractional():
+    img = np.array([[0, 30, 60]], dtype=np.uint8)
+    # Each output pixel covers one and a half source pixels
+    assert _run(img, 2 / 3, 'area')[0].tolist() == [10, 50]
+
+
+@pytest.mark.parametrize('interpolation,code', [('nearest', 'INTER_NEAREST'), ('linear', 'INTER_LINEAR'),
+                                                ('area', 'INTER_AREA')])
+@pytest.mark.parametrize('scale', [0.5, 0.3, 2])
+def test_opencv_parity(interpolation, code, scale):
+    cv2 = pytest.importorskip('cv2')
+    if interpolation == 'area' and scale > 1:
+        pytest.skip('Enlarging with area interpolation falls back to linear, unlike OpenCV')
+    img = build_img((30, 40), rgb=True)
+    expected = cv2.resize(img, None, fx=scale, fy=scale, interpolation=getattr(cv2, code))
+    assert np.abs(_run(img, scale, interpolation).astype(int) - expected).max() <= 1
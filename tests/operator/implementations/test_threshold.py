@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from ezcv.operator.implementations.threshold import AdaptiveThreshold, Threshold, otsu_threshold
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img
+
+IMG = np.array([[0, 100, 127, 128, 200, 255]], dtype=np.uint8)
+
+
+def _operator(method, threshold=127, max_value=255):
+    operator = Threshold()
+    operator.method = method
+    operator.threshold = threshold
+    operator.max_value = max_value
+    return operator
+
+
+@pytest.mark.parametrize('method,expected', [
+    ('binary', [0, 0, 0, 255, 255, 255]),
+    ('binary_inv', [255, 255, 255, 0, 0, 0]),
+    ('trunc', [0, 100, 127, 127, 127, 127]),
+    ('tozero', [0, 0, 0, 128, 200, 255]),
+    ('tozero_inv', [0, 100, 127, 0, 0, 0]),
+])
+def test_methods(method, expected):
+    operator = _operator(method)
+    assert operator.run(IMG, PipelineContext(IMG)).tolist() == [expected]
+    assert np.array_equal(operator.get_lut()[IMG], operator.run(IMG, PipelineContext(IMG)))
+
+
+def test_max_value():
+    assert _operator('binary', max_value=1).run(IMG, PipelineContext(IMG)).tolist() == [[0, 0, 0, 1, 1, 1]]
+
+
+def test_otsu():
+    img = np.array([[10] * 8 + [200] * 8], dtype=np.uint8)
+    operator = _operator('otsu', max_value=1)
+    ctx = PipelineContext(img)
+    out = operator.run(img, ctx)
+    assert 10 <= ctx.info['threshold'] < 200
+    assert out.tolist() == [[0] * 8 + [1] * 8]
+    assert operator.get_lut() is None
+
+
+def test_otsu_constant_image():
+    assert otsu_threshold(np.full((4, 4), 50, dtype=np.uint8)) == 0
+
+
+def test_otsu_opencv_parity():
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((32, 32))
+    threshold, expected = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    assert otsu_threshold(img) == threshold
+    assert np.array_equal(_operator('otsu').run(img, PipelineContext(img)), expected)
+
+
+def _adaptive(img, block_size=3, c=0, method='mean', inverted=False):
+    operator = AdaptiveThreshold()
+    operator.block_size = block_size
+    operator.c = c
+    operator.method = method
+    operator.inverted = inverted
+    return operator.run(img, PipelineContext(img))
+
+
+def test_adaptive():
+    img = np.array([[10, 10, 10, 40, 10, 10, 10]], dtype=np.uint8)
+    assert _adaptive(img).tolist() == [[0, 0, 0, 255, 0, 0, 0]]
+    assert _adaptive(img, inverted=True).tolist() == [[255, 255, 255, 0, 255, 255, 255]]
+
+
+def test_adaptive_constant():
+    img = np.full((5, 5), 100, dtype=np.uint8)
+    # Pixels equal to their mean are only selected when c is positive
+    assert np.array_equal(_adaptive(img, c=0), np.zeros((5, 5)))
+    assert np.array_equal(_adaptive(img, c=1), np.full((5, 5), 255))
+
+
+def test_adaptive_uneven_lighting():
+    # A dark stripe on a gradient, which no global threshold can isolate
+    img = np.tile(np.linspace(50, 200, 32).astype(np.uint8), (9, 1))
+    img[4] -= 40
+    out = _adaptive(img, block_size=5, c=5, inverted=True, method='gaussian')
+    assert (out[4] == 255).all()
+    assert (out[:3] == 0).all() and (out[6:] == 0).all()
+
+
+@pytest.mark.parametrize('method,code', [
+    ('mean', 'ADAPTIVE_THRESH_MEAN_C'), ('gaussian', 'ADAPTIVE_THRESH_GAUSSIAN_C'),
+])
+@pytest.mark.parametrize('block_size,c', [(3, 0), (11, 2), (51, -3)])
+@pytest.mark.parametrize('inverted', [False, True])
+def test_adaptive_opencv_parity(method, code, block_size, c, inverted):
+    cv2 = pytest.importorskip('cv2')
+    img = build_img((40, 40))
+    flags = cv2.THRESH_BINARY_INV if inverted else cv2.THRESH_BINARY
+    expected = cv2.adaptiveThreshold(img, 255, getattr(cv2, code), flags, block_size, c)
+    out = _adaptive(img, block_size, c, method, inverted)
+    # Means that land right on a rounding boundary may be rounded differently
+    assert np.mean(out != expected) < 0.01
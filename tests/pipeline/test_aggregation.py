@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.operator import Operator
+from ezcv.pipeline import InfoAggregator, PipelineContext
+from ezcv.test_utils import build_img, assert_terms_in_exception
+from ezcv.typing import Image
+
+
+@pytest.fixture
+def aggregator():
+    return InfoAggregator(initial_capacity=2)
+
+
+def test_append_flattens_paths(aggregator):
+    aggregator.append({'op1': {'count': 1, 'nested': {'value': 2.5}}, 'op2': {}})
+    assert aggregator.columns == ['op1/count', 'op1/nested/value']
+    assert len(aggregator) == 1
+
+
+def test_column_values(aggregator):
+    for i in range(5):
+        aggregator.append({'op': {'count': i}})
+    column = aggregator.column('op/count')
+    assert column.shape == (5,)
+    assert np.all(column == np.arange(5))
+
+
+def test_column_is_read_only_view(aggregator):
+    aggregator.append({'op': {'count': 1}})
+    column = aggregator.column('op/count')
+    assert not column.flags.owndata
+    with pytest.raises(ValueError) as e:
+        column[0] = 10
+    assert_terms_in_exception(e, ['read-only'])
+
+
+def test_fixed_shape_values(aggregator):
+    for i in range(3):
+        aggregator.append({'op': {'color': np.full(3, i, dtype='uint8')}})
+    column = aggregator.column('op/color')
+    assert column.shape == (3, 3)
+    assert column.dtype == np.uint8
+    assert np.all(column[2] == 2)
+
+
+def test_missing_values_mask(aggregator):
+    aggregator.append({'op': {'a': 1}})
+    aggregator.append({'op': {'b': 2}})
+    aggregator.append({'op': {'a': 3, 'b': 4}})
+    assert np.all(aggregator.mask('op/a') == [True, False, True])
+    assert np.all(aggregator.mask('op/b') == [False, True, True])
+    assert np.all(aggregator.column('op/b')[1:] == [2, 4])
+
+
+def test_dtype_promotion(aggregator):
+    aggregator.append({'op': {'value': 1}})
+    aggregator.append({'op': {'value': 2.5}})
+    column = aggregator.column('op/value')
+    assert column.dtype.kind == 'f'
+    assert np.all(column == [1, 2.5])
+
+
+def test_variable_shape_falls_back_to_object(aggregator):
+    aggregator.append({'op': {'contours': np.zeros((2, 2))}})
+    aggregator.append({'op': {'contours': np.zeros((3, 2))}})
+    column = aggregator.column('op/contours')
+    assert column.dtype == object
+    assert column[0].shape == (2, 2)
+    assert column[1].shape == (3, 2)
+
+
+def test_ragged_values_fall_back_to_object(aggregator):
+    aggregator.append({'op': {'contours': [[1, 2], [3]]}})
+    assert aggregator.column('op/contours')[0] == [[1, 2], [3]]
+
+
+def test_failed_append_leaves_no_partial_row(aggregator):
+    class Unconvertible(object):
+        def __array__(self, *args, **kwargs):
+            raise TypeError('Not convertible')
+
+    aggregator.append({'op': {'count': 1}})
+    with pytest.raises(TypeError):
+        aggregator.append({'op': {'count': 2, 'value': Unconvertible()}})
+    aggregator.append({'op': {'total': 3}})
+    assert len(aggregator) == 2
+    assert np.all(aggregator.mask('op/count') == [True, False])
+    assert aggregator.columns == ['op/count', 'op/total']
+
+
+def test_non_numeric_values(aggregator):
+    value = object()
+    aggregator.append({'op': {'value': value}})
+    assert aggregator.column('op/value')[0] is value
+
+
+def test_to_records(aggregator):
+    aggregator.append({'op': {'a': 1, 'b': np.ones(2), 'c': object()}})
+    aggregator.append({'op': {'a': 2, 'b': np.zeros(2), 'c': object()}})
+    records = aggregator.to_records()
+    assert records.dtype.names == ('op/a', 'op/b')
+    assert np.all(records['op/a'] == [1, 2])
+    assert records['op/b'].shape == (2, 2)
+
+
+def test_to_records_object_column(aggregator):
+    aggregator.append({'op': {'c': object()}})
+    with pytest.raises(ValueError):
+        aggregator.to_records(['op/c'])
+
+
+def test_unknown_path(aggregator):
+    with pytest.raises(KeyError) as e:
+        aggregator.column('invalid')
+    assert_terms_in_exception(e, ['unknown', 'path'])
+
+
+@pytest.mark.parametrize('info', [None, 10, 'info', [1, 2]])
+def test_invalid_info(aggregator, info):
+    with pytest.raises(ValueError) as e:
+        aggregator.append(info)
+    assert_terms_in_exception(e, ['invalid', 'info'])
+
+
+@pytest.mark.parametrize('capacity', [0, -1, 1.5])
+def test_invalid_capacity(capacity):
+    with pytest.raises(ValueError):
+        InfoAggregator(initial_capacity=capacity)
+
+
+def test_append_pipeline_context(aggregator):
+    class MeanOperator(Operator):
+        def run(self, img: Image, ctx: PipelineContext) -> Image:
+            ctx.add_info('mean', img.mean())
+            return img
+
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('mean', MeanOperator())
+    imgs = [build_img((16, 16)) for _ in range(5)]
+    for img in imgs:
+        _, ctx = pipeline.run(img)
+        aggregator.append(ctx)
+
+    assert np.allclose(aggregator.column('mean/mean'), [img.mean() for img in imgs])
@@ -0,0 +1,145 @@
+import time
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.capture import IntermediateCapture
+from ezcv.test_utils import build_img, assert_terms_in_exception
+from ezcv.typing import Image
+
+
+class AddOneOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return img + 1
+
+
+class SlowAddOneOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        time.sleep(0.001)
+        return img + 1
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('op1', AddOneOperator())
+    pipeline.add_operator('op2', AddOneOperator())
+    return pipeline
+
+
+@pytest.fixture(params=['memory', 'spill'])
+def capture_factory(request, tmp_path):
+    def factory(**kwargs):
+        if request.param == 'spill':
+            kwargs['spill_path'] = str(tmp_path / 'scratch.bin')
+        return IntermediateCapture(**kwargs)
+    return factory
+
+
+def test_capture_disabled_by_default(pipeline):
+    assert pipeline.capture is None
+
+
+def test_records_every_operator(pipeline, capture_factory):
+    pipeline.capture = capture_factory()
+    img = build_img((16, 16), kind='black')
+    pipeline.run(img)
+    images = pipeline.capture.get_run()
+    assert list(images.keys()) == ['op1', 'op2']
+    assert np.all(images['op1'] == 1)
+    assert np.all(images['op2'] == 2)
+
+
+def test_concurrent_runs(capture_factory):
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('op1', SlowAddOneOperator())
+    pipeline.add_operator('op2', SlowAddOneOperator())
+    pipeline.capture = capture_factory(max_bytes=2 ** 20)
+    imgs = [np.full((4, 4), i, dtype=np.uint8) for i in range(100)]
+    outputs = [img for img, _ in pipeline.run_stream(imgs, workers=8)]
+    assert len(outputs) == 100
+    runs = pipeline.capture.runs
+    assert len(runs) == 100
+    # Each run holds the intermediates of a single image, whichever order the runs started in
+    inputs = set()
+    for run in runs:
+        images = pipeline.capture.get_run(run)
+        assert list(images) == ['op1', 'op2']
+        assert np.all(images['op2'] == images['op1'][0, 0] + 1)
+        inputs.add(int(images['op1'][0, 0]) - 1)
+    assert inputs == set(range(100))
+
+
+def test_get_latest(pipeline, capture_factory):
+    pipeline.capture = capture_factory()
+    pipeline.run(build_img((16, 16), kind='black'))
+    pipeline.run(build_img((16, 16), kind='white'))
+    assert np.all(pipeline.capture.get('op1') == 0)
+    assert np.all(pipeline.capture.get('op1', run=-2) == 1)
+    assert np.all(pipeline.capture.get('op1', run=0) == 1)
+
+
+def test_budget_discards_oldest(pipeline, capture_factory):
+    img = build_img((16, 16))
+    pipeline.capture = capture_factory(max_bytes=3 * img.nbytes)
+    for _ in range(4):
+        pipeline.run(img)
+    capture = pipeline.capture
+    assert capture.nbytes <= capture.max_bytes
+    assert capture.runs == [2, 3]
+    assert list(capture.get_run(2).keys()) == ['op2']
+    assert np.all(capture.get('op2') == img + 2)
+
+
+def test_image_bigger_than_budget(pipeline, capture_factory):
+    img = build_img((16, 16))
+    pipeline.capture = capture_factory(max_bytes=img.nbytes - 1)
+    pipeline.run(img)
+    assert pipeline.capture.nbytes == 0
+    with pytest.raises(KeyError):
+        pipeline.capture.get('op1')
+
+
+def test_thumbnail(pipeline, capture_factory):
+    pipeline.capture = capture_factory(thumbnail_size=16)
+    pipeline.run(build_img((64, 32), rgb=True))
+    assert pipeline.capture.get('op1').shape == (16, 8, 3)
+
+
+def test_stored_images_are_copies(capture_factory):
+    capture = capture_factory()
+    img = build_img((16, 16), kind='black')
+    capture.record('op', img)
+    img[:] = 255
+    assert np.all(capture.get('op') == 0)
+
+
+def test_get_unknown_name(pipeline, capture_factory):
+    pipeline.capture = capture_factory()
+    pipeline.run(build_img((16, 16)))
+    with pytest.raises(KeyError) as e:
+        pipeline.capture.get('invalid')
+    assert_terms_in_exception(e, ['no image', 'invalid'])
+
+
+def test_clear(pipeline, capture_factory):
+    pipeline.capture = capture_factory()
+    pipeline.run(build_img((16, 16)))
+    pipeline.capture.clear()
+    assert pipeline.capture.nbytes == 0
+    assert pipeline.capture.runs == []
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'max_bytes': 0},
+    {'max_bytes': -1},
+    {'thumbnail_size': 0},
+    {'thumbnail_size': 1.5},
+])
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError) as e:
+        IntermediateCapture(**kwargs)
+    assert_terms_in_exception(e, ['invalid'])
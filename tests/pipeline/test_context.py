@@ -1,7 +1,8 @@
 import numpy as np
 import pytest
 
-from ezcv.pipeline.context import PipelineContext
+from ezcv.exceptions import RunCancelledError
+from ezcv.pipeline.context import CancellationToken, PipelineContext
 from ezcv.test_utils import build_img, parametrize_img, assert_terms_in_exception
 
 
@@ -144,3 +145,38 @@ def test_pipeline_context_add_info_nested_scope(ctx):
     }
 
 
+def test_pipeline_context_scope_reentered(ctx):
+    info_object = object()
+    with ctx.scope('scope'):
+        ctx.add_info('first', info_object)
+    with ctx.scope('scope'):
+        ctx.add_info('second', info_object)
+        with pytest.raises(ValueError) as e:
+            ctx.add_info('first', info_object)
+
+    assert_terms_in_exception(e, ['duplicated', 'name'])
+    assert ctx.info == {'scope': {'first': info_object, 'second': info_object}}
+
+
+def test_pipeline_context_scope_restored_on_exception(ctx):
+    info_object = object()
+    with pytest.raises(RuntimeError):
+        with ctx.scope('scope'):
+            raise RuntimeError()
+    ctx.add_info('info_name', info_object)
+    assert ctx.info == {'scope': {}, 'info_name': info_object}
+
+
+def test_pipeline_context_has_no_instance_dict(ctx):
+    assert not hasattr(ctx, '__dict__')
+
+
+def test_pipeline_context_raise_if_cancelled(original_img):
+    PipelineContext(original_img).raise_if_cancelled()
+    token = CancellationToken()
+    ctx = PipelineContext(original_img, cancel_token=token)
+    ctx.raise_if_cancelled()
+    token.cancel()
+    assert token.cancelled
+    with pytest.raises(RunCancelledError):
+        ctx.raise_if_cancelled()
@@ -8,8 +8,8 @@ import yaml
 
 from ezcv import CompVizPipeline
 from ezcv.operator import Operator, IntegerParameter, DoubleParameter, settings
-from ezcv.pipeline.context import PipelineContext
-from ezcv.exceptions import OperatorFailedError, BadImageError
+from ezcv.pipeline import PipelineContext, OperatorTiming, CancellationToken
+from ezcv.exceptions import OperatorFailedError, BadImageError, RunCancelledError
 from ezcv.pipeline.hooks import PipelineHook
 from ezcv.test_utils import build_img, parametrize_img, assert_terms_in_exception
 from ezcv.typing import Image
@@ -33,7 +33,7 @@ class TestOperator(Operator):
     param2 = DoubleParameter(default_value=PARAM2_DEFAULT_VALUE, lower=PARAM2_LOWER, upper=PARAM2_UPPER)
 
 
-OP1_PARAM1 = 3
+OP1_PARAM1 = 7
 OP1_PARAM2 = 1.5
 
 OP2_PARAM1 = 5
@@ -542,3 +542,433 @@ def test_operator_fail():
 
     with pytest.raises(OperatorFailedError):
         pipeline.run(build_img((16, 16)))
+
+
+class InvertOperator(Operator):
+    def __init__(self):
+        super().__init__()
+        self.run_count = 0
+        self.lut_count = 0
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        self.run_count += 1
+        return 255 - img
+
+    def get_lut(self):
+        self.lut_count += 1
+        return 255 - np.arange(256, dtype='uint8')
+
+
+class AddTenOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return img + 10
+
+    def get_lut(self):
+        return np.arange(256, dtype='uint8') + 10
+
+
+@pytest.fixture
+def lut_pipeline():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('invert', InvertOperator())
+    pipeline.add_operator('add_ten', AddTenOperator())
+    pipeline.add_operator('not_lut', TestOperator())
+    pipeline.add_operator('invert2', InvertOperator())
+    return pipeline
+
+
+class TestLutFusion:
+    @parametrize_img
+    def test_same_result(self, img, lut_pipeline):
+        fused_out, _ = lut_pipeline.run(img)
+        lut_pipeline.fuse_luts = False
+        out, _ = lut_pipeline.run(img)
+        assert np.all(fused_out == out)
+
+    def test_fused_operators_dont_run(self, lut_pipeline):
+        lut_pipeline.run(build_img((16, 16)))
+        assert lut_pipeline.operators['invert'].run_count == 0
+        assert lut_pipeline.operators['invert'].lut_count == 1
+
+    def test_single_lut_operator_runs(self, lut_pipeline):
+        lut_pipeline.run(build_img((16, 16)))
+        assert lut_pipeline.operators['invert2'].run_count == 1
+
+    def test_disabled(self, lut_pipeline):
+        lut_pipeline.fuse_luts = False
+        lut_pipeline.run(build_img((16, 16)))
+        assert lut_pipeline.operators['invert'].run_count == 1
+
+    def test_info_scopes(self, lut_pipeline):
+        _, ctx = lut_pipeline.run(build_img((16, 16)))
+        assert ctx.info == {'invert': {}, 'add_ten': {}, 'not_lut': {}, 'invert2': {}}
+
+    def test_hook_needing_intermediates_disables_fusion(self, lut_pipeline):
+        imgs = list()
+
+        class IntermediatesHook(PipelineHook):
+            def after_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+                imgs.append(img)
+
+        img = build_img((16, 16), kind='black')
+        lut_pipeline.run(img, hooks=[IntermediatesHook()])
+        assert lut_pipeline.operators['invert'].run_count == 1
+        assert np.all(imgs[0] == 255)
+
+    def test_hooks_called_for_every_operator(self, lut_pipeline):
+        operators = list()
+
+        class OperatorsHook(PipelineHook):
+            needs_intermediates = False
+
+            def after_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+                operators.append(operator)
+
+        lut_pipeline.run(build_img((16, 16)), hooks=[OperatorsHook()])
+        assert operators == list(lut_pipeline.operators.values())
+        assert lut_pipeline.operators['invert'].run_count == 0
+
+    def test_gray_only_still_enforced(self):
+        @settings.GRAY_ONLY(True)
+        class GrayInvertOperator(InvertOperator):
+            pass
+
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op1', InvertOperator())
+        pipeline.add_operator('op2', GrayInvertOperator())
+
+        with pytest.raises(OperatorFailedError) as e:
+            pipeline.run(build_img((16, 16), rgb=True))
+
+        assert_terms_in_exception(e, ["expect", "gray"])
+
+    @pytest.mark.parametrize('lut', [
+        np.arange(256),
+        np.arange(255, dtype='uint8'),
+        list(range(256)),
+    ])
+    def test_invalid_lut(self, lut):
+        class InvalidLutOperator(InvertOperator):
+            def get_lut(self):
+                return lut
+
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', InvalidLutOperator())
+        with pytest.raises(OperatorFailedError) as e:
+            pipeline.run(build_img((16, 16)))
+
+        assert_terms_in_exception(e, ['invalid', 'lut'])
+
+
+@settings.INPUT_DTYPES(('float32',))
+class ToFloatOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        assert img.dtype == np.float32
+        return img / 2
+
+
+@settings.INPUT_DTYPES(('float32', 'uint8'))
+class FloatScaleOperator(Operator):
+    def __init__(self):
+        super().__init__()
+        self.input_dtypes = list()
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        self.input_dtypes.append(img.dtype)
+        return img * 3
+
+
+class TestDtypes:
+    def test_float_intermediates_kept(self):
+        scale = FloatScaleOperator()
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('half', ToFloatOperator())
+        pipeline.add_operator('scale', scale)
+        img = np.full((16, 16), 3, dtype='uint8')
+        out, _ = pipeline.run(img)
+        assert scale.input_dtypes == [np.float32]
+        assert out.dtype == np.uint8
+        assert np.all(out == 4)  # round(1.5 * 3), with no quantization in between
+
+    def test_converted_for_uint8_operator(self):
+        checked = list()
+
+        class Uint8Operator(Operator):
+            def run(self, img: Image, ctx: PipelineContext) -> Image:
+                checked.append(img.dtype)
+                return img
+
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('half', ToFloatOperator())
+        pipeline.add_operator('uint8', Uint8Operator())
+        pipeline.run(build_img((16, 16)))
+        assert checked == [np.uint8]
+
+    def test_uint8_input_not_converted(self):
+        scale = FloatScaleOperator()
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('scale', scale)
+        pipeline.run(build_img((16, 16)))
+        assert scale.input_dtypes == [np.uint8]
+
+    def test_no_boundary_dtype(self):
+        pipeline = CompVizPipeline()
+        pipeline.boundary_dtype = None
+        pipeline.add_operator('half', ToFloatOperator())
+        out, ctx = pipeline.run(build_img((16, 16)).astype('uint16'))
+        assert out.dtype == np.float32
+        assert ctx.original_img.dtype == np.uint16
+
+    def test_boundary_dtype_enforced_on_input(self):
+        pipeline = CompVizPipeline()
+        with pytest.raises(BadImageError):
+            pipeline.run(build_img((16, 16)).astype('float32'))
+
+    def test_lut_after_float(self):
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('half', ToFloatOperator())
+        pipeline.add_operator('invert', InvertOperator())
+        pipeline.add_operator('add_ten', AddTenOperator())
+        img = np.full((16, 16), 100, dtype='uint8')
+        out, _ = pipeline.run(img)
+        assert np.all(out == 255 - 50 + 10)
+
+
+class TestWarmup:
+    def test_report(self, pipeline):
+        report = pipeline.warmup(shape=(16, 16), iterations=3)
+        assert list(report.keys()) == ['op1', 'op2']
+        for timing in report.values():
+            assert isinstance(timing, OperatorTiming)
+            assert timing.cold >= 0
+            assert timing.warm >= 0
+
+    def test_runs_all_iterations(self, pipeline):
+        with patch(__name__ + '.TestOperator.run') as mock:
+            mock.side_effect = lambda i, _: i
+            pipeline.warmup(shape=(16, 16, 3), iterations=4)
+            assert mock.call_count == 8
+
+    def test_single_iteration(self, pipeline):
+        report = pipeline.warmup(shape=(16, 16), iterations=1)
+        assert report['op1'].warm is None
+
+    def test_fused_operators(self, lut_pipeline):
+        report = lut_pipeline.warmup(shape=(16, 16))
+        assert list(report.keys()) == ['invert', 'add_ten', 'not_lut', 'invert2']
+
+    def test_shared_operator_instance(self):
+        pipeline = CompVizPipeline()
+        operator = TestOperator()
+        pipeline.add_operator('first', operator)
+        pipeline.add_operator('second', operator)
+        report = pipeline.warmup(shape=(4, 4))
+        assert list(report.keys()) == ['first', 'second']
+        assert all(timing.warm is not None for timing in report.values())
+
+    def test_empty_pipeline(self):
+        assert CompVizPipeline().warmup(shape=(4, 4)) == {}
+
+    @pytest.mark.parametrize('iterations', [0, -1, 1.5])
+    def test_invalid_iterations(self, pipeline, iterations):
+        with pytest.raises(ValueError) as e:
+            pipeline.warmup(shape=(16, 16), iterations=iterations)
+        assert_terms_in_exception(e, ['invalid', 'iterations'])
+
+
+class TestRunStream:
+    @pytest.mark.parametrize('workers', [0, 1, 4])
+    def test_results_in_order(self, pipeline, workers):
+        imgs = [build_img((16, 16), kind='black') + i for i in range(10)]
+        results = list(pipeline.run_stream(imgs, workers=workers))
+        assert len(results) == len(imgs)
+        for (out, ctx), img in zip(results, imgs):
+            assert np.all(out == img + 2)
+            assert np.all(ctx.original_img == img)
+
+    def test_errors_propagate(self):
+        class FailingOperator(Operator):
+            def run(self, img: Image, ctx: PipelineContext) -> Image:
+                raise ValueError('Failed')
+
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', FailingOperator())
+        with pytest.raises(OperatorFailedError):
+            list(pipeline.run_stream([build_img((16, 16))], workers=2))
+
+    @pytest.mark.parametrize('workers', [-1, 1.5])
+    def test_invalid_workers(self, pipeline, workers):
+        with pytest.raises(ValueError) as e:
+            list(pipeline.run_stream([build_img((16, 16))], workers=workers))
+        assert_terms_in_exception(e, ['invalid', 'workers'])
+
+
+class CancellingOperator(Operator):
+    """ Cancels the run it's part of """
+    def __init__(self, token: CancellationToken):
+        super().__init__()
+        self.token = token
+        self.calls = 0
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        self.calls += 1
+        self.token.cancel()
+        return img
+
+
+class CooperativeOperator(Operator):
+    """ Checks for cancellation in its loop """
+    def __init__(self):
+        super().__init__()
+        self.iterations = 0
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        for _ in range(1000):
+            ctx.raise_if_cancelled()
+            self.iterations += 1
+            if self.iterations == 3:
+                ctx.cancel_token.cancel()
+        return img
+
+
+class TestCancellation:
+    def test_cancelled_between_operators(self):
+        token = CancellationToken()
+        first, second = CancellingOperator(token), CancellingOperator(token)
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('first', first)
+        pipeline.add_operator('second', second)
+        with pytest.raises(RunCancelledError):
+            pipeline.run(build_img((16, 16)), cancel_token=token)
+        assert (first.calls, second.calls) == (1, 0)
+
+    def test_cancelled_before_running(self, pipeline):
+        token = CancellationToken()
+        token.cancel()
+        with pytest.raises(RunCancelledError):
+            pipeline.run(build_img((16, 16)), cancel_token=token)
+        with pytest.raises(RunCancelledError):
+            pipeline.run_batch([build_img((16, 16))], cancel_token=token)
+
+    def test_operators_can_check_cancellation(self):
+        operator = CooperativeOperator()
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', operator)
+        with pytest.raises(RunCancelledError):
+            pipeline.run(build_img((16, 16)), cancel_token=CancellationToken())
+        assert operator.iterations == 3
+
+    def test_batch_cancelled_between_operators(self):
+        token = CancellationToken()
+        first, second = CancellingOperator(token), CancellingOperator(token)
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('first', first)
+        pipeline.add_operator('second', second)
+        with pytest.raises(RunCancelledError):
+            pipeline.run_batch([build_img((16, 16))] * 2, cancel_token=token)
+        assert second.calls == 0
+
+    def test_not_cancelled(self, pipeline):
+        img = build_img((16, 16))
+        output, ctx = pipeline.run(img, cancel_token=CancellationToken())
+        assert np.all(output == pipeline.run(img)[0])
+
+
+class VectorizedOperator(Operator):
+    def __init__(self):
+        super().__init__()
+        self.batch_shapes = list()
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        raise AssertionError('run should not be called')
+
+    def run_batch(self, imgs: Image, ctxs):
+        self.batch_shapes.append(imgs.shape)
+        for i, ctx in enumerate(ctxs):
+            ctx.add_info('index', i)
+        return imgs + 1
+
+
+class TestRunBatch:
+    def test_default_run_batch(self, pipeline):
+        imgs = np.stack([build_img((16, 16), kind='black') + i for i in range(4)])
+        outputs, ctxs = pipeline.run_batch(imgs)
+        assert outputs.shape == imgs.shape
+        assert np.all(outputs == imgs + 2)
+        assert len(ctxs) == 4
+        assert all(np.all(ctx.original_img == img) for ctx, img in zip(ctxs, imgs))
+
+    def test_vectorized_operator(self):
+        operator = VectorizedOperator()
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('vectorized', operator)
+        imgs = np.stack([build_img((16, 16), rgb=True) for _ in range(3)])
+        outputs, ctxs = pipeline.run_batch(imgs)
+        assert operator.batch_shapes == [(3, 16, 16, 3)]
+        assert np.all(outputs == imgs + 1)
+        assert [ctx.info for ctx in ctxs] == [{'vectorized': {'index': i}} for i in range(3)]
+
+    def test_list_of_images(self, pipeline):
+        imgs = [build_img((16, 16)) for _ in range(3)]
+        outputs, _ = pipeline.run_batch(imgs)
+        assert outputs.shape == (3, 16, 16)
+
+    def test_same_as_run(self, lut_pipeline):
+        imgs = [build_img((16, 16), rgb=True) for _ in range(3)]
+        outputs, ctxs = lut_pipeline.run_batch(imgs)
+        for img, output, ctx in zip(imgs, outputs, ctxs):
+            expected, expected_ctx = lut_pipeline.run(img)
+            assert np.all(output == expected)
+            assert ctx.info == expected_ctx.info
+
+    def test_hooks_called_per_image(self, pipeline):
+        calls = list()
+
+        class CountingHook(PipelineHook):
+            def after_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+                assert img.shape == (16, 16)
+                calls.append(ctx)
+
+        _, ctxs = pipeline.run_batch([build_img((16, 16)) for _ in range(3)], hooks=[CountingHook()])
+        assert calls == ctxs + ctxs
+
+    @pytest.mark.parametrize('imgs', [
+        [],
+        [build_img((16, 16)), build_img((8, 8))],
+        np.zeros((0, 16, 16), dtype='uint8'),
+        np.zeros((2, 16, 16, 2), dtype='uint8'),
+        np.zeros((16, 16), dtype='uint8'),
+        np.zeros((16, 16, 3), dtype='uint8'),
+        [build_img((16, 16)), build_img((16, 16)).astype('float32')],
+        [build_img((16, 16)), None],
+        [np.zeros((16, 16, 2), dtype='uint8')] * 2,
+    ])
+    def test_invalid_batch(self, pipeline, imgs):
+        with pytest.raises(BadImageError) as e:
+            pipeline.run_batch(imgs)
+        assert_terms_in_exception(e, ['invalid', 'batch'])
+
+    def test_color_image_is_not_a_batch(self, pipeline):
+        with pytest.raises(BadImageError) as e:
+            pipeline.run_batch(build_img((16, 16), rgb=True))
+        assert_terms_in_exception(e, ['color image', 'sequence'])
+
+    def test_gray_images_3_pixels_wide(self, pipeline):
+        imgs = [build_img((16, 3)) for _ in range(2)]
+        outputs, _ = pipeline.run_batch(imgs)
+        assert outputs.shape == (2, 16, 3)
+
+    def test_invalid_operator_return(self):
+        class WrongSizeOperator(Operator):
+            def run_batch(self, imgs: Image, ctxs):
+                return imgs[:1]
+
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', WrongSizeOperator())
+        with pytest.raises(BadImageError) as e:
+            pipeline.run_batch([build_img((16, 16)) for _ in range(2)])
+        assert_terms_in_exception(e, ['invalid', 'returned'])
+
+    def test_warmup_batch(self, pipeline):
+        report = pipeline.warmup(shape=(16, 16), iterations=2, batch_size=4)
+        assert list(report.keys()) == ['op1', 'op2']
@@ -0,0 +1,180 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.exceptions import OperatorFailedError
+from ezcv.operator import Operator, settings
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.capture import IntermediateCapture
+from ezcv.pipeline.executors import StagedExecutor, PROCESSES, THREADS, measure_thread_scaling, releases_gil, \
+    clear_calibration
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+class SleepingOperator(Operator):
+    """ Releases the GIL while sleeping """
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        time.sleep(0.01)
+        ctx.add_info('pid', os.getpid())
+        return img
+
+
+class SpinningOperator(Operator):
+    """ Holds the GIL while spinning """
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        total = 0
+        for i in range(100000):
+            total += i
+        ctx.add_info('pid', os.getpid())
+        return img + 1
+
+
+@settings.RELEASES_GIL(False)
+class DeclaredGilOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        ctx.add_info('pid', os.getpid())
+        return img + 1
+
+
+@settings.RELEASES_GIL(True)
+class DeclaredGilFreeOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        ctx.add_info('pid', os.getpid())
+        return img
+
+
+class FailingOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        raise RuntimeError('failed')
+
+
+@pytest.fixture(autouse=True)
+def calibration():
+    clear_calibration()
+    yield
+    clear_calibration()
+
+
+@pytest.fixture
+def mixed_pipeline():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('free1', DeclaredGilFreeOperator())
+    pipeline.add_operator('free2', DeclaredGilFreeOperator())
+    pipeline.add_operator('bound1', DeclaredGilOperator())
+    pipeline.add_operator('bound2', DeclaredGilOperator())
+    pipeline.add_operator('free3', DeclaredGilFreeOperator())
+    return pipeline
+
+
+def test_measure_thread_scaling():
+    img = build_img((4, 4))
+    assert measure_thread_scaling(SleepingOperator(), img, threads=4) > 2
+    assert measure_thread_scaling(SpinningOperator(), img, threads=4) < 1.5
+
+
+def test_measure_thread_scaling_invalid_threads():
+    with pytest.raises(ValueError):
+        measure_thread_scaling(SleepingOperator(), build_img((4, 4)), threads=1)
+
+
+def test_releases_gil_uses_declared_setting():
+    assert releases_gil(DeclaredGilOperator(), build_img((4, 4))) is False
+    assert releases_gil(DeclaredGilFreeOperator(), build_img((4, 4))) is True
+
+
+def test_releases_gil_calibrates_undeclared_operators():
+    img = build_img((4, 4))
+    assert releases_gil(SleepingOperator(), img) is True
+    assert releases_gil(SpinningOperator(), img) is False
+
+
+def test_releases_gil_caches_per_class(monkeypatch):
+    img = build_img((4, 4))
+    assert releases_gil(SleepingOperator(), img) is True
+    monkeypatch.setattr('ezcv.pipeline.executors.measure_thread_scaling', lambda *args, **kwargs: 1.0)
+    assert releases_gil(SleepingOperator(), img) is True
+    clear_calibration()
+    assert releases_gil(SleepingOperator(), img) is False
+
+
+def test_plan_groups_consecutive_operators(mixed_pipeline):
+    with StagedExecutor(mixed_pipeline, threads=2, processes=1) as executor:
+        assert executor.plan == [
+            (THREADS, ['free1', 'free2']),
+            (PROCESSES, ['bound1', 'bound2']),
+            (THREADS, ['free3']),
+        ]
+
+
+def test_plan_without_processes(mixed_pipeline):
+    with StagedExecutor(mixed_pipeline, threads=2, processes=0) as executor:
+        assert executor.plan == [(THREADS, ['free1', 'free2', 'bound1', 'bound2', 'free3'])]
+
+
+def test_plan_calibrates_with_sample():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('sleep', SleepingOperator())
+    pipeline.add_operator('spin', SpinningOperator())
+    with StagedExecutor(pipeline, threads=2, processes=1, sample=build_img((4, 4))) as executor:
+        assert executor.plan == [(THREADS, ['sleep']), (PROCESSES, ['spin'])]
+
+
+def test_plan_without_sample_uses_threads():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('spin', SpinningOperator())
+    with StagedExecutor(pipeline, threads=2, processes=1) as executor:
+        assert executor.plan == [(THREADS, ['spin'])]
+
+
+def test_run_mixes_threads_and_processes(mixed_pipeline):
+    img = build_img((16, 16), kind='black')
+    with StagedExecutor(mixed_pipeline, threads=2, processes=1) as executor:
+        output, ctx = executor.run(img)
+    assert np.all(output == 2)
+    assert list(ctx.info.keys()) == ['free1', 'free2', 'bound1', 'bound2', 'free3']
+    assert ctx.info['free1']['pid'] == os.getpid()
+    assert ctx.info['bound1']['pid'] != os.getpid()
+    assert ctx.info['bound1']['pid'] == ctx.info['bound2']['pid']
+    assert ctx.info['free3']['pid'] == os.getpid()
+    assert np.all(ctx.original_img == img)
+    assert not ctx.original_img.flags.writeable
+
+
+def test_map_matches_pipeline(mixed_pipeline):
+    imgs = [build_img((16, 16)) for _ in range(10)]
+    with StagedExecutor(mixed_pipeline, threads=3, processes=2) as executor:
+        results = list(executor.map(imgs))
+    assert len(results) == len(imgs)
+    for img, (output, _) in zip(imgs, results):
+        assert np.all(output == mixed_pipeline.run(img)[0])
+
+
+def test_map_captures_one_run_per_image(mixed_pipeline):
+    mixed_pipeline.capture = IntermediateCapture()
+    imgs = [build_img((16, 16), kind='black') + i for i in range(5)]
+    with StagedExecutor(mixed_pipeline, threads=2, processes=0) as executor:
+        list(executor.map(imgs))
+    assert len(mixed_pipeline.capture.runs) == 5
+    firsts = sorted(int(mixed_pipeline.capture.get('free1', run=run)[0, 0]) for run in mixed_pipeline.capture.runs)
+    assert firsts == list(range(5))
+
+
+def test_process_stage_failure():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('failing', settings.RELEASES_GIL(False)(FailingOperator)())
+    with StagedExecutor(pipeline, threads=1, processes=1) as executor:
+        with pytest.raises(OperatorFailedError):
+            executor.run(build_img((4, 4)))
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'threads': 0},
+    {'processes': -1},
+])
+def test_invalid_arguments(mixed_pipeline, kwargs):
+    with pytest.raises(ValueError):
+        StagedExecutor(mixed_pipeline, **kwargs)
@@ -0,0 +1,82 @@
+import multiprocessing
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.operator import Operator, IntegerParameter
+from ezcv.operator.settings import OperatorSetting
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+PICKLE_TEST_SETTING = OperatorSetting('PICKLE_TEST_SETTING', 'default')
+
+
+class CachingOperator(Operator):
+    value = IntegerParameter(default_value=1, lower=0, upper=100)
+
+    def __init__(self):
+        super().__init__()
+        self.cache = np.zeros(10 ** 6, dtype='uint8')
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        ctx.add_info('setting', self.get(PICKLE_TEST_SETTING))
+        return img + self.value
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = CompVizPipeline()
+    operator = CachingOperator()
+    operator.value = 3
+    pipeline.add_operator('op', operator)
+    pipeline.add_operator('default', CachingOperator())
+    return pipeline
+
+
+def test_round_trip(pipeline):
+    rebuilt = pickle.loads(pickle.dumps(pipeline))
+    assert list(rebuilt.operators.keys()) == ['op', 'default']
+    assert rebuilt.operators['op'].value == 3
+    assert rebuilt.operators['default'].value == 1
+    img = build_img((16, 16), kind='black')
+    assert np.all(rebuilt.run(img)[0] == pipeline.run(img)[0])
+
+
+def test_pickle_is_small(pipeline):
+    assert len(pickle.dumps(pipeline)) < 2000
+
+
+def test_options_carried_over(pipeline):
+    pipeline.fuse_luts = False
+    pipeline.boundary_dtype = None
+    rebuilt = pickle.loads(pickle.dumps(pipeline))
+    assert rebuilt.fuse_luts is False
+    assert rebuilt.boundary_dtype is None
+
+
+def test_settings_carried_over(pipeline):
+    CachingOperator.set(PICKLE_TEST_SETTING, 'custom')
+    try:
+        data = pickle.dumps(pipeline)
+        CachingOperator.set(PICKLE_TEST_SETTING, 'other')
+        rebuilt = pickle.loads(data)
+        assert CachingOperator.get(PICKLE_TEST_SETTING) == 'custom'
+        _, ctx = rebuilt.run(build_img((16, 16)))
+        assert ctx.info['op']['setting'] == 'custom'
+    finally:
+        CachingOperator.set(PICKLE_TEST_SETTING, 'default')
+
+
+def _run_pipeline(pipeline: CompVizPipeline, img: Image) -> Image:
+    return pipeline.run(img)[0]
+
+
+def test_run_in_another_process(pipeline):
+    img = build_img((16, 16), kind='black')
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        output = executor.submit(_run_pipeline, pipeline, img).result(timeout=60)
+    assert np.all(output == 3 + 1)
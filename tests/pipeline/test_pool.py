@@ -0,0 +1,204 @@
+import threading
+
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.exceptions import OperatorFailedError
+from ezcv.operator import Operator, IntegerParameter, settings
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.hooks import PipelineHook
+from ezcv.pipeline.pool import OperatorPool
+from ezcv.test_utils import assert_terms_in_exception, build_img
+from ezcv.typing import Image
+
+
+class LifecycleOperator(Operator):
+    param = IntegerParameter(default_value=1, lower=0, upper=10)
+
+    def __init__(self):
+        super().__init__()
+        self.setup_calls = 0
+        self.teardown_calls = 0
+        self.resource = None
+
+    def setup(self):
+        self.setup_calls += 1
+        self.resource = object()
+
+    def teardown(self):
+        self.teardown_calls += 1
+        self.resource = None
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        assert self.resource is not None
+        ctx.add_info('instance', self)
+        ctx.add_info('param', self.param)
+        return img
+
+
+@settings.THREAD_SAFE(False)
+class NotThreadSafeOperator(LifecycleOperator):
+    pass
+
+
+class FailingSetupOperator(LifecycleOperator):
+    def setup(self):
+        raise RuntimeError('no resource')
+
+
+@settings.THREAD_SAFE(False)
+class NotThreadSafeFailingSetupOperator(FailingSetupOperator):
+    pass
+
+
+def run_in_thread(func):
+    result = list()
+    thread = threading.Thread(target=lambda: result.append(func()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class TestOperatorPool:
+    def test_thread_safe_shared(self):
+        pool = OperatorPool()
+        operator = LifecycleOperator()
+        assert pool.get(operator) is operator
+        assert run_in_thread(lambda: pool.get(operator)) is operator
+        assert operator.setup_calls == 1
+
+    def test_not_thread_safe_cloned_per_thread(self):
+        pool = OperatorPool()
+        operator = NotThreadSafeOperator()
+        instance = pool.get(operator)
+        assert instance is not operator
+        assert pool.get(operator) is instance
+        other_instance = run_in_thread(lambda: pool.get(operator))
+        assert other_instance is not instance
+        assert instance.setup_calls == 1 and other_instance.setup_calls == 1
+        assert operator.setup_calls == 0
+
+    def test_clones_follow_parameters(self):
+        pool = OperatorPool()
+        operator = NotThreadSafeOperator()
+        pool.get(operator)
+        operator.param = 5
+        assert pool.get(operator).param == 5
+
+    def test_teardown(self):
+        pool = OperatorPool()
+        shared, not_shared = LifecycleOperator(), NotThreadSafeOperator()
+        pool.get(shared)
+        clone = pool.get(not_shared)
+        pool.teardown()
+        assert shared.teardown_calls == 1
+        assert clone.teardown_calls == 1
+        pool.get(shared)
+        assert shared.setup_calls == 2
+
+    def test_discard(self):
+        pool = OperatorPool()
+        operator, other = NotThreadSafeOperator(), NotThreadSafeOperator()
+        clone = pool.get(operator)
+        other_clone = pool.get(other)
+        pool.discard(operator)
+        assert clone.teardown_calls == 1
+        assert other_clone.teardown_calls == 0
+        assert pool.get(operator) is not clone
+
+
+    def test_clones_of_exited_threads_are_torn_down(self):
+        pool = OperatorPool()
+        operator = NotThreadSafeOperator()
+        dead_clone = run_in_thread(lambda: pool.get(operator))
+        assert dead_clone.teardown_calls == 0
+        clone = run_in_thread(lambda: pool.get(operator))
+        assert dead_clone.teardown_calls == 1
+        assert clone is not dead_clone
+        pool.teardown()
+        assert clone.teardown_calls == 1
+
+    def test_new_threads_never_reuse_clones(self):
+        pool = OperatorPool()
+        operator = NotThreadSafeOperator()
+        # Thread idents are often reused by the OS once a thread exits
+        clones = [run_in_thread(lambda: pool.get(operator)) for _ in range(20)]
+        assert len(set(map(id, clones))) == len(clones)
+        assert all(clone.setup_calls == 1 for clone in clones)
+        assert sum(clone.teardown_calls for clone in clones) == len(clones) - 1
+
+    def test_clone_after_teardown(self):
+        pool = OperatorPool()
+        operator = NotThreadSafeOperator()
+        clone = pool.get(operator)
+        pool.teardown()
+        new_clone = pool.get(operator)
+        assert new_clone is not clone
+        assert new_clone.resource is not None
+
+    @pytest.mark.parametrize('operator_cls', [FailingSetupOperator, NotThreadSafeFailingSetupOperator])
+    def test_setup_errors(self, operator_cls):
+        pool = OperatorPool()
+        with pytest.raises(OperatorFailedError) as e:
+            pool.get(operator_cls(), 'broken')
+        assert_terms_in_exception(e, ['broken', 'set up', 'no resource'])
+
+    def test_setup_errors_in_pipeline(self):
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('broken', FailingSetupOperator())
+        with pytest.raises(OperatorFailedError):
+            pipeline.run(build_img((4, 4)))
+
+
+class TestPipelineLifecycle:
+    def test_setup_before_run(self):
+        operator = LifecycleOperator()
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', operator)
+        pipeline.run(build_img((16, 16)))
+        pipeline.run(build_img((16, 16)))
+        assert operator.setup_calls == 1
+
+    def test_teardown(self):
+        operator = LifecycleOperator()
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', operator)
+        pipeline.run(build_img((16, 16)))
+        pipeline.teardown()
+        assert operator.teardown_calls == 1
+
+    def test_remove_operator_tears_down(self):
+        operator = LifecycleOperator()
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', operator)
+        pipeline.run(build_img((16, 16)))
+        pipeline.remove_operator('op')
+        assert operator.teardown_calls == 1
+
+    def test_hooks_get_original_operator(self):
+        original = NotThreadSafeOperator()
+        seen = list()
+
+        class Hook(PipelineHook):
+            def before_operator(self, operator: Operator, img: Image, ctx: PipelineContext):
+                seen.append(operator)
+
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', original)
+        _, ctx = pipeline.run(build_img((16, 16)), hooks=[Hook()])
+        assert seen == [original]
+        assert ctx.info['op']['instance'] is not original
+
+    @pytest.mark.parametrize('operator_cls', [LifecycleOperator, NotThreadSafeOperator])
+    def test_concurrent_runs(self, operator_cls):
+        pipeline = CompVizPipeline()
+        pipeline.add_operator('op', operator_cls())
+        imgs = [build_img((16, 16)) for _ in range(20)]
+        results = list(pipeline.run_stream(imgs, workers=4))
+        assert len(results) == len(imgs)
+        assert all((out == img).all() for (out, _), img in zip(results, imgs))
+        instances = {id(ctx.info['op']['instance']) for _, ctx in results}
+        if operator_cls is NotThreadSafeOperator:
+            assert 1 <= len(instances) <= 4
+        else:
+            assert len(instances) == 1
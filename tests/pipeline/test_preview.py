@@ -0,0 +1,200 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.operator import Operator, IntegerParameter, DoubleParameter
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.preview import PreviewRunner, downsample, run_preview, scale_pipeline
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+class BoxBlurOperator(Operator):
+    radius = IntegerParameter(default_value=4, lower=0, upper=32, spatial=True)
+    gain = DoubleParameter(default_value=1.0, lower=0, upper=4)
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        ctx.add_info('radius', self.radius)
+        out = img.astype(np.float32)
+        for axis in (0, 1):
+            out = sum(np.roll(out, shift, axis=axis) for shift in range(-self.radius, self.radius + 1))
+            out /= 2 * self.radius + 1
+        return np.clip(out * self.gain, 0, 255).astype(np.uint8)
+
+
+class GateOperator(Operator):
+    """ Blocks full-resolution runs until its gate is opened """
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        if img.shape[0] > 16:
+            assert self.gate.wait(timeout=10)
+        return img
+
+
+class SetupCountingOperator(Operator):
+    setups = 0
+
+    def setup(self):
+        type(self).setups += 1
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return img
+
+
+def _blur_pipeline() -> CompVizPipeline:
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('blur', BoxBlurOperator())
+    return pipeline
+
+
+@pytest.mark.parametrize('shape', [(64, 48), (64, 48, 3), (63, 50)])
+def test_downsample(shape):
+    img = np.random.randint(0, 256, size=shape, dtype=np.uint8)
+    small = downsample(img, 4)
+    assert small.shape == (shape[0] // 4, shape[1] // 4) + shape[2:]
+    assert small.dtype == np.uint8
+    assert small[0, 0].tolist() == np.rint(img[:4, :4].mean(axis=(0, 1))).astype(np.uint8).tolist()
+
+
+def test_downsample_small_images():
+    img = build_img((2, 16))
+    assert downsample(img, 4).shape == (1, 4)
+    assert downsample(img, 1) is img
+
+
+@pytest.mark.parametrize('factor', [0, 1.5])
+def test_downsample_invalid_factor(factor):
+    with pytest.raises(ValueError):
+        downsample(build_img((8, 8)), factor)
+
+
+def test_scale_pipeline():
+    pipeline = _blur_pipeline()
+    pipeline.operators['blur'].radius = 8
+    pipeline.operators['blur'].gain = 2.0
+    scaled = scale_pipeline(pipeline, 0.25)
+    assert scaled.operators['blur'].radius == 2
+    assert scaled.operators['blur'].gain == 2.0
+    assert pipeline.operators['blur'].radius == 8
+
+
+def test_preview_looks_like_full_result():
+    img = np.zeros((128, 128), dtype=np.uint8)
+    img[32:96, 32:96] = 255
+    pipeline = _blur_pipeline()
+    full, _ = pipeline.run(img)
+    preview, ctx = run_preview(pipeline, img, factor=4)
+    assert preview.shape == (32, 32)
+    assert ctx.info['blur']['radius'] == 1
+    error = np.abs(preview.astype(int) - downsample(full, 4).astype(int))
+    assert error.mean() < 4
+
+
+def test_preview_runner():
+    results = list()
+    pipeline = _blur_pipeline()
+    img = build_img((64, 64))
+    with PreviewRunner(pipeline, factor=4, on_full=lambda out, ctx: results.append(out)) as runner:
+        preview, _ = runner.run(img)
+        assert preview.shape == (16, 16)
+        full, ctx = runner.wait(timeout=10)
+    assert full.shape == (64, 64)
+    assert ctx.info['blur']['radius'] == 4
+    assert len(results) == 1 and results[0] is full
+
+
+def test_preview_runner_follows_parameters():
+    pipeline = _blur_pipeline()
+    with PreviewRunner(pipeline, factor=2) as runner:
+        _, ctx = runner.run(build_img((32, 32)))
+        assert ctx.info['blur']['radius'] == 2
+        pipeline.operators['blur'].radius = 12
+        _, ctx = runner.run(build_img((32, 32)))
+        assert ctx.info['blur']['radius'] == 6
+        pipeline.add_operator('other', BoxBlurOperator())
+        _, ctx = runner.run(build_img((32, 32)))
+        assert ctx.info['other']['radius'] == 2
+
+
+def test_only_latest_full_result_is_delivered():
+    results = list()
+    gate = GateOperator()
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('gate', gate)
+    with PreviewRunner(pipeline, factor=4, on_full=lambda out, ctx: results.append(int(out[0, 0]))) as runner:
+        for i in range(3):
+            img = build_img((64, 64), kind='black')
+            img[0, 0] = i
+            runner.run(img)
+        gate.gate.set()
+        full, _ = runner.wait(timeout=10)
+    assert full[0, 0] == 2
+    assert results == [2]
+
+
+class SlowFullResolutionOperator(Operator):
+    """ Runs for a while on full-resolution images, checking for cancellation """
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+        self.cancelled = 0
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        if img.shape[0] > 16 and img[0, 0] == 0:
+            self.started.set()
+            try:
+                for _ in range(1000):
+                    ctx.raise_if_cancelled()
+                    time.sleep(0.01)
+            except Exception:
+                self.cancelled += 1
+                raise
+        return img
+
+
+def test_newer_runs_cancel_full_resolution_run():
+    operator = SlowFullResolutionOperator()
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('slow', operator)
+    with PreviewRunner(pipeline, factor=4) as runner:
+        runner.run(build_img((64, 64), kind='black'))
+        assert operator.started.wait(timeout=10)
+        runner.run(build_img((64, 64), kind='white'))
+        full, _ = runner.wait(timeout=5)
+    assert operator.cancelled == 1
+    assert full[0, 0] == 255
+
+
+def test_preview_operators_are_set_up_once():
+    SetupCountingOperator.setups = 0
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('op', SetupCountingOperator())
+    with PreviewRunner(pipeline, factor=2) as runner:
+        for _ in range(3):
+            runner.run(build_img((8, 8)))
+        runner.wait(timeout=10)
+    # Once for the preview copy, and once for the full-resolution pipeline
+    assert SetupCountingOperator.setups == 2
+
+
+def test_wait_before_running():
+    with PreviewRunner(CompVizPipeline()) as runner:
+        assert runner.wait(timeout=0.01) is None
+
+
+def test_run_after_close():
+    runner = PreviewRunner(CompVizPipeline())
+    runner.close()
+    with pytest.raises(RuntimeError):
+        runner.run(build_img((8, 8)))
+
+
+def test_invalid_factor():
+    with pytest.raises(ValueError):
+        PreviewRunner(CompVizPipeline(), factor=0)
@@ -0,0 +1,170 @@
+import pstats
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.exceptions import OperatorFailedError
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.profiling import ProfileHook, _collapse
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+def slow_function():
+    return sum(i * i for i in range(20000))
+
+
+def other_function():
+    return sum(i * i for i in range(20000))
+
+
+class SlowOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        slow_function()
+        return img
+
+
+class OtherOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        other_function()
+        return img
+
+
+class FailingOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        slow_function()
+        raise RuntimeError('Failed')
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('slow', SlowOperator())
+    pipeline.add_operator('other', OtherOperator())
+    return pipeline
+
+
+def _function_names(stats: pstats.Stats):
+    return {name for _, _, name in stats.stats}
+
+
+def test_select_by_name(pipeline):
+    hook = ProfileHook(['slow'], operator_names=pipeline.operators)
+    for _ in range(3):
+        pipeline.run(build_img((8, 8)), hooks=[hook])
+    names = _function_names(hook.stats())
+    assert 'slow_function' in names
+    assert 'other_function' not in names
+    assert hook.calls == {'slow': 3}
+
+
+def test_select_by_class(pipeline):
+    hook = ProfileHook([OtherOperator])
+    pipeline.run(build_img((8, 8)), hooks=[hook])
+    names = _function_names(hook.stats())
+    assert 'other_function' in names
+    assert 'slow_function' not in names
+    assert hook.calls == {'OtherOperator': 1}
+
+
+def test_aggregates_runs(pipeline):
+    hook = ProfileHook([SlowOperator])
+    for _ in range(4):
+        pipeline.run(build_img((8, 8)), hooks=[hook])
+    calls = [stat[1] for func, stat in hook.stats().stats.items() if func[2] == 'slow_function']
+    assert calls == [4]
+
+
+def test_aggregates_threads(pipeline):
+    hook = ProfileHook([SlowOperator])
+    list(pipeline.run_stream((build_img((8, 8)) for _ in range(8)), hooks=[hook], workers=4))
+    calls = [stat[1] for func, stat in hook.stats().stats.items() if func[2] == 'slow_function']
+    assert calls == [8]
+    assert hook.calls == {'SlowOperator': 8}
+
+
+def test_batch(pipeline):
+    hook = ProfileHook([SlowOperator])
+    pipeline.run_batch(np.stack([build_img((8, 8)) for _ in range(3)]), hooks=[hook])
+    calls = [stat[1] for func, stat in hook.stats().stats.items() if func[2] == 'slow_function']
+    assert calls == [3]
+    assert hook.calls == {'SlowOperator': 1}
+
+
+def test_failing_operator_stops_profiling():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('failing', FailingOperator())
+    hook = ProfileHook([FailingOperator])
+    with pytest.raises(OperatorFailedError):
+        pipeline.run(build_img((8, 8)), hooks=[hook])
+
+    other = CompVizPipeline()
+    other.add_operator('other', OtherOperator())
+    other.run(build_img((8, 8)), hooks=[hook])
+    names = _function_names(hook.stats())
+    assert 'slow_function' in names
+    assert 'other_function' not in names
+    assert hook.calls == {}
+
+
+def test_empty_stats():
+    assert ProfileHook([SlowOperator]).stats().stats == {}
+
+
+def test_dump_stats(pipeline, tmp_path):
+    hook = ProfileHook([SlowOperator])
+    pipeline.run(build_img((8, 8)), hooks=[hook])
+    path = str(tmp_path / 'profile.pstats')
+    hook.dump_stats(path)
+    assert 'slow_function' in _function_names(pstats.Stats(path))
+
+
+def test_collapsed_stacks(pipeline, tmp_path):
+    hook = ProfileHook([SlowOperator])
+    pipeline.run(build_img((8, 8)), hooks=[hook])
+    lines = hook.collapsed_stacks()
+    assert len(lines) > 0
+    for line in lines:
+        stack, count = line.rsplit(' ', 1)
+        assert int(count) > 0
+    assert any('slow_function' in line.split(';')[-1] for line in lines)
+    assert all('other_function' not in line for line in lines)
+    slow_stacks = [line.rsplit(' ', 1)[0].split(';') for line in lines if 'slow_function' in line]
+    assert any(any(frame.startswith('run ') for frame in stack) for stack in slow_stacks)
+
+    path = str(tmp_path / 'profile.folded')
+    hook.write_collapsed(path)
+    with open(path) as f:
+        assert f.read().splitlines() == lines
+
+
+def test_collapse_shared_callees():
+    # Each function calls the two next ones: the number of call paths grows exponentially with the depth
+    funcs = [('module.py', i, f'f{i}') for i in range(200)]
+    stats = dict()
+    for i, func in enumerate(funcs):
+        callers = {funcs[j]: (1, 1, 0.0, 1.0) for j in (i - 1, i - 2) if j >= 0}
+        stats[func] = (1, 1, 1e-3, 2.0 if callers else 1.0, callers)
+    lines = _collapse(stats)
+    assert lines[0] == 'f0 (module.py:0) 1000'
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+
+
+def test_reset(pipeline):
+    hook = ProfileHook([SlowOperator])
+    pipeline.run(build_img((8, 8)), hooks=[hook])
+    hook.reset()
+    assert hook.stats().stats == {}
+    assert hook.calls == {}
+
+
+def test_unknown_name(pipeline):
+    with pytest.raises(ValueError):
+        ProfileHook(['unknown'], operator_names=pipeline.operators)
+
+
+def test_invalid_selection():
+    with pytest.raises(ValueError):
+        ProfileHook([42])
@@ -0,0 +1,220 @@
+import threading
+import time
+
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.exceptions import DeadlineExceededError
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.realtime import RealTimeRunner, DeadlineHook, LatestWinsRunner
+from ezcv.test_utils import build_img, assert_terms_in_exception
+from ezcv.typing import Image
+
+
+class SleepOperator(Operator):
+    def __init__(self, duration: float, gate: threading.Event = None):
+        super().__init__()
+        self.duration = duration
+        self.gate = gate
+        self.calls = 0
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait()
+        time.sleep(self.duration)
+        return img
+
+
+def build_pipeline(*operators: Operator) -> CompVizPipeline:
+    pipeline = CompVizPipeline()
+    for i, operator in enumerate(operators):
+        pipeline.add_operator(f'op{i}', operator)
+    return pipeline
+
+
+def test_processes_frames():
+    results = list()
+    pipeline = build_pipeline(SleepOperator(0))
+    with RealTimeRunner(pipeline, deadline=1, on_result=lambda img, ctx: results.append(img)) as runner:
+        for _ in range(3):
+            runner.submit(build_img((16, 16)))
+            assert runner.wait_idle(timeout=5)
+    assert len(results) == 3
+    assert runner.stats.processed == 3
+    assert runner.stats.dropped == 0
+
+
+def test_latest_wins():
+    gate = threading.Event()
+    results = list()
+    pipeline = build_pipeline(SleepOperator(0, gate))
+    frames = [build_img((16, 16)) for _ in range(4)]
+    with RealTimeRunner(pipeline, deadline=5, on_result=lambda img, ctx: results.append(img)) as runner:
+        runner.submit(frames[0])
+        time.sleep(0.05)  # let the first frame block inside the pipeline
+        for frame in frames[1:]:
+            runner.submit(frame)
+        gate.set()
+        assert runner.wait_idle(timeout=5)
+    assert runner.stats.dropped == 2
+    assert runner.stats.processed == 2
+    assert results[0] is frames[0] and results[1] is frames[-1]
+
+
+def test_stale_frames_dropped():
+    gate = threading.Event()
+    operator = SleepOperator(0, gate)
+    pipeline = build_pipeline(operator)
+    with RealTimeRunner(pipeline, deadline=0.05) as runner:
+        runner.submit(build_img((16, 16)))
+        time.sleep(0.02)
+        runner.submit(build_img((16, 16)))
+        time.sleep(0.1)
+        gate.set()
+        assert runner.wait_idle(timeout=5)
+    assert operator.calls == 1
+    assert runner.stats.dropped == 1
+    assert runner.stats.deadline_misses == 1
+
+
+def test_abort_late():
+    slow, never = SleepOperator(0.1), SleepOperator(0)
+    pipeline = build_pipeline(slow, never)
+    with RealTimeRunner(pipeline, deadline=0.05, abort_late=True) as runner:
+        runner.submit(build_img((16, 16)))
+        assert runner.wait_idle(timeout=5)
+    assert never.calls == 0
+    assert runner.stats.aborted == 1
+    assert runner.stats.deadline_misses == 1
+
+
+def test_failures_counted():
+    class FailingOperator(Operator):
+        def run(self, img: Image, ctx: PipelineContext) -> Image:
+            raise ValueError('Failed')
+
+    with RealTimeRunner(build_pipeline(FailingOperator()), deadline=1) as runner:
+        runner.submit(build_img((16, 16)))
+        assert runner.wait_idle(timeout=5)
+    assert runner.stats.failed == 1
+    assert runner.last_error is not None
+
+
+def _raise_on_first_result():
+    """ Returns a callback that raises the first time it's called, and the results it got after that """
+    results = list()
+
+    def on_result(img: Image, ctx: PipelineContext):
+        results.append(img)
+        if len(results) == 1:
+            raise ValueError('Callback failed')
+
+    return on_result, results
+
+
+def test_failing_callback():
+    on_result, results = _raise_on_first_result()
+    with RealTimeRunner(build_pipeline(SleepOperator(0)), deadline=1, on_result=on_result) as runner:
+        for _ in range(3):
+            runner.submit(build_img((16, 16)))
+            assert runner.wait_idle(timeout=5)
+    assert len(results) == 3
+    assert runner.stats.processed == 3
+    assert isinstance(runner.last_error, ValueError)
+
+
+def test_submit_not_running():
+    runner = RealTimeRunner(CompVizPipeline(), deadline=1)
+    with pytest.raises(RuntimeError):
+        runner.submit(build_img((16, 16)))
+
+
+@pytest.mark.parametrize('deadline', [0, -1, 'foo'])
+def test_invalid_deadline(deadline):
+    with pytest.raises(ValueError) as e:
+        RealTimeRunner(CompVizPipeline(), deadline=deadline)
+    assert_terms_in_exception(e, ['invalid', 'deadline'])
+
+
+def test_deadline_hook():
+    pipeline = build_pipeline(SleepOperator(0))
+    with pytest.raises(DeadlineExceededError):
+        pipeline.run(build_img((16, 16)), hooks=[DeadlineHook(time.monotonic() - 1)])
+    pipeline.run(build_img((16, 16)), hooks=[DeadlineHook(time.monotonic() + 10)])
+
+
+class SlowCooperativeOperator(Operator):
+    """ Runs for a while, checking for cancellation, unless the image is black """
+    def __init__(self):
+        super().__init__()
+        self.started = threading.Event()
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        self.started.set()
+        if img.any():
+            for _ in range(1000):
+                ctx.raise_if_cancelled()
+                time.sleep(0.01)
+        return img
+
+
+def test_latest_wins_processes_requests():
+    results = list()
+    with LatestWinsRunner(build_pipeline(SleepOperator(0)), on_result=lambda img, ctx: results.append(img)) as runner:
+        runner.submit(build_img((16, 16)))
+        assert runner.wait_idle(timeout=5)
+    assert len(results) == 1
+    assert runner.stats.processed == 1
+
+
+def test_latest_wins_failing_callback():
+    on_result, results = _raise_on_first_result()
+    with LatestWinsRunner(build_pipeline(SleepOperator(0)), on_result=on_result) as runner:
+        for _ in range(3):
+            runner.submit(build_img((16, 16)))
+            assert runner.wait_idle(timeout=5)
+    assert len(results) == 3
+    assert runner.stats.processed == 3
+    assert isinstance(runner.last_error, ValueError)
+
+
+def test_latest_wins_cancels_running_request():
+    results = list()
+    operator = SlowCooperativeOperator()
+    runner = LatestWinsRunner(build_pipeline(operator), on_result=lambda img, ctx: results.append(img))
+    with runner:
+        runner.submit(build_img((16, 16), kind='white'))
+        assert operator.started.wait(timeout=5)
+        start = time.monotonic()
+        runner.submit(build_img((16, 16), kind='black'))
+        assert runner.wait_idle(timeout=5)
+        assert time.monotonic() - start < 1
+    assert runner.stats.cancelled == 1
+    assert runner.stats.processed == 1
+    assert len(results) == 1 and not results[0].any()
+
+
+def test_latest_wins_drops_waiting_requests():
+    gate = threading.Event()
+    operator = SleepOperator(0, gate=gate)
+    results = list()
+    with LatestWinsRunner(build_pipeline(operator), on_result=lambda img, ctx: results.append(img[0, 0])) as runner:
+        for i in range(4):
+            img = build_img((16, 16), kind='black')
+            img[0, 0] = i
+            runner.submit(img)
+            while operator.calls == 0:
+                time.sleep(0.001)
+        gate.set()
+        assert runner.wait_idle(timeout=5)
+    # The first request was running when the others came, and was cancelled after its only operator
+    assert results == [3]
+    assert runner.stats.dropped == 2
+    assert runner.stats.cancelled == 1
+
+
+def test_latest_wins_submit_not_running():
+    with pytest.raises(RuntimeError):
+        LatestWinsRunner(CompVizPipeline()).submit(build_img((16, 16)))
@@ -0,0 +1,246 @@
+import queue
+import random
+import threading
+import time
+
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.exceptions import OperatorFailedError
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.scheduler import StreamScheduler
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+class SleepingOperator(Operator):
+    def __init__(self, duration: float = 0.002, jitter: float = 0.0):
+        super().__init__()
+        self.duration = duration
+        self.jitter = jitter
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        time.sleep(self.duration + random.random() * self.jitter)
+        return img
+
+
+class GateOperator(Operator):
+    """ Blocks until its gate is opened """
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        assert self.gate.wait(timeout=10)
+        return img
+
+
+class FailingOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        raise RuntimeError('failed')
+
+
+def _pipeline(operator: Operator) -> CompVizPipeline:
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('op', operator)
+    return pipeline
+
+
+def _frame(index: int) -> Image:
+    img = build_img((4, 4), kind='black')
+    img[0, 0] = index
+    return img
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = StreamScheduler(workers=1)
+    yield scheduler
+    scheduler.close()
+
+
+def _blocked_stream(scheduler: StreamScheduler, name: str = 'blocker') -> GateOperator:
+    """ Adds a stream whose first frame keeps the scheduler's only worker busy until the gate is opened """
+    gate = GateOperator()
+    scheduler.add_stream(name, _pipeline(gate))
+    scheduler.submit(name, _frame(0))
+    while scheduler.stats(name).in_flight == 0:
+        time.sleep(0.001)
+    return gate
+
+
+def test_run_frames(scheduler):
+    scheduler.add_stream('a', _pipeline(SleepingOperator()))
+    futures = [scheduler.submit('a', _frame(i)) for i in range(5)]
+    for i, future in enumerate(futures):
+        output, ctx = future.result(timeout=10)
+        assert output[0, 0] == i
+        assert isinstance(ctx, PipelineContext)
+
+
+def test_weighted_fair_sharing(scheduler):
+    order = list()
+    gate = _blocked_stream(scheduler)
+    scheduler.add_stream('light', _pipeline(SleepingOperator()), weight=1, max_queue=100,
+                         on_result=lambda img, ctx: order.append('light'))
+    scheduler.add_stream('heavy', _pipeline(SleepingOperator()), weight=3, max_queue=100,
+                         on_result=lambda img, ctx: order.append('heavy'))
+    for i in range(40):
+        scheduler.submit('light', _frame(i))
+        scheduler.submit('heavy', _frame(i))
+    gate.gate.set()
+    assert scheduler.wait_idle(timeout=10)
+    first = order[:40]
+    assert 24 <= first.count('heavy') <= 36
+
+
+def test_idle_streams_dont_bank_time(scheduler):
+    order = list()
+    scheduler.add_stream('busy', _pipeline(SleepingOperator()), max_queue=100,
+                         on_result=lambda img, ctx: order.append('busy'))
+    scheduler.add_stream('late', _pipeline(SleepingOperator()), max_queue=100,
+                         on_result=lambda img, ctx: order.append('late'))
+    for i in range(10):
+        scheduler.submit('busy', _frame(i))
+    assert scheduler.wait_idle(timeout=10)
+    order.clear()
+    gate = _blocked_stream(scheduler)
+    for i in range(10):
+        scheduler.submit('late', _frame(i))
+        scheduler.submit('busy', _frame(i))
+    gate.gate.set()
+    assert scheduler.wait_idle(timeout=10)
+    assert order[:10].count('late') <= 7
+
+
+def test_priorities(scheduler):
+    order = list()
+    gate = _blocked_stream(scheduler)
+    scheduler.add_stream('low', _pipeline(SleepingOperator()), on_result=lambda img, ctx: order.append('low'))
+    scheduler.add_stream('high', _pipeline(SleepingOperator()), priority=1,
+                         on_result=lambda img, ctx: order.append('high'))
+    for i in range(3):
+        scheduler.submit('low', _frame(i))
+    for i in range(3):
+        scheduler.submit('high', _frame(i))
+    gate.gate.set()
+    assert scheduler.wait_idle(timeout=10)
+    assert order == ['high'] * 3 + ['low'] * 3
+
+
+def test_results_delivered_in_order():
+    indexes = list()
+    with StreamScheduler(workers=4) as scheduler:
+        scheduler.add_stream('a', _pipeline(SleepingOperator(duration=0.001, jitter=0.005)), max_queue=100,
+                             max_in_flight=4, on_result=lambda img, ctx: indexes.append(int(img[0, 0])))
+        for i in range(30):
+            scheduler.submit('a', _frame(i))
+        assert scheduler.wait_idle(timeout=10)
+    assert indexes == list(range(30))
+
+
+def test_failed_frames_are_skipped(scheduler):
+    indexes = list()
+    scheduler.add_stream('a', _pipeline(FailingOperator()), on_result=lambda img, ctx: indexes.append(1))
+    future = scheduler.submit('a', _frame(0))
+    with pytest.raises(OperatorFailedError):
+        future.result(timeout=10)
+    assert scheduler.wait_idle(timeout=10)
+    assert indexes == []
+    assert scheduler.stats('a').failed == 1
+
+
+def test_queue_limit(scheduler):
+    gate = _blocked_stream(scheduler)
+    scheduler.add_stream('a', _pipeline(SleepingOperator()), max_queue=2)
+    scheduler.submit('a', _frame(0))
+    scheduler.submit('a', _frame(1))
+    with pytest.raises(queue.Full):
+        scheduler.submit('a', _frame(2), block=False)
+    with pytest.raises(queue.Full):
+        scheduler.submit('a', _frame(2), timeout=0.01)
+    gate.gate.set()
+    scheduler.submit('a', _frame(2), timeout=10).result(timeout=10)
+
+
+def test_cancel_waiting_frame(scheduler):
+    gate = _blocked_stream(scheduler)
+    scheduler.add_stream('a', _pipeline(SleepingOperator()))
+    future = scheduler.submit('a', _frame(0))
+    assert future.cancel()
+    gate.gate.set()
+    assert scheduler.wait_idle(timeout=10)
+    assert scheduler.stats('a').cancelled == 1
+    assert scheduler.stats('a').processed == 0
+
+
+def test_remove_stream(scheduler):
+    gate = _blocked_stream(scheduler)
+    scheduler.add_stream('a', _pipeline(SleepingOperator()))
+    future = scheduler.submit('a', _frame(0))
+    scheduler.remove_stream('a')
+    assert future.cancelled()
+    assert scheduler.streams == ['blocker']
+    with pytest.raises(ValueError):
+        scheduler.submit('a', _frame(0))
+    gate.gate.set()
+
+
+def test_stats(scheduler):
+    scheduler.add_stream('a', _pipeline(SleepingOperator()))
+    assert scheduler.stats('a').latency_mean is None
+    for i in range(4):
+        scheduler.submit('a', _frame(i))
+    assert scheduler.wait_idle(timeout=10)
+    stats = scheduler.stats('a')
+    assert stats.submitted == 4
+    assert stats.processed == 4
+    assert stats.queue_depth == 0
+    assert stats.in_flight == 0
+    assert stats.throughput > 0
+    assert stats.latency_mean >= 0.002
+    assert stats.latency_p95 >= stats.latency_mean * 0.5
+
+
+def test_close_runs_submitted_frames():
+    scheduler = StreamScheduler(workers=2)
+    scheduler.add_stream('a', _pipeline(SleepingOperator()))
+    futures = [scheduler.submit('a', _frame(i)) for i in range(5)]
+    scheduler.close()
+    assert all(future.done() and not future.cancelled() for future in futures)
+    with pytest.raises(RuntimeError):
+        scheduler.submit('a', _frame(0))
+
+
+def test_callback_errors(scheduler):
+    def on_result(img, ctx):
+        raise RuntimeError('callback failed')
+
+    scheduler.add_stream('a', _pipeline(SleepingOperator()), on_result=on_result)
+    scheduler.submit('a', _frame(0)).result(timeout=10)
+    scheduler.submit('a', _frame(1)).result(timeout=10)
+    assert scheduler.wait_idle(timeout=10)
+    assert isinstance(scheduler.last_error, RuntimeError)
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'weight': 0},
+    {'priority': 1.5},
+    {'max_queue': 0},
+    {'max_in_flight': 0},
+])
+def test_invalid_stream_arguments(scheduler, kwargs):
+    with pytest.raises(ValueError):
+        scheduler.add_stream('a', CompVizPipeline(), **kwargs)
+
+
+def test_duplicated_stream(scheduler):
+    scheduler.add_stream('a', CompVizPipeline())
+    with pytest.raises(ValueError):
+        scheduler.add_stream('a', CompVizPipeline())
+
+
+def test_invalid_workers():
+    with pytest.raises(ValueError):
+        StreamScheduler(workers=0)
@@ -0,0 +1,126 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.pipeline.tracing import TraceHook
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+class IdentityOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return img
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('first', IdentityOperator())
+    pipeline.add_operator('second', IdentityOperator())
+    return pipeline
+
+
+def test_records_pipeline_and_operators(pipeline):
+    hook = TraceHook(operator_names=pipeline.operators)
+    pipeline.run(build_img((8, 16)), hooks=[hook])
+    events = hook.events
+    assert [event['name'] for event in events] == ['first', 'second', 'pipeline']
+    assert [event['cat'] for event in events] == ['operator', 'operator', 'pipeline']
+    for event in events:
+        assert event['ph'] == 'X'
+        assert event['pid'] == os.getpid()
+        assert event['tid'] == threading.get_ident()
+        assert event['dur'] >= 0
+        assert event['args'] == {'frame': 0, 'shape': [8, 16]}
+    assert events[0]['ts'] <= events[1]['ts']
+    assert events[2]['ts'] <= events[0]['ts']
+
+
+def test_defaults_to_class_names(pipeline):
+    hook = TraceHook()
+    pipeline.run(build_img((8, 8)), hooks=[hook])
+    assert [event['name'] for event in hook.events] == ['IdentityOperator', 'IdentityOperator', 'pipeline']
+
+
+def test_frame_indexes(pipeline):
+    hook = TraceHook()
+    for _ in range(3):
+        pipeline.run(build_img((8, 8)), hooks=[hook])
+    assert [event['args']['frame'] for event in hook.events if event['cat'] == 'pipeline'] == [0, 1, 2]
+
+
+def test_sampling(pipeline):
+    hook = TraceHook(sample_every=3)
+    for _ in range(7):
+        pipeline.run(build_img((8, 8)), hooks=[hook])
+    assert [event['args']['frame'] for event in hook.events if event['cat'] == 'pipeline'] == [0, 3, 6]
+    assert len(hook.events) == 9
+
+
+def test_bounded_buffer(pipeline):
+    hook = TraceHook(max_events=4)
+    for _ in range(3):
+        pipeline.run(build_img((8, 8)), hooks=[hook])
+    assert len(hook.events) == 4
+    assert hook.dropped == 5
+    assert hook.events[-1]['args']['frame'] == 2
+
+
+def test_batch(pipeline):
+    hook = TraceHook(operator_names=pipeline.operators)
+    pipeline.run_batch(np.stack([build_img((8, 8)) for _ in range(3)]), hooks=[hook])
+    pipeline_events = [event for event in hook.events if event['cat'] == 'pipeline']
+    assert sorted(event['args']['frame'] for event in pipeline_events) == [0, 1, 2]
+    assert len([event for event in hook.events if event['name'] == 'first']) == 3
+
+
+def test_concurrent_runs(pipeline):
+    hook = TraceHook()
+    list(pipeline.run_stream((build_img((8, 8)) for _ in range(20)), hooks=[hook], workers=4))
+    pipeline_events = [event for event in hook.events if event['cat'] == 'pipeline']
+    assert sorted(event['args']['frame'] for event in pipeline_events) == list(range(20))
+    assert len(hook.events) == 60
+
+
+def test_failed_runs_are_forgotten(pipeline):
+    hook = TraceHook()
+    hook.max_active_runs = 2
+    ctxs = [PipelineContext(build_img((8, 8))) for _ in range(5)]
+    for ctx in ctxs:
+        hook.before_pipeline(ctx)
+    assert len(hook._runs) == 2
+
+
+def test_save(pipeline, tmp_path):
+    hook = TraceHook()
+    pipeline.run(build_img((8, 8)), hooks=[hook])
+    path = str(tmp_path / 'trace.json')
+    hook.save(path)
+    with open(path) as f:
+        trace = json.load(f)
+    events = trace['traceEvents']
+    assert [event['ph'] for event in events] == ['M', 'M', 'X', 'X', 'X']
+    assert events[1]['args']['name'] == threading.current_thread().name
+
+
+def test_clear(pipeline):
+    hook = TraceHook()
+    pipeline.run(build_img((8, 8)), hooks=[hook])
+    hook.clear()
+    assert hook.events == []
+    assert hook.dropped == 0
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'max_events': 0},
+    {'sample_every': 0},
+])
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError):
+        TraceHook(**kwargs)
@@ -0,0 +1,140 @@
+import os
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.batch import CHECKPOINT_NAME, BatchProgress, Checkpoint, run_directory
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+class AddOneOperator(Operator):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        self.calls += 1
+        return img + 1
+
+
+class InterruptingOperator(Operator):
+    """ Interrupts the run when it sees the image whose first pixel is ``at`` """
+    def __init__(self, at: int):
+        super().__init__()
+        self.at = at
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        if img[0, 0] == self.at:
+            raise KeyboardInterrupt()
+        return img + 1
+
+
+class FailingOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        if img[0, 0] == 1:
+            raise RuntimeError('bad image')
+        return img + 1
+
+
+def _pipeline(operator: Operator) -> CompVizPipeline:
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('op', operator)
+    return pipeline
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    path = tmp_path / 'input'
+    path.mkdir()
+    for i in range(10):
+        img = build_img((4, 4), kind='black')
+        img[0, 0] = i
+        np.save(str(path / f'img_{i}.npy'), img)
+    return str(path)
+
+
+def _outputs(output: str):
+    return sorted(name for name in os.listdir(output) if name.endswith('.npy'))
+
+
+def test_run_directory(input_dir, tmp_path):
+    output = str(tmp_path / 'output')
+    reports = list()
+    progress = run_directory(_pipeline(AddOneOperator()), input_dir, output, workers=3, report=reports.append)
+    assert progress.processed == 10
+    assert progress.remaining == 0
+    assert reports[-1] is progress
+    assert _outputs(output) == [f'img_{i}.npy' for i in range(10)]
+    assert np.load(os.path.join(output, 'img_7.npy'))[0, 0] == 8
+
+
+def test_resumes_after_interruption(input_dir, tmp_path):
+    output = str(tmp_path / 'output')
+    with pytest.raises(KeyboardInterrupt):
+        run_directory(_pipeline(InterruptingOperator(at=6)), input_dir, output, workers=1)
+    done = _outputs(output)
+    assert 0 < len(done) < 10
+
+    operator = AddOneOperator()
+    progress = run_directory(_pipeline(operator), input_dir, output, workers=2)
+    assert progress.skipped == len(done)
+    assert operator.calls == 10 - len(done)
+    assert _outputs(output) == [f'img_{i}.npy' for i in range(10)]
+
+
+def test_restart(input_dir, tmp_path):
+    output = str(tmp_path / 'output')
+    run_directory(_pipeline(AddOneOperator()), input_dir, output)
+    operator = AddOneOperator()
+    assert run_directory(_pipeline(operator), input_dir, output).skipped == 10
+    assert operator.calls == 0
+    assert run_directory(_pipeline(operator), input_dir, output, restart=True).skipped == 0
+    assert operator.calls == 10
+
+
+def test_failed_images_are_retried(input_dir, tmp_path):
+    output = str(tmp_path / 'output')
+    progress = run_directory(_pipeline(FailingOperator()), input_dir, output)
+    assert progress.processed == 9
+    assert list(progress.failures) == ['img_1']
+    assert 'bad image' in progress.failures['img_1']
+    operator = AddOneOperator()
+    progress = run_directory(_pipeline(operator), input_dir, output)
+    assert progress.skipped == 9
+    assert operator.calls == 1
+
+
+def test_duplicated_names(input_dir):
+    np.save(os.path.join(input_dir, 'img_0.tmp.npy'), build_img((4, 4)))
+    os.rename(os.path.join(input_dir, 'img_0.tmp.npy'), os.path.join(input_dir, 'img_0.NPY'))
+    with pytest.raises(ValueError):
+        run_directory(CompVizPipeline(), input_dir, input_dir)
+
+
+def test_invalid_workers(input_dir, tmp_path):
+    with pytest.raises(ValueError):
+        run_directory(CompVizPipeline(), input_dir, str(tmp_path), workers=0)
+
+
+def test_checkpoint_ignores_lines_cut_short(tmp_path):
+    path = str(tmp_path / CHECKPOINT_NAME)
+    with open(path, 'w') as f:
+        f.write('a\nb\nc')
+    checkpoint = Checkpoint(path)
+    assert checkpoint.completed == {'a', 'b'}
+    checkpoint.add(['d'])
+    checkpoint.close()
+    assert Checkpoint(path).completed == {'a', 'b', 'd'}
+
+
+def test_progress():
+    progress = BatchProgress(total=10, skipped=2, started_at=0)
+    assert progress.eta is None
+    assert progress.format().startswith('2/10 images')
+    progress.processed = 4
+    assert progress.remaining == 4
+    assert progress.eta > 0
@@ -0,0 +1,58 @@
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from ezcv.cli import main
+
+
+CONFIG = """
+version: '0.0'
+pipeline: []
+"""
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    path = tmp_path / 'config.yml'
+    path.write_text(CONFIG)
+    return str(path)
+
+
+def test_no_command():
+    with pytest.raises(SystemExit):
+        main([])
+
+
+def test_serve(config_path, tmp_path):
+    socket_path = str(tmp_path / 'ezcv.sock')
+    with patch('ezcv.serving._UnixServer.serve_forever', side_effect=KeyboardInterrupt) as serve_forever:
+        assert main(['serve', config_path, '--unix-socket', socket_path, '-j', '1']) == 0
+    serve_forever.assert_called_once()
+
+
+def test_coordinate_empty_directory(config_path, tmp_path):
+    (tmp_path / 'input').mkdir()
+    assert main(['coordinate', config_path, '--input', str(tmp_path / 'input'), '--output', str(tmp_path / 'output'),
+                 '--port', '0']) == 0
+
+
+def test_worker_invalid_address():
+    assert main(['worker', 'localhost']) == 2
+
+
+def test_run(config_path, tmp_path):
+    (tmp_path / 'input').mkdir()
+    np.save(str(tmp_path / 'input' / 'a.npy'), np.zeros((4, 4), dtype=np.uint8))
+    output = tmp_path / 'output'
+    assert main(['run', config_path, '--input', str(tmp_path / 'input'), '--output', str(output), '-j', '2']) == 0
+    assert (output / 'a.npy').exists()
+
+
+def test_benchmark(capsys):
+    assert main(['benchmark', '--size', '16x16', '--repeats', '1']) == 0
+    assert 'gaussian_blur_5' in capsys.readouterr().out
+
+
+def test_benchmark_invalid_size():
+    assert main(['benchmark', '--size', '16']) == 2
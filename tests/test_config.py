@@ -6,7 +6,7 @@ from ezcv.config import create_operator, get_operator_config, create_pipeline, \
     Config, get_pipeline_config
 from ezcv.exceptions import ConfigParsingError
 from ezcv.operator.operator import Operator
-from ezcv.operator.parameter import IntegerParameter, DoubleParameter, ParameterSpec
+from ezcv.operator.parameter import IntegerParameter, DoubleParameter, EnumParameter, BooleanParameter, ParameterSpec
 from ezcv.pipeline import PipelineContext
 from ezcv.test_utils import assert_terms_in_exception
 from ezcv.typing import Image
@@ -216,3 +216,56 @@ def test_get_pipeline_config(pipeline_config):
     pipeline = create_pipeline(pipeline_config)
     actual_pipeline_config = get_pipeline_config(pipeline)
     assert actual_pipeline_config == pipeline_config
+
+
+class EnumOperatorForTesting(Operator):
+    mode = EnumParameter(['a', 'b'], default_value='a')
+    flag = BooleanParameter(default_value=False)
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        raise NotImplementedError()
+
+
+class TestParameterValidation:
+    @pytest.mark.parametrize('name, value, message', [
+        ('param1', 16, 'max value is 15'),
+        ('param1', -1, 'min value is 0'),
+        ('param1', 1.5, 'must be of integer type'),
+        ('param2', 15.5, 'max value is 15'),
+        ('param2', 'abc', 'must be of number type'),
+        ('param1', True, 'must be of integer type'),
+        ('param2', False, 'must be of number type'),
+        ('param2', float('nan'), 'must be a finite number'),
+        ('param2', float('inf'), 'must be a finite number'),
+    ])
+    def test_bounds(self, operator_config, name, value, message):
+        operator_config['params'][name] = value
+        with pytest.raises(ConfigParsingError) as e:
+            create_operator(operator_config)
+        assert e.value.args[1] == {'params': [{name: [message]}]}
+
+    @pytest.mark.parametrize('params, errors', [
+        ({'mode': 'c'}, {'mode': ['unallowed value c']}),
+        ({'flag': 1}, {'flag': ['must be of boolean type']}),
+    ])
+    def test_enum_and_boolean(self, params, errors):
+        config = {'implementation': __name__ + '.EnumOperatorForTesting', 'params': params}
+        with pytest.raises(ConfigParsingError) as e:
+            create_operator(config)
+        assert e.value.args[1] == {'params': [errors]}
+
+    def test_pipeline_errors_are_nested(self, pipeline_config):
+        # Both operators share the same config: give the second one its own
+        config = pipeline_config['pipeline'][1]['config']
+        pipeline_config['pipeline'][1]['config'] = dict(config, params=dict(config['params'], param1=100))
+        with pytest.raises(ConfigParsingError) as e:
+            create_pipeline(pipeline_config)
+        assert e.value.args[1] == {'pipeline': [{1: [{'config': [{'params': [{'param1': ['max value is 15']}]}]}]}]}
+
+    def test_skipped_without_validation(self, operator_config):
+        operator_config['params']['param1'] = 100
+        assert create_operator(operator_config, validate=False).param1 == 100
+
+    def test_not_a_dict(self):
+        with pytest.raises(ConfigParsingError):
+            create_pipeline(['not', 'a', 'dict'])
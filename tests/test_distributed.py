@@ -0,0 +1,221 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline, distributed
+from ezcv.distributed import Coordinator, Worker, receive_message, send_message
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+class AddOneOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        return img + 1
+
+
+class FailingOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        raise RuntimeError('failed')
+
+
+class FailOnceOperator(Operator):
+    """ Fails the first time it sees each image, recording it in a marker file """
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        marker = os.path.join(os.environ['EZCV_TEST_MARKERS'], str(int(img[0, 0])))
+        if not os.path.exists(marker):
+            open(marker, 'w').close()
+            raise RuntimeError('failed once')
+        return img
+
+
+def _pipeline(operator: Operator) -> CompVizPipeline:
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('op', operator)
+    return pipeline
+
+
+def _manifest(path, count: int):
+    os.makedirs(path, exist_ok=True)
+    paths = list()
+    for i in range(count):
+        img = build_img((4, 4), kind='black')
+        img[0, 0] = i
+        paths.append(str(path / f'{i:03d}.npy'))
+        np.save(paths[-1], img)
+    return paths
+
+
+def _assert_outputs(output, count: int, offset: int = 1):
+    assert sorted(os.listdir(output)) == [f'{i:08d}.npy' for i in range(count)]
+    for i in range(count):
+        assert np.load(os.path.join(output, f'{i:08d}.npy'))[0, 0] == i + offset
+
+
+def _start_worker(address, **kwargs) -> threading.Thread:
+    worker = threading.Thread(target=Worker(address, threads=2, **kwargs).run, daemon=True)
+    worker.start()
+    return worker
+
+
+class _FakeWorker(object):
+    """ Takes a shard and never completes it """
+    def __init__(self, address, heartbeat: bool):
+        self.sock = socket.create_connection(address)
+        send_message(self.sock, {'type': 'hello', 'name': 'fake'})
+        config = receive_message(self.sock)
+        send_message(self.sock, {'type': 'request'})
+        self.shard = receive_message(self.sock)
+        self._stop = threading.Event()
+        if heartbeat:
+            threading.Thread(target=self._heartbeat_loop, args=(config['heartbeat_interval'],), daemon=True).start()
+
+    def _heartbeat_loop(self, interval: float):
+        while not self._stop.wait(interval):
+            try:
+                send_message(self.sock, {'type': 'heartbeat'})
+            except OSError:
+                return
+
+    def close(self):
+        self._stop.set()
+        self.sock.close()
+
+
+def test_workers_share_shards(tmp_path):
+    paths = _manifest(tmp_path / 'input', 20)
+    output = str(tmp_path / 'output')
+    with Coordinator(_pipeline(AddOneOperator()), paths, output, shard_size=3) as coordinator:
+        workers = [_start_worker(coordinator.address) for _ in range(3)]
+        assert coordinator.wait(timeout=30)
+        for worker in workers:
+            worker.join(timeout=10)
+        progress = coordinator.progress
+    assert progress['shards'] == 7
+    assert progress['completed'] == 7
+    assert progress['failed'] == 0
+    _assert_outputs(output, 20)
+
+
+def test_worker_processes(tmp_path):
+    paths = _manifest(tmp_path / 'input', 12)
+    output = str(tmp_path / 'output')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([os.path.dirname(__file__), os.path.dirname(os.path.dirname(__file__))])
+    with Coordinator(_pipeline(AddOneOperator()), paths, output, shard_size=2) as coordinator:
+        host, port = coordinator.address
+        workers = [
+            subprocess.Popen([sys.executable, '-m', 'ezcv', 'worker', f'{host}:{port}', '-j', '2'], env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+            for _ in range(2)
+        ]
+        try:
+            assert coordinator.wait(timeout=60)
+        finally:
+            errors = [worker.communicate(timeout=30)[1] for worker in workers]
+        assert [worker.returncode for worker in workers] == [0, 0], errors
+    _assert_outputs(output, 12)
+
+
+def test_retries_failed_shards(tmp_path, monkeypatch):
+    monkeypatch.setenv('EZCV_TEST_MARKERS', str(tmp_path))
+    paths = _manifest(tmp_path / 'input', 4)
+    output = str(tmp_path / 'output')
+    with Coordinator(_pipeline(FailOnceOperator()), paths, output, shard_size=1) as coordinator:
+        worker = _start_worker(coordinator.address)
+        assert coordinator.wait(timeout=30)
+        worker.join(timeout=10)
+        assert coordinator.failures == {}
+    _assert_outputs(output, 4, offset=0)
+
+
+def test_gives_up_on_failing_shards(tmp_path):
+    paths = _manifest(tmp_path / 'input', 2)
+    with Coordinator(_pipeline(FailingOperator()), paths, str(tmp_path / 'output'), max_retries=1) as coordinator:
+        worker = _start_worker(coordinator.address)
+        assert coordinator.wait(timeout=30)
+        worker.join(timeout=10)
+        failures = coordinator.failures
+    assert list(failures) == [0]
+    assert 'failed' in failures[0]
+
+
+def test_lost_workers_shards_are_retried(tmp_path):
+    paths = _manifest(tmp_path / 'input', 4)
+    output = str(tmp_path / 'output')
+    with Coordinator(_pipeline(AddOneOperator()), paths, output, shard_size=2, heartbeat_timeout=0.2) as coordinator:
+        fake = _FakeWorker(coordinator.address, heartbeat=False)
+        assert fake.shard['type'] == 'shard'
+        time.sleep(0.5)
+        assert coordinator.progress['workers'] == 0
+        worker = _start_worker(coordinator.address)
+        assert coordinator.wait(timeout=30)
+        worker.join(timeout=10)
+        fake.close()
+    _assert_outputs(output, 4)
+
+
+def test_stragglers_shards_are_stolen(tmp_path):
+    paths = _manifest(tmp_path / 'input', 4)
+    output = str(tmp_path / 'output')
+    with Coordinator(_pipeline(AddOneOperator()), paths, output, shard_size=2, heartbeat_timeout=0.2) as coordinator:
+        fake = _FakeWorker(coordinator.address, heartbeat=True)
+        worker = _start_worker(coordinator.address)
+        assert coordinator.wait(timeout=30)
+        worker.join(timeout=10)
+        # The straggler still sends heartbeats, so its shard could only be completed by the other worker
+        assert fake.shard['type'] == 'shard'
+        fake.close()
+    _assert_outputs(output, 4)
+
+
+def test_failed_handshake_unregisters_worker(tmp_path, monkeypatch):
+    paths = _manifest(tmp_path / 'input', 2)
+    output = str(tmp_path / 'output')
+
+    def send_message_failing_config(sock, message):
+        if message['type'] == 'config':
+            raise OSError('connection reset')
+        send_message(sock, message)
+
+    with Coordinator(_pipeline(AddOneOperator()), paths, output, shard_size=1) as coordinator:
+        monkeypatch.setattr(distributed, 'send_message', send_message_failing_config)
+        sock = socket.create_connection(coordinator.address)
+        send_message(sock, {'type': 'hello', 'name': 'reset'})
+        assert receive_message(sock) is None
+        sock.close()
+        monkeypatch.undo()
+        assert coordinator.progress['workers'] == 0
+        # The name is free again, and the shards are still handed out
+        worker = _start_worker(coordinator.address, name='reset')
+        assert coordinator.wait(timeout=30)
+        worker.join(timeout=10)
+    _assert_outputs(output, 2)
+
+
+def test_duplicated_worker_name(tmp_path):
+    paths = _manifest(tmp_path / 'input', 1)
+    with Coordinator(_pipeline(AddOneOperator()), paths, str(tmp_path / 'output')) as coordinator:
+        fake = _FakeWorker(coordinator.address, heartbeat=True)
+        with pytest.raises(ValueError):
+            Worker(coordinator.address, name='fake').run()
+        fake.close()
+
+
+def test_empty_manifest(tmp_path):
+    with Coordinator(_pipeline(AddOneOperator()), [], str(tmp_path)) as coordinator:
+        assert coordinator.wait(timeout=1)
+        assert Worker(coordinator.address).run() == 0
+
+
+@pytest.mark.parametrize('kwargs', [{'shard_size': 0}, {'heartbeat_timeout': 0}, {'max_retries': -1}])
+def test_invalid_arguments(tmp_path, kwargs):
+    with pytest.raises(ValueError):
+        Coordinator(CompVizPipeline(), [], str(tmp_path), **kwargs)
@@ -0,0 +1,69 @@
+import subprocess
+import sys
+
+import pytest
+
+import ezcv
+
+# Time `import ezcv` may take on top of numpy, in seconds. Generous, to leave room for slow CI machines
+IMPORT_BUDGET = 0.25
+
+
+def _run(code: str) -> str:
+    return subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout.strip()
+
+
+def _loaded_after(statement: str, modules):
+    code = f'import sys; {statement}; print(",".join(m for m in {list(modules)!r} if m in sys.modules))'
+    loaded = _run(code)
+    return loaded.split(',') if loaded else []
+
+
+def test_import_doesnt_load_optional_dependencies():
+    assert _loaded_after('import ezcv', ['yaml', 'cerberus', 'ezcv.pipeline', 'ezcv.config']) == []
+
+
+def test_running_pipeline_doesnt_load_config_dependencies():
+    statement = (
+        'import numpy as np; from ezcv import CompVizPipeline; '
+        'CompVizPipeline().run(np.zeros((4, 4), dtype="uint8"))'
+    )
+    assert _loaded_after(statement, ['yaml', 'cerberus', 'ezcv.config']) == []
+
+
+def test_config_module_doesnt_load_dependencies():
+    assert _loaded_after('import ezcv.config', ['yaml', 'cerberus']) == []
+
+
+def test_loading_pipeline_loads_yaml():
+    statement = (
+        'import io; from ezcv import CompVizPipeline; '
+        'CompVizPipeline.load(io.StringIO("version: \'0.0\'\\npipeline: []"))'
+    )
+    assert _loaded_after(statement, ['yaml']) == ['yaml']
+
+
+def test_import_time_budget():
+    code = (
+        'import time, numpy; start = time.perf_counter(); '
+        'from ezcv import CompVizPipeline; print(time.perf_counter() - start)'
+    )
+    durations = [float(_run(code)) for _ in range(3)]
+    assert min(durations) < IMPORT_BUDGET
+
+
+def test_lazy_attributes():
+    from ezcv.pipeline import CompVizPipeline
+    assert ezcv.CompVizPipeline is CompVizPipeline
+    assert 'CompVizPipeline' in dir(ezcv)
+    assert ezcv.config.create_pipeline is not None
+
+
+def test_unknown_attribute():
+    with pytest.raises(AttributeError):
+        ezcv.unknown
+
+
+@pytest.mark.parametrize('module', ['ezcv.operator', 'ezcv.pipeline', 'ezcv.config', 'ezcv.cli'])
+def test_submodules_import_on_their_own(module):
+    assert _loaded_after(f'import {module}', [module]) == [module]
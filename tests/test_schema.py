@@ -0,0 +1,84 @@
+import pytest
+
+from ezcv.config import operator_config_schema, pipeline_schema
+from ezcv.schema import compile_schema
+
+OPERATOR_CONFIGS = [
+    {'implementation': 'a.B', 'params': {}},
+    {'implementation': 'a.B', 'params': {'anything': [1, 2]}},
+    {},
+    {'implementation': 1, 'params': []},
+    {'implementation': None, 'params': None, 'unknown': 1},
+]
+
+PIPELINE_CONFIGS = [
+    {'version': '0.0', 'pipeline': []},
+    {'version': '0.0', 'pipeline': [{'name': 'a', 'config': {'implementation': 'a.B', 'params': {}}}]},
+    {'version': 1, 'pipeline': 'abc'},
+    {'version': '0.0', 'pipeline': None},
+    {'version': '0.0', 'pipeline': {'a': 1}},
+    {'version': '0.0', 'pipeline': ('a',)},
+    {1: 2, 'version': '0.0', 'pipeline': []},
+    {'version': '0.0', 'pipeline': [
+        1,
+        {'name': 2},
+        {'name': 'a', 'config': {'implementation': 'a.B', 'params': {}, 'z': 1}, 'q': 2},
+        {'name': 'b', 'config': None},
+    ]},
+]
+
+
+@pytest.mark.parametrize('config', OPERATOR_CONFIGS)
+def test_operator_schema_matches_cerberus(config):
+    cerberus = pytest.importorskip('cerberus')
+    validator = cerberus.Validator(operator_config_schema)
+    validator.validate(config)
+    assert compile_schema(operator_config_schema)(config) == validator.errors
+
+
+@pytest.mark.parametrize('config', PIPELINE_CONFIGS)
+def test_pipeline_schema_matches_cerberus(config):
+    cerberus = pytest.importorskip('cerberus')
+    validator = cerberus.Validator(pipeline_schema)
+    validator.validate(config)
+    assert compile_schema(pipeline_schema)(config) == validator.errors
+
+
+def test_valid_document():
+    assert compile_schema(pipeline_schema)(PIPELINE_CONFIGS[1]) == {}
+
+
+def test_nested_errors():
+    errors = compile_schema(pipeline_schema)(PIPELINE_CONFIGS[-1])
+    assert errors == {'pipeline': [{
+        0: ['must be of dict type'],
+        1: [{'name': ['must be of string type'], 'config': ['required field']}],
+        2: [{'config': [{'z': ['unknown field']}], 'q': ['unknown field']}],
+        3: [{'config': ['null value not allowed']}],
+    }]}
+
+
+def test_nullable():
+    validate = compile_schema({'a': {'type': 'string', 'nullable': True}})
+    assert validate({'a': None}) == {}
+
+
+def test_allow_unknown():
+    assert compile_schema({}, allow_unknown=True)({'a': 1}) == {}
+
+
+@pytest.mark.parametrize('type_name', ['integer', 'number'])
+def test_booleans_are_not_numbers(type_name):
+    validate = compile_schema({'a': {'type': type_name}})
+    assert validate({'a': 1}) == {}
+    assert validate({'a': True}) == {'a': [f'must be of {type_name} type']}
+
+
+@pytest.mark.parametrize('schema', [
+    {'a': {'type': 'string', 'regex': '.*'}},
+    {'a': {'type': 'unknown'}},
+    {'a': {'type': 'string', 'schema': {}}},
+])
+def test_unsupported_schema(schema):
+    with pytest.raises(ValueError):
+        compile_schema(schema)
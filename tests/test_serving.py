@@ -0,0 +1,225 @@
+import email.parser
+import email.policy
+import http.client
+import io
+import json
+import socket
+import threading
+import time
+from concurrent.futures import TimeoutError
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.operator import Operator
+from ezcv.pipeline import PipelineContext
+from ezcv.serving import MicroBatcher, create_server
+from ezcv.test_utils import build_img
+from ezcv.typing import Image
+
+
+class AddOneOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        ctx.add_info('mean', img.mean())
+        return img + 1
+
+
+class RejectWhiteOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        if img[0, 0] == 255:
+            raise RuntimeError('white image')
+        return img
+
+
+class PixelsOperator(Operator):
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        ctx.add_info('pixels', img)
+        return img
+
+
+class BlockingOperator(Operator):
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def run(self, img: Image, ctx: PipelineContext) -> Image:
+        self.gate.wait()
+        return img
+
+
+@pytest.fixture
+def pipeline():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('add_one', AddOneOperator())
+    return pipeline
+
+
+def test_run(pipeline):
+    batcher = MicroBatcher(pipeline)
+    img = build_img((16, 16), kind='black')
+    output, ctx = batcher.run(img, timeout=5)
+    batcher.close()
+    assert np.all(output == 1)
+    assert ctx.info['add_one']['mean'] == 0
+
+
+def test_coalesces_requests(pipeline):
+    batcher = MicroBatcher(pipeline, max_batch_size=4, max_wait=0.2)
+    futures = [batcher.submit(build_img((16, 16))) for _ in range(8)]
+    for future in futures:
+        future.result(timeout=5)
+    stats = batcher.stats
+    batcher.close()
+    assert stats['batches'] == 2
+    assert stats['mean_batch_size'] == 4
+
+
+def test_timeout_cancels_request():
+    operator = BlockingOperator()
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('block', operator)
+    batcher = MicroBatcher(pipeline, max_batch_size=1, max_wait=0, workers=1)
+    first = batcher.submit(build_img((16, 16)))
+    time.sleep(0.05)
+    with pytest.raises(TimeoutError):
+        batcher.run(build_img((16, 16)), timeout=0.05)
+    assert batcher.queue_depth == 1
+    operator.gate.set()
+    first.result(timeout=5)
+    batcher.close()
+    assert batcher.stats['cancelled'] == 1
+    assert batcher.stats['dispatched'] == 1
+
+
+@pytest.mark.parametrize('kwargs', [{'max_batch_size': 0}, {'max_wait': -1}, {'workers': 0}])
+def test_invalid_arguments(pipeline, kwargs):
+    with pytest.raises(ValueError):
+        MicroBatcher(pipeline, **kwargs)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str):
+        super().__init__('localhost')
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(self.unix_path)
+
+
+def _read_run_response(response: http.client.HTTPResponse):
+    headers = f'Content-Type: {response.getheader("Content-Type")}\r\n\r\n'.encode()
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(headers + response.read())
+    image_part, info_part = message.iter_parts()
+    assert image_part.get_content_type() == 'application/x-npy'
+    assert info_part.get_content_type() == 'application/json'
+    return np.load(io.BytesIO(image_part.get_payload(decode=True))), json.loads(info_part.get_payload(decode=True))
+
+
+@pytest.fixture(params=['tcp', 'unix'])
+def connection_factory(request, pipeline, tmp_path):
+    batcher = MicroBatcher(pipeline)
+    if request.param == 'tcp':
+        server = create_server(batcher, port=0)
+        host, port = server.server_address[:2]
+        factory = lambda: http.client.HTTPConnection(host, port, timeout=5)  # noqa: E731
+    else:
+        path = str(tmp_path / 'ezcv.sock')
+        server = create_server(batcher, unix_socket=path)
+        factory = lambda: _UnixHTTPConnection(path)  # noqa: E731
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield factory
+    server.shutdown()
+    server.server_close()
+    batcher.close()
+
+
+def test_http_run(connection_factory):
+    img = build_img((16, 16), kind='black')
+    buffer = io.BytesIO()
+    np.save(buffer, img)
+    connection = connection_factory()
+    connection.request('POST', '/run', body=buffer.getvalue())
+    response = connection.getresponse()
+    assert response.status == 200
+    output, info = _read_run_response(response)
+    assert np.all(output == 1)
+    assert info == {'add_one': {'mean': 0.0}}
+
+
+def test_http_run_large_info(connection_factory, pipeline):
+    pipeline.add_operator('pixels', PixelsOperator())
+    img = build_img((128, 128))
+    buffer = io.BytesIO()
+    np.save(buffer, img)
+    connection = connection_factory()
+    connection.request('POST', '/run', body=buffer.getvalue())
+    response = connection.getresponse()
+    assert response.status == 200
+    output, info = _read_run_response(response)
+    assert np.all(output == img + 1)
+    assert info['pixels']['pixels'] == output.tolist()
+
+
+def test_http_bad_payload(connection_factory):
+    connection = connection_factory()
+    connection.request('POST', '/run', body=b'not an array')
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 400
+
+
+def test_http_bad_image(connection_factory):
+    buffer = io.BytesIO()
+    np.save(buffer, np.zeros(10))
+    connection = connection_factory()
+    connection.request('POST', '/run', body=buffer.getvalue())
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 400
+
+
+def test_http_stats(connection_factory):
+    connection = connection_factory()
+    connection.request('GET', '/stats')
+    response = connection.getresponse()
+    assert response.status == 200
+    assert 'queue_depth' in json.loads(response.read())
+
+
+def test_http_unknown_path(connection_factory):
+    connection = connection_factory()
+    connection.request('GET', '/unknown')
+    response = connection.getresponse()
+    response.read()
+    assert response.status == 404
+
+
+def test_batches_use_run_batch(pipeline):
+    batcher = MicroBatcher(pipeline, max_batch_size=4, max_wait=0.2)
+    with patch.object(pipeline, 'run_batch', wraps=pipeline.run_batch) as run_batch:
+        futures = [batcher.submit(build_img((16, 16), kind='black')) for _ in range(4)]
+        results = [future.result(timeout=5) for future in futures]
+    batcher.close()
+    run_batch.assert_called_once()
+    assert all(np.all(output == 1) for output, _ in results)
+
+
+def test_failing_request_does_not_fail_its_batch():
+    pipeline = CompVizPipeline()
+    pipeline.add_operator('reject', RejectWhiteOperator())
+    batcher = MicroBatcher(pipeline, max_batch_size=4, max_wait=0.2)
+    kinds = ['black', 'white', 'black', 'black']
+    with patch.object(pipeline, 'run_batch', wraps=pipeline.run_batch) as run_batch:
+        futures = [batcher.submit(build_img((16, 16), kind=kind)) for kind in kinds]
+        for future in futures:
+            future.exception(timeout=5)
+    stats = batcher.stats
+    batcher.close()
+    run_batch.assert_called_once()
+    assert futures[1].exception() is not None
+    assert all(futures[i].exception() is None for i in (0, 2, 3))
+    assert stats['failed'] == 1
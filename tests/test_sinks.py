@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.pipeline import PipelineContext
+from ezcv.sinks import Sink, DirectorySink, MemmapSink, JsonlSink
+from ezcv.sources import NpySource
+from ezcv.test_utils import build_img
+
+
+def _results(count: int):
+    results = list()
+    for i in range(count):
+        img = build_img((4, 6))
+        ctx = PipelineContext(img)
+        ctx.add_info('index', i)
+        ctx.add_info('mean', np.float32(img.mean()))
+        results.append((img, ctx))
+    return results
+
+
+class RecordingSink(Sink):
+    def __init__(self, gate: threading.Event = None, fail: bool = False, **kwargs):
+        self.batches = list()
+        self.gate = gate
+        self.fail = fail
+        super().__init__(**kwargs)
+
+    def _write_batch(self, items):
+        if self.gate is not None:
+            assert self.gate.wait(timeout=10)
+        if self.fail:
+            raise IOError('disk full')
+        self.batches.append([key for key, _, _ in items])
+
+
+class TestSink:
+    def test_writes_everything_in_order(self):
+        with RecordingSink(batch_size=4) as sink:
+            sink.write_all(_results(10))
+        keys = [key for batch in sink.batches for key in batch]
+        assert keys == [f'{i:08d}' for i in range(10)]
+        assert all(len(batch) <= 4 for batch in sink.batches)
+        assert sink.written == 10
+
+    def test_batches(self):
+        gate = threading.Event()
+        sink = RecordingSink(gate=gate, batch_size=4, queue_size=100)
+        sink.write_all(_results(9))
+        gate.set()
+        sink.close()
+        # The writer may take the first results before the others are queued, then takes them 4 at a time
+        sizes = [len(batch) for batch in sink.batches]
+        assert sum(sizes) == 9
+        assert max(sizes) == 4
+        assert len(sizes) <= 4
+
+    def test_backpressure(self):
+        gate = threading.Event()
+        sink = RecordingSink(gate=gate, batch_size=1, queue_size=2)
+        results = _results(4)
+        writer = threading.Thread(target=sink.write_all, args=(results,))
+        writer.start()
+        writer.join(timeout=0.2)
+        # One result is being written, two are queued, and the last one waits for room
+        assert writer.is_alive()
+        gate.set()
+        writer.join(timeout=10)
+        sink.close()
+        assert sink.written == 4
+
+    def test_flush(self):
+        gate = threading.Event()
+        sink = RecordingSink(gate=gate)
+        sink.write_all(_results(3))
+        assert not sink.flush(timeout=0.05)
+        gate.set()
+        assert sink.flush(timeout=10)
+        assert sink.written == 3
+        sink.close()
+
+    def test_custom_keys(self):
+        results = _results(2)
+        with RecordingSink() as sink:
+            sink.write_batch(np.stack([img for img, _ in results]), [ctx for _, ctx in results], keys=['a', 'b'])
+        assert sink.batches[0] == ['a', 'b']
+
+    def test_errors_are_raised(self):
+        sink = RecordingSink(fail=True)
+        img, ctx = _results(1)[0]
+        sink.write(img, ctx)
+        with pytest.raises(RuntimeError) as e:
+            sink.flush()
+        assert isinstance(e.value.__cause__, IOError)
+        with pytest.raises(RuntimeError):
+            sink.write(img, ctx)
+        with pytest.raises(RuntimeError):
+            sink.close()
+
+    def test_on_written(self):
+        written = list()
+        with RecordingSink(batch_size=4, on_written=written.append) as sink:
+            sink.write_all(_results(10))
+        assert written == sink.batches
+
+    def test_on_written_errors_are_raised(self):
+        def on_written(keys):
+            raise IOError('callback failed')
+
+        sink = RecordingSink(on_written=on_written)
+        img, ctx = _results(1)[0]
+        sink.write(img, ctx)
+        with pytest.raises(RuntimeError) as e:
+            sink.close()
+        assert isinstance(e.value.__cause__, IOError)
+        assert sink.written == 0
+
+    def test_close_twice(self):
+        sink = RecordingSink()
+        sink.close()
+        sink.close()
+        img, ctx = _results(1)[0]
+        with pytest.raises(RuntimeError):
+            sink.write(img, ctx)
+
+    @pytest.mark.parametrize('kwargs', [{'queue_size': 0}, {'batch_size': 0}])
+    def test_invalid_arguments(self, kwargs):
+        with pytest.raises(ValueError):
+            RecordingSink(**kwargs)
+
+
+def test_npy_directory(tmp_path):
+    results = _results(3)
+    with DirectorySink(str(tmp_path / 'out')) as sink:
+        sink.write_all(results)
+    assert sorted(os.listdir(tmp_path / 'out')) == ['00000000.npy', '00000001.npy', '00000002.npy']
+    for i, (img, _) in enumerate(results):
+        assert np.all(np.load(str(tmp_path / 'out' / f'{i:08d}.npy')) == img)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_npz_directory(tmp_path, compress):
+    results = _results(5)
+    with DirectorySink(str(tmp_path), format='npz', compress=compress, batch_size=2) as sink:
+        sink.write_all(results)
+    loaded = dict()
+    for name in sorted(os.listdir(tmp_path)):
+        assert name.startswith('batch_') and name.endswith('.npz')
+        with np.load(str(tmp_path / name)) as archive:
+            loaded.update({key: archive[key] for key in archive.files})
+    assert len(loaded) == 5
+    for i, (img, _) in enumerate(results):
+        assert np.all(loaded[f'{i:08d}'] == img)
+
+
+def test_invalid_directory_format(tmp_path):
+    with pytest.raises(ValueError):
+        DirectorySink(str(tmp_path), format='png')
+
+
+def test_directory_on_written(tmp_path):
+    written = list()
+    with DirectorySink(str(tmp_path), on_written=written.extend) as sink:
+        sink.write_all(_results(3))
+    assert sorted(written) == [f'{i:08d}' for i in range(3)]
+
+
+def test_memmap(tmp_path):
+    path = str(tmp_path / 'stack.npy')
+    results = _results(4)
+    with MemmapSink(path, count=4) as sink:
+        sink.write_all(results)
+    stack = np.load(path)
+    assert stack.shape == (4, 4, 6)
+    for i, (img, _) in enumerate(results):
+        assert np.all(stack[i] == img)
+    assert len(NpySource(path)) == 4
+
+
+def test_memmap_keys_are_indexes(tmp_path):
+    path = str(tmp_path / 'stack.npy')
+    img, ctx = _results(1)[0]
+    with MemmapSink(path, count=3, shape=img.shape, dtype=img.dtype) as sink:
+        sink.write(img, ctx, key='2')
+    stack = np.load(path)
+    assert np.all(stack[2] == img)
+    assert np.all(stack[:2] == 0)
+
+
+def test_memmap_invalid_index(tmp_path):
+    img, ctx = _results(1)[0]
+    sink = MemmapSink(str(tmp_path / 'stack.npy'), count=1)
+    sink.write(img, ctx, key='5')
+    with pytest.raises(RuntimeError):
+        sink.close()
+
+
+def test_jsonl(tmp_path):
+    path = str(tmp_path / 'info.jsonl')
+    results = _results(3)
+    with JsonlSink(path) as sink:
+        sink.write_all(results)
+    with open(path) as f:
+        lines = [json.loads(line) for line in f]
+    assert [line['key'] for line in lines] == ['00000000', '00000001', '00000002']
+    assert [line['info']['index'] for line in lines] == [0, 1, 2]
+    assert isinstance(lines[0]['info']['mean'], float)
+
+
+def test_with_run_stream(tmp_path):
+    pipeline = CompVizPipeline()
+    imgs = [build_img((8, 8)) for _ in range(6)]
+    with DirectorySink(str(tmp_path)) as sink:
+        sink.write_all(pipeline.run_stream(imgs, workers=2))
+    assert len(os.listdir(tmp_path)) == 6
@@ -0,0 +1,149 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from ezcv import CompVizPipeline
+from ezcv.sources import DirectorySource, GlobSource, NpzSource, NpySource, FilesSource, prefetch_frames
+from ezcv.test_utils import build_img, assert_terms_in_exception
+
+
+@pytest.fixture
+def imgs():
+    return [build_img((16, 16)) for _ in range(5)]
+
+
+@pytest.fixture
+def npy_dir(tmp_path, imgs):
+    for i, img in enumerate(imgs):
+        np.save(tmp_path / f'{i:03d}.npy', img)
+    (tmp_path / 'notes.txt').write_text('not an image')
+    return tmp_path
+
+
+def assert_same_frames(source, imgs):
+    frames = list(source)
+    assert len(frames) == len(imgs)
+    for frame, img in zip(frames, imgs):
+        assert np.all(frame == img)
+
+
+@pytest.mark.parametrize('workers', [0, 1, 3])
+def test_directory_source(npy_dir, imgs, workers):
+    source = DirectorySource(str(npy_dir), workers=workers)
+    assert len(source) == len(imgs)
+    assert_same_frames(source, imgs)
+
+
+def test_directory_source_invalid_path(tmp_path):
+    with pytest.raises(ValueError) as e:
+        DirectorySource(str(tmp_path / 'nonexistent'))
+    assert_terms_in_exception(e, ['invalid', 'directory'])
+
+
+def test_glob_source(npy_dir, imgs):
+    source = GlobSource(str(npy_dir / '*.npy'))
+    assert_same_frames(source, imgs)
+
+
+def test_npz_source(tmp_path, imgs):
+    path = tmp_path / 'frames.npz'
+    np.savez(path, *imgs)
+    source = NpzSource(str(path))
+    assert source.keys() == [f'arr_{i}' for i in range(len(imgs))]
+    assert_same_frames(source, imgs)
+
+
+def test_npz_source_compressed(tmp_path, imgs):
+    path = tmp_path / 'frames.npz'
+    np.savez_compressed(path, *imgs)
+    assert_same_frames(NpzSource(str(path), workers=0), imgs)
+    assert_same_frames(NpzSource(str(path), workers=3), imgs)
+
+
+def test_npz_source_reuses_archive(tmp_path, imgs, monkeypatch):
+    path = tmp_path / 'frames.npz'
+    np.savez(path, *imgs)
+    source = NpzSource(str(path), workers=0)
+    opened = list()
+    load = np.load
+
+    def counting_load(*args, **kwargs):
+        opened.append(args)
+        return load(*args, **kwargs)
+
+    monkeypatch.setattr(np, 'load', counting_load)
+    list(source)
+    assert len(opened) == 1
+
+
+def test_npy_source(tmp_path, imgs):
+    path = tmp_path / 'stack.npy'
+    np.save(path, np.stack(imgs))
+    source = NpySource(str(path))
+    assert len(source) == len(imgs)
+    assert_same_frames(source, imgs)
+
+
+def test_npy_source_invalid_stack(tmp_path):
+    path = tmp_path / 'stack.npy'
+    np.save(path, np.zeros(10))
+    with pytest.raises(ValueError) as e:
+        NpySource(str(path))
+    assert_terms_in_exception(e, ['invalid', 'stack'])
+
+
+def test_items(npy_dir, imgs):
+    source = DirectorySource(str(npy_dir))
+    keys = [key for key, _ in source.items()]
+    assert keys == [str(npy_dir / f'{i:03d}.npy') for i in range(len(imgs))]
+
+
+@pytest.mark.parametrize('kwargs', [{'workers': -1}, {'prefetch': 0}])
+def test_invalid_arguments(kwargs):
+    with pytest.raises(ValueError) as e:
+        FilesSource([], **kwargs)
+    assert_terms_in_exception(e, ['invalid'])
+
+
+def test_prefetch_is_bounded():
+    loaded = list()
+
+    def loader(index):
+        loaded.append(index)
+        return index
+
+    frames = prefetch_frames(loader, 100, workers=2, queue_size=4)
+    assert next(frames) == 0
+    time.sleep(0.05)
+    assert len(loaded) <= 5
+    frames.close()
+
+
+def test_prefetch_loads_in_background():
+    threads = set()
+
+    def loader(index):
+        threads.add(threading.get_ident())
+        return index
+
+    assert list(prefetch_frames(loader, 10, workers=2)) == list(range(10))
+    assert threading.get_ident() not in threads
+
+
+def test_prefetch_propagates_errors():
+    def loader(index):
+        if index == 3:
+            raise RuntimeError('failed')
+        return index
+
+    with pytest.raises(RuntimeError):
+        list(prefetch_frames(loader, 10))
+
+
+def test_run_stream(npy_dir, imgs):
+    pipeline = CompVizPipeline()
+    outputs = [out for out, _ in pipeline.run_stream(DirectorySource(str(npy_dir)))]
+    assert len(outputs) == len(imgs)
+    assert all(np.all(out == img) for out, img in zip(outputs, imgs))
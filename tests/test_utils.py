@@ -1,5 +1,11 @@
-from ezcv.utils import is_image
-from ezcv.test_utils import parametrize_img
+import io
+
+import numpy as np
+import pytest
+
+from ezcv import utils
+from ezcv.utils import is_image, convert_image, load_npy, IMAGE_DTYPES
+from ezcv.test_utils import parametrize_img, build_img, assert_terms_in_exception
 
 
 @parametrize_img
@@ -18,3 +24,89 @@ def test_is_image_none():
 
 def test_is_image_random_object():
     assert not is_image(object())
+
+
+@pytest.mark.parametrize('dtype', ['uint16', 'float32'])
+def test_is_image_other_dtypes(dtype):
+    img = build_img((16, 16)).astype(dtype)
+    assert not is_image(img)
+    assert is_image(img, IMAGE_DTYPES)
+
+
+def test_is_image_invalid_dtype():
+    assert not is_image(build_img((16, 16)).astype('int64'), IMAGE_DTYPES)
+
+
+@pytest.mark.parametrize('img, dtype, expected', [
+    (np.array([[-10.0, 0.4, 127.6, 300.0]], dtype='float32'), 'uint8', [[0, 0, 128, 255]]),
+    (np.array([[0, 255, 256, 65535]], dtype='uint16'), 'uint8', [[0, 255, 255, 255]]),
+    (np.array([[0, 255]], dtype='uint8'), 'float32', [[0.0, 255.0]]),
+    (np.array([[0, 255]], dtype='uint8'), 'uint16', [[0, 255]]),
+    (np.array([[-1.0, 70000.0]], dtype='float32'), 'uint16', [[0, 65535]]),
+])
+def test_convert_image(img, dtype, expected):
+    converted = convert_image(img, dtype)
+    assert converted.dtype == np.dtype(dtype)
+    assert np.all(converted == expected)
+
+
+def test_convert_image_same_dtype():
+    img = build_img((16, 16))
+    assert convert_image(img, 'uint8') is img
+
+
+def test_load_npy_from_path(tmp_path):
+    img = build_img((8, 8))
+    path = str(tmp_path / 'img.npy')
+    np.save(path, img)
+    loaded = load_npy(path)
+    assert not isinstance(loaded, np.memmap)
+    assert np.all(loaded == img)
+
+
+def test_load_npy_from_file():
+    img = build_img((8, 8))
+    buffer = io.BytesIO()
+    np.save(buffer, img)
+    buffer.seek(0)
+    assert np.all(load_npy(buffer) == img)
+
+
+@pytest.mark.parametrize('array', [
+    np.arange(24, dtype='uint16').reshape(2, 3, 4),
+    np.asfortranarray(np.arange(12, dtype='float32').reshape(3, 4)),
+    np.zeros((0, 3), dtype='uint8'),
+])
+def test_load_npy_from_file_layouts(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+    buffer.seek(0)
+    loaded = load_npy(buffer)
+    assert loaded.dtype == array.dtype
+    assert loaded.shape == array.shape
+    assert np.all(loaded == array)
+    assert loaded.flags.writeable
+
+
+def test_load_npy_reads_data_without_lock():
+    class CheckingBuffer(io.BytesIO):
+        locked_reads = list()
+
+        def readinto(self, buffer):
+            self.locked_reads.append(utils._npy_lock.locked())
+            return super().readinto(buffer)
+
+    buffer = CheckingBuffer()
+    np.save(buffer, build_img((8, 8)))
+    buffer.seek(0)
+    load_npy(buffer)
+    assert CheckingBuffer.locked_reads == [False]
+
+
+def test_load_npy_truncated_file():
+    buffer = io.BytesIO()
+    np.save(buffer, build_img((8, 8)))
+    buffer = io.BytesIO(buffer.getvalue()[:-10])
+    with pytest.raises(ValueError) as e:
+        load_npy(buffer)
+    assert_terms_in_exception(e, ['invalid', 'bytes'])